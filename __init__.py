@@ -1,6 +1,6 @@
 # Zebra Puzzle Simulation Package
 
-from entities import Agent, House
+from entities import Agent, House, KnowledgeObserver, EntityStore
 from events import (
     Event,
     StartTripEvent,
@@ -11,22 +11,50 @@ from events import (
     EVENT_PRIORITY_EXCHANGE,
     EVENT_PRIORITY_START_TRIP,
 )
-from simulation import Environment
+from simulation import (
+    Environment,
+    VectorizedEnvironment,
+    EventSink,
+    MemorySink,
+    FileSink,
+    BinaryFileSink,
+    MultiSink,
+    NullSink,
+    CountingSink,
+    EnsembleRunner,
+    EnsembleResult,
+    RunningStats,
+    ParameterSweep,
+    SweepResult,
+)
 from loaders import (
     parse_csv_line,
     log_formatter,
     load_strategies,
     load_initial_data,
     load_geography,
+    load_travel_graph,
+    TravelGraph,
     build_color_to_prob_index,
+    EventLog,
+    EventLogBuilder,
+    EventLogWriter,
+    convert_observer_log,
+    load_observer_log,
+    KnowledgeSnapshot,
+    KnowledgeSnapshotWriter,
+    write_knowledge_snapshot,
+    generate_scenario,
 )
 from analysis import SimulationAnalyzer
-from knowledge_logging import KnowledgeLogAnalyzer
+from knowledge_logging import KnowledgeLogAnalyzer, LiveKnowledgeLogger, DeltaLogReader, convert_delta_log
 
 __all__ = [
     # Entities
     'Agent',
     'House',
+    'KnowledgeObserver',
+    'EntityStore',
     # Events
     'Event',
     'StartTripEvent',
@@ -38,15 +66,42 @@ __all__ = [
     'EVENT_PRIORITY_START_TRIP',
     # Simulation
     'Environment',
+    'VectorizedEnvironment',
+    'EventSink',
+    'MemorySink',
+    'FileSink',
+    'BinaryFileSink',
+    'MultiSink',
+    'NullSink',
+    'CountingSink',
+    'EnsembleRunner',
+    'EnsembleResult',
+    'RunningStats',
+    'ParameterSweep',
+    'SweepResult',
     # Loaders
     'parse_csv_line',
     'log_formatter',
     'load_strategies',
     'load_initial_data',
     'load_geography',
+    'load_travel_graph',
+    'TravelGraph',
     'build_color_to_prob_index',
+    'EventLog',
+    'EventLogBuilder',
+    'EventLogWriter',
+    'convert_observer_log',
+    'load_observer_log',
+    'KnowledgeSnapshot',
+    'KnowledgeSnapshotWriter',
+    'write_knowledge_snapshot',
+    'generate_scenario',
     # Analysis
     'SimulationAnalyzer',
     'KnowledgeLogAnalyzer',
+    'LiveKnowledgeLogger',
+    'DeltaLogReader',
+    'convert_delta_log',
 ]
 
@@ -1,4 +1,4 @@
 from .simulator_analyzer import SimulationAnalyzer
+from .geography import GeographyAnalysis
 
-__all__ = ['SimulationAnalyzer']
-
+__all__ = ['SimulationAnalyzer', 'GeographyAnalysis']
@@ -0,0 +1,298 @@
+from math import gcd
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from loaders.csv_utils import (build_color_to_prob_index, count_houses, load_initial_data, load_strategies,
+                               load_travel_graph)
+from loaders.travel_graph import DenseTravelMatrix, TravelGraph, as_travel_graph
+
+if TYPE_CHECKING:
+    from entities.agent import Agent
+    from entities.house import House
+
+
+# Статический анализ сценария до его запуска.
+#
+# Знаниями обмениваются только агенты, оказавшиеся в одном доме в один и тот же
+# момент при его хозяине. Никто не задерживается: хозяин дома только в момент
+# возвращения, гость только в момент прибытия (оба уезжают в тот же момент).
+# Агент выбирает цель среди соседних домов так же, как Agent.choose_trip_target,
+# поэтому он дома в моменты, равные суммам поездок дом -> h -> дом, а в доме h
+# бывает в такие суммы плюс время пути до h. Эти множества строятся до max_time
+# как булевы массивы и пересекаются по одному дому за раз; для каждого агента
+# хранятся только моменты отъезда. Агенты, которым некуда ехать, всегда дома;
+# агент, приехавший в дом без обратного пути, остаётся там. Владельцы домов
+# берутся из исходных данных: обмены домами переселяют агентов, но анализ
+# этого не учитывает.
+
+
+def _closure(generators: List[int], horizon: int) -> np.ndarray:
+    """Все суммы generators (с повторениями), не превышающие horizon, как булев массив"""
+    reachable = np.zeros(horizon + 1, dtype=bool)
+    reachable[0] = True
+    for step in sorted(set(g for g in generators if g > 0)):
+        # Сдвиги на step, 2*step, 4*step, ... замыкают множество относительно прибавления step
+        shift = step
+        while shift <= horizon:
+            reachable[shift:] |= reachable[:-shift]
+            shift *= 2
+    return reachable
+
+
+def _shifted(times: np.ndarray, offset: int) -> np.ndarray:
+    result = np.zeros_like(times)
+    if offset <= len(times) - 1:
+        result[offset:] = times[:len(times) - offset]
+    return result
+
+
+class GeographyAnalysis:
+    """
+    Анализ географии и стратегий без запуска симуляции: компоненты связности,
+    кратчайшие времена, классы чётности поездок и пары агентов, которые могут встретиться
+    """
+
+    def __init__(self, travel_matrix: Union[TravelGraph, DenseTravelMatrix], agents: Optional[Dict[int, 'Agent']] = None,
+                 houses: Optional[Dict[int, 'House']] = None, max_time: int = 2000):
+        self.graph = as_travel_graph(travel_matrix)
+        self.agents = agents or {}
+        self.houses = houses or {}
+        self.max_time = max_time
+        self._round_trips: Optional[Dict[int, Tuple[List[int], List[Tuple[int, int]]]]] = None
+        self._departure_ticks: Optional[Dict[int, Optional[np.ndarray]]] = None
+        self._meeting_pairs: Optional[Set[Tuple[int, int]]] = None
+
+    @classmethod
+    def from_files(cls, agents_path: str, strategies_path: str, geography_path: str,
+                   max_time: int = 2000) -> 'GeographyAnalysis':
+        strategies = load_strategies(strategies_path, count_houses(agents_path))
+        agents, houses = load_initial_data(agents_path, strategies=strategies)
+        return cls(load_travel_graph(geography_path), agents, houses, max_time)
+
+    def connected_components(self) -> List[List[int]]:
+        """Компоненты сильной связности графа маршрутов (Тарьян, без рекурсии)"""
+        graph = self.graph
+        n = graph.num_houses
+        index = [0] * (n + 1)
+        low = [0] * (n + 1)
+        on_stack = [False] * (n + 1)
+        stack: List[int] = []
+        components: List[List[int]] = []
+        counter = 1
+
+        for root in range(1, n + 1):
+            if index[root]:
+                continue
+            work = [(root, 0)]
+            while work:
+                node, k = work.pop()
+                if k == 0:
+                    index[node] = low[node] = counter
+                    counter += 1
+                    stack.append(node)
+                    on_stack[node] = True
+                neighbors = graph.indices[graph.indptr[node] + k:graph.indptr[node + 1]]
+                for offset, target in enumerate(neighbors):
+                    if not index[target]:
+                        work.append((node, k + offset + 1))
+                        work.append((target, 0))
+                        break
+                    if on_stack[target]:
+                        low[node] = min(low[node], index[target])
+                else:
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = False
+                            component.append(member)
+                            if member == node:
+                                break
+                        components.append(sorted(component))
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+        return sorted(components)
+
+    def shortest_travel_times(self) -> np.ndarray:
+        """Кратчайшие времена пути между всеми домами (Флойд–Уоршелл по строкам NumPy), inf — недостижим"""
+        n = self.graph.num_houses
+        dist = np.full((n + 1, n + 1), np.inf)
+        indptr, indices, times = self.graph.arrays()
+        rows = np.repeat(np.arange(n + 1), np.diff(indptr))
+        np.minimum.at(dist, (rows, indices), times.astype(float))
+        np.fill_diagonal(dist[1:, 1:], 0)
+        for k in range(1, n + 1):
+            np.minimum(dist, dist[:, k, None] + dist[None, k, :], out=dist)
+        return dist
+
+    def _targets(self, agent: 'Agent', color_to_prob_index: Dict[str, int]) -> List[int]:
+        # Те же кандидаты, что у Agent.choose_trip_target из дома
+        neighbors = self.graph.neighbors(agent.house_id)[0]
+        weights = [agent.route_probs.get(color_to_prob_index.get(self.houses[h].color, 0), 0)
+                   if h in self.houses else 0 for h in neighbors]
+        if sum(weights) > 0:
+            return [h for h, w in zip(neighbors, weights) if w > 0]
+        return neighbors
+
+    def round_trips(self) -> Dict[int, Tuple[List[int], List[Tuple[int, int]]]]:
+        """Для каждого агента: длительности поездок туда и обратно и (дом, время в пути) для всех целей"""
+        if self._round_trips is None:
+            color_to_prob_index = build_color_to_prob_index(self.houses)
+            self._round_trips = {}
+            for agent_id, agent in self.agents.items():
+                home = agent.house_id
+                durations = []
+                visits = []
+                for h in self._targets(agent, color_to_prob_index):
+                    there = self.graph.time(home, h)
+                    if there is None or there < 0:
+                        continue
+                    back = self.graph.time(h, home)
+                    if back is not None and back >= 0:
+                        durations.append(there + back)
+                    visits.append((h, there))
+                self._round_trips[agent_id] = (durations, visits)
+        return self._round_trips
+
+    def parity_classes(self) -> Dict[int, List[int]]:
+        """
+        Агенты по НОД длительностей их поездок туда и обратно: агент возвращается домой
+        только в моменты, кратные НОД (0 — поездок туда и обратно нет)
+        """
+        classes: Dict[int, List[int]] = {}
+        for agent_id, (durations, _) in sorted(self.round_trips().items()):
+            g = 0
+            for d in durations:
+                g = gcd(g, d)
+            classes.setdefault(g, []).append(agent_id)
+        return classes
+
+    def _departures(self) -> Dict[int, Optional[np.ndarray]]:
+        # Моменты, когда агент может уехать из дома, до max_time; None для тех, кто никогда не уезжает
+        if self._departure_ticks is None:
+            self._departure_ticks = {
+                agent_id: _closure(durations, self.max_time) if trips else None
+                for agent_id, (durations, trips) in self.round_trips().items()
+            }
+        return self._departure_ticks
+
+    def _home_ticks(self, agent_id: int) -> np.ndarray:
+        """Моменты, когда агент может быть дома после поездки (любые, если он никогда не уезжает)"""
+        departures = self._departures()[agent_id]
+        if departures is None:
+            return np.ones(self.max_time + 1, dtype=bool)
+        returns = departures.copy()
+        returns[0] = False
+        return returns
+
+    def _visit_ticks(self, agent_id: int, house_id: int, there: int) -> np.ndarray:
+        """Моменты, когда агент может быть гостем в house_id, до которого there от дома"""
+        arrivals = _shifted(self._departures()[agent_id], there)
+        back = self.graph.time(house_id, self.agents[agent_id].house_id)
+        if back is None or back < 0:
+            # Обратного пути нет: агент остаётся в доме с первого прибытия
+            arrivals = np.logical_or.accumulate(arrivals)
+        return arrivals
+
+    def meeting_pairs(self) -> Set[Tuple[int, int]]:
+        """Пары агентов (a < b), которые до max_time могут оказаться в одном доме при его хозяине"""
+        if self._meeting_pairs is not None:
+            return self._meeting_pairs
+        # Гости каждого дома со временем пути; массивы моментов строятся по одному дому за раз
+        visitors_by_house: Dict[int, Dict[int, List[int]]] = {}
+        for agent_id, (_, trips) in self.round_trips().items():
+            for h, there in trips:
+                visitors_by_house.setdefault(h, {}).setdefault(agent_id, []).append(there)
+        owners = {house_id: house.owner_id for house_id, house in self.houses.items()}
+        pairs: Set[Tuple[int, int]] = set()
+        for house_id, visitors in visitors_by_house.items():
+            owner = owners.get(house_id)
+            if owner not in self.agents:
+                continue
+            ids = [agent_id for agent_id in sorted(visitors) if agent_id != owner]
+            if not ids:
+                continue
+            # Строка k: моменты, когда гость k в доме и хозяин дома
+            present = np.zeros((len(ids), self.max_time + 1), dtype=bool)
+            for row, agent_id in zip(present, ids):
+                for there in visitors[agent_id]:
+                    row |= self._visit_ticks(agent_id, house_id, there)
+            present &= self._home_ticks(owner)
+            met_owner = present.any(axis=1)
+            for agent_id, met in zip(ids, met_owner):
+                if met:
+                    pairs.add((min(agent_id, owner), max(agent_id, owner)))
+            if len(ids) > 1:
+                counts = present.astype(np.float32)
+                together = (counts @ counts.T) > 0
+                for a, b in zip(*np.nonzero(np.triu(together, 1))):
+                    pairs.add((ids[a], ids[b]))
+            del present
+        self._meeting_pairs = pairs
+        return pairs
+
+    def meeting_groups(self) -> List[List[int]]:
+        """Группы агентов, связанные возможными встречами; знания не выходят за пределы группы"""
+        parent = {agent_id: agent_id for agent_id in self.agents}
+
+        def find(x: int) -> int:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        for a, b in self.meeting_pairs():
+            ra, rb = find(a), find(b)
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+        groups: Dict[int, List[int]] = {}
+        for agent_id in sorted(self.agents):
+            groups.setdefault(find(agent_id), []).append(agent_id)
+        return sorted(groups.values())
+
+    def unreachable_pairs(self) -> List[Tuple[int, int]]:
+        """Пары агентов, которые никогда не узнают друг о друге напрямую"""
+        pairs = self.meeting_pairs()
+        ids = sorted(self.agents)
+        return [(a, b) for i, a in enumerate(ids) for b in ids[i + 1:] if (a, b) not in pairs]
+
+    def full_knowledge_feasible(self) -> bool:
+        """Может ли каждый агент узнать о каждом (все пары способны встретиться)"""
+        n = len(self.agents)
+        return len(self.meeting_pairs()) == n * (n - 1) // 2
+
+    def report(self) -> str:
+        """Текстовый отчет по географии"""
+        lines = ["=" * 50, "АНАЛИЗ ГЕОГРАФИИ", "=" * 50, ""]
+        lines.append(f"Домов: {self.graph.num_houses}, маршрутов: {self.graph.num_routes}")
+        components = self.connected_components()
+        lines.append(f"Компонент сильной связности: {len(components)}")
+        if len(components) > 1:
+            for component in components:
+                lines.append(f"  {component}")
+
+        if self.agents:
+            lines.append("\nКлассы чётности (НОД поездок туда и обратно -> агенты):")
+            for g, members in sorted(self.parity_classes().items()):
+                lines.append(f"  {g}: {members}")
+
+            n = len(self.agents)
+            pairs = self.meeting_pairs()
+            lines.append(f"\nПар, способных встретиться до t={self.max_time}: {len(pairs)} из {n * (n - 1) // 2}")
+            groups = self.meeting_groups()
+            if len(groups) > 1:
+                lines.append(f"Агенты делятся на {len(groups)} изолированные группы:")
+                for group in groups:
+                    lines.append(f"  {group}")
+            missing = self.unreachable_pairs()
+            if missing:
+                shown = ", ".join(f"{a}-{b}" for a, b in missing[:20])
+                more = f" и ещё {len(missing) - 20}" if len(missing) > 20 else ""
+                lines.append(f"Никогда не встретятся: {shown}{more}")
+            verdict = "достижимо" if self.full_knowledge_feasible() else "недостижимо"
+            lines.append(f"Полное знание: {verdict}")
+            if any(agent.house_exchange_prob > 0 for agent in self.agents.values()):
+                lines.append("(оценка для исходных владельцев домов: обмены домами её меняют)")
+        return "\n".join(lines)
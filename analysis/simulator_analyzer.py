@@ -1,118 +1,67 @@
+from typing import Optional
+
+import numpy as np
+
+from loaders.event_log import EVENT_TYPES, EVENT_TYPE_CODES
+from loaders.knowledge_snapshot import KnowledgeSnapshot
+from loaders.observer_log import load_observer_log
+
+
 class SimulationAnalyzer:
-    def __init__(self, log_file_path: str):
+    def __init__(self, log_file_path: str, knowledge_path: Optional[str] = None, use_cache: bool = True):
         self.log_file_path = log_file_path
-        self.events_data = None
-        self.knowledge_data = None
+        self.knowledge_path = knowledge_path
+        self.use_cache = use_cache
+        self.events = None
+        self.knowledge: Optional[KnowledgeSnapshot] = None
         self.load_data()
 
     def load_data(self):
-        """Загружает и парсит лог-файл симуляции"""
-        events = []
-        knowledge_section = False
-        knowledge_data = []
-
-        with open(self.log_file_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-
-                if line == "---- KNOWLEDGE ----":
-                    knowledge_section = True
-                    continue
-
-                if knowledge_section:
-                    if ';' in line:
-                        agent_id, knowledge_str = line.split(';', 1)
-                        knowledge_data.append({
-                            'agent_id': int(agent_id),
-                            'knowledge': knowledge_str
-                        })
-                else:
-                    if line and ';' in line:
-                        parts = line.split(';')
-                        if len(parts) >= 3:
-                            event_data = {
-                                'event_number': int(parts[0]),
-                                'time': int(parts[1]),
-                                'event_type': parts[2]
-                            }
-
-                            # Парсинг специфичных данных для каждого типа события
-                            if event_data['event_type'] == 'StartTrip':
-                                event_data.update({
-                                    'nationality': parts[3],
-                                    'from_house': int(parts[4]),
-                                    'to_house': int(parts[5])
-                                })
-                            elif event_data['event_type'] == 'FinishTrip':
-                                if len(parts) == 6:  # Поездка с результатом (успех/неуспех)
-                                    event_data.update({
-                                        'success': int(parts[3]),
-                                        'nationality': parts[4],
-                                        'house_id': int(parts[5])
-                                    })
-                                else:  # Возвращение домой
-                                    event_data.update({
-                                        'nationality': parts[3],
-                                        'house_id': int(parts[4])
-                                    })
-                            elif event_data['event_type'] == 'changeHouse':
-                                event_data.update({
-                                    'qty_participants': int(parts[3]),
-                                    'nationalities': parts[4:4+int(parts[3])],
-                                    'houses_after': [int(x) for x in parts[4+int(parts[3]):]]
-                                })
-                            elif event_data['event_type'] == 'ChangePet':
-                                event_data.update({
-                                    'qty_participants': int(parts[3]),
-                                    'nationalities': parts[4:4+int(parts[3])],
-                                    'pets_after': parts[4+int(parts[3]):]
-                                })
-
-                            events.append(event_data)
-
-        self.events_data = events
-        self.knowledge_data = knowledge_data
-    
-    
+        """
+        Загружает лог симуляции в колонки NumPy (observer.csv через кэш разбора или каталог observer.evlog)
+        и снимок знаний (каталог knowledge_path или секция KNOWLEDGE старых логов)
+        """
+        log = load_observer_log(self.log_file_path, self.use_cache)
+        self.events = log.events
+        for agent_id, error in log.knowledge_errors:
+            print(f"Агент {agent_id}: ошибка парсинга знаний - {error}")
+
+        if self.knowledge_path is not None:
+            self.knowledge = KnowledgeSnapshot.open(self.knowledge_path)
+        else:
+            self.knowledge = log.knowledge
+
+    def _type_counts(self) -> np.ndarray:
+        return np.bincount(self.events['event_type'], minlength=len(EVENT_TYPES))
+
     def plot_cumulative_events_by_type(self):
         """Создает график нарастающего итога количества событий по типам"""
-        import numpy as np
         import matplotlib.pyplot as plt
-        
+
         plt.figure(figsize=(14, 8))
 
         event_types = ['StartTrip', 'changeHouse', 'ChangePet']
         colors = ['purple', 'darkblue', 'darkred']
         labels = ['Start Trips', 'House Exchanges', 'Pet Exchanges']
 
-        times = np.array([event['time'] for event in self.events_data])
-        time_range = range(int(np.min(times)), int(np.max(times)) + 1)
+        times = np.asarray(self.events['time'], dtype=np.int64)
+        codes = np.asarray(self.events['event_type'])
+        min_time = int(np.min(times))
+        max_time = int(np.max(times))
+        time_range = range(min_time, max_time + 1)
+        offsets = times - min_time
 
         line_styles = ['-', '-', '-']
 
         for i, (event_type, color, label) in enumerate(zip(event_types, colors, labels)):
-            cumulative = []
-            current_sum = 0
-
-            for t in time_range:
-                # Считаем события этого типа в данный момент времени
-                count_at_time = sum(1 for event in self.events_data
-                                   if event['event_type'] == event_type and event['time'] == t)
-                current_sum += count_at_time
-                cumulative.append(current_sum)
-
+            # Количество событий этого типа в каждый момент времени, затем нарастающий итог
+            mask = codes == EVENT_TYPE_CODES[event_type]
+            cumulative = np.cumsum(np.bincount(offsets[mask], minlength=len(time_range)))
             plt.step(time_range, cumulative, color=color, linewidth=1, linestyle=line_styles[i],
                     where='post', label=label, alpha=1.0)
 
         # Общий кумулятивный итог всех событий - используем полный временной диапазон
-        total_cumulative = []
-        current_total = 0
-
-        for t in time_range:
-            # Считаем все события в данный момент времени
-            count_at_time = sum(1 for event in self.events_data if event['time'] == t)
-            current_total += count_at_time
-            total_cumulative.append(current_total)
+        total_cumulative = np.cumsum(np.bincount(offsets, minlength=len(time_range)))
 
         plt.step(time_range, total_cumulative, color='darkgreen', linewidth=1,
                 linestyle='-', where='post', label='All Events', alpha=1.0)
@@ -123,8 +72,6 @@ class SimulationAnalyzer:
         plt.grid(True, alpha=0.3)
 
         # Устанавливаем метки времени кратными 100
-        min_time = int(np.min(times))
-        max_time = int(np.max(times))
         rounded_max = ((max_time + 99) // 100) * 100
         ticks = list(range(0, rounded_max + 1, 100))
         plt.xticks(ticks)
@@ -133,115 +80,85 @@ class SimulationAnalyzer:
         plt.ylim(bottom=0)
         plt.tight_layout()
         plt.savefig('data/output_data/graphs/cumulative_events_graph.png', dpi=300, bbox_inches='tight')
-    
+
     def create_summary_report(self):
         """Создает сводный отчет по симуляции"""
-        import numpy as np
-        
         print()
         print("=" * 50)
         print("СВОДНЫЙ ОТЧЕТ ПО СИМУЛЯЦИИ")
         print("=" * 50)
         print()
 
-        print(f"Общее количество событий: {len(self.events_data)}")
+        total_events = len(self.events)
+        print(f"Общее количество событий: {total_events}")
 
         # Получаем временной диапазон
-        times = np.array([event['time'] for event in self.events_data])
+        times = self.events['time']
         print(f"Временной диапазон: от {int(np.min(times))} до {int(np.max(times))}")
 
         print("\nРаспределение по типам событий:")
-        event_types = [event['event_type'] for event in self.events_data]
-        unique_types, counts = np.unique(event_types, return_counts=True)
-        for event_type, count in zip(unique_types, counts):
-            percentage = count / len(self.events_data) * 100
-            print(f"  {event_type}: {count} событий ({percentage:.1f}%)")
-
-        start_trips = [event for event in self.events_data if event['event_type'] == 'StartTrip']
-        finish_trips = [event for event in self.events_data if event['event_type'] == 'FinishTrip']
-
-        if start_trips:
+        counts = self._type_counts()
+        # Тот же порядок, что у np.unique по названиям типов
+        for event_type in sorted(EVENT_TYPES):
+            count = int(counts[EVENT_TYPE_CODES[event_type]])
+            if count:
+                percentage = count / total_events * 100
+                print(f"  {event_type}: {count} событий ({percentage:.1f}%)")
+
+        start_count = int(counts[EVENT_TYPE_CODES['StartTrip']])
+        finish_count = int(counts[EVENT_TYPE_CODES['FinishTrip']])
+
+        if start_count:
             print(f"\nАнализ поездок:")
-            print(f"  Начато поездок: {len(start_trips)}")
-            print(f"  Завершено поездок: {len(finish_trips)}")
+            print(f"  Начато поездок: {start_count}")
+            print(f"  Завершено поездок: {finish_count}")
 
-            successful_trips = [event for event in finish_trips if 'success' in event]
-            successful_count = sum(event['success'] for event in successful_trips)
-            total_with_success = len(successful_trips)
+            # success >= 0 только у поездок с результатом, у возвращений домой -1
+            success = self.events['success']
+            with_result = (self.events['event_type'] == EVENT_TYPE_CODES['FinishTrip']) & (success >= 0)
+            total_with_success = int(np.count_nonzero(with_result))
+            successful_count = int(np.sum(success[with_result], dtype=np.int64))
 
             if total_with_success > 0:
                 success_rate = successful_count / total_with_success * 100
                 print(f"  Успешных поездок: {successful_count} ({success_rate:.1f}%)")
                 print(f"  Поездок с результатом (успех/неуспех): {total_with_success}")
 
-        exchanges = [event for event in self.events_data if event['event_type'] in ['changeHouse', 'ChangePet']]
-        if exchanges:
+        house_count = int(counts[EVENT_TYPE_CODES['changeHouse']])
+        pet_count = int(counts[EVENT_TYPE_CODES['ChangePet']])
+        if house_count or pet_count:
             print(f"\nАнализ обменов:")
-            house_exchanges = [event for event in exchanges if event['event_type'] == 'changeHouse']
-            pet_exchanges = [event for event in exchanges if event['event_type'] == 'ChangePet']
-            print(f"  Обменов домами: {len(house_exchanges)}")
-            print(f"  Обменов питомцами: {len(pet_exchanges)}")
-
-            if exchanges and 'qty_participants' in exchanges[0]:
-                participants = [event['qty_participants'] for event in exchanges if 'qty_participants' in event]
-                if participants:
-                    avg_participants = np.mean(participants)
-                    print(f"  Среднее количество участников в обменах: {avg_participants:.1f}")
-    
+            print(f"  Обменов домами: {house_count}")
+            print(f"  Обменов питомцами: {pet_count}")
+
+            exchanges = self.events.type_mask('changeHouse') | self.events.type_mask('ChangePet')
+            avg_participants = np.mean(self.events['participants_count'][exchanges])
+            print(f"  Среднее количество участников в обменах: {avg_participants:.1f}")
+
     def analyze_knowledge_evolution(self):
         """Анализирует эволюцию знаний агентов (если данные доступны)"""
-        if self.knowledge_data:
-            print("\nЗнания агентов:")            
+        if self.knowledge is not None and len(self.knowledge):
+            print("\nЗнания агентов:")
             print()
 
-            total_known_others = 0
-            total_knowledge_entries = 0
-            agents_knowing_self = 0
-
-            for knowledge_entry in self.knowledge_data:
-                agent_id = knowledge_entry['agent_id']
-                knowledge_str = knowledge_entry['knowledge']
-
-                try:
-                    knowledge_dict = eval(knowledge_str)
-
-                    knows_self = agent_id in knowledge_dict
-                    if knows_self:
-                        agents_knowing_self += 1
-                        self_info = knowledge_dict[agent_id]
-                        if isinstance(self_info, dict):
-                            pet = self_info.get('pet', 'unknown')
-                            house = self_info.get('house', 'unknown')
-                            location = self_info.get('location', 'unknown')
-                            timestamp = self_info.get('t', 'unknown')
-                            other_known = [(k, v) for k, v in knowledge_dict.items() if k != agent_id]
-                            suffix = "\nДругие известные островитяне:" if other_known else ""
-                            print(f"Агент {agent_id} знает о себе: pet={pet}, house={house}, location={location}, t={timestamp}{suffix}")
-
-                    # Считаем сколько других агентов знает этот агент
-                    known_others = len(knowledge_dict) - (1 if knows_self else 0)
-                    total_known_others += known_others
-                    total_knowledge_entries += sum(len(info) for info in knowledge_dict.values()
-                                                  if isinstance(info, dict))
-
-                
-                    # Показываем детали для всех известных агентов (исключая себя)
-                    for known_agent_id, info in other_known:
-                        if isinstance(info, dict):
-                            pet = info.get('pet', 'unknown')
-                            house = info.get('house', 'unknown')
-                            location = info.get('location', 'unknown')
-                            timestamp = info.get('t', 'unknown')
-                            print(f"  Агент {known_agent_id}: pet={pet}, house={house}, location={location}, t={timestamp}")
-
-                except (SyntaxError, ValueError) as e:
-                    print(f"Агент {agent_id}: ошибка парсинга знаний - {e}")
+            for agent_id, knowledge_dict in self.knowledge.items():
+                other_known = [(k, v) for k, v in knowledge_dict.items() if k != agent_id]
+
+                if agent_id in knowledge_dict:
+                    self_info = knowledge_dict[agent_id]
+                    suffix = "\nДругие известные островитяне:" if other_known else ""
+                    print(f"Агент {agent_id} знает о себе: pet={self_info['pet']}, house={self_info['house']}, "
+                          f"location={self_info['location']}, t={self_info['t']}{suffix}")
+
+                # Показываем детали для всех известных агентов (исключая себя)
+                for known_agent_id, info in other_known:
+                    print(f"  Агент {known_agent_id}: pet={info['pet']}, house={info['house']}, "
+                          f"location={info['location']}, t={info['t']}")
 
             # Общая статистика
-            if self.knowledge_data:
-                avg_known_others = total_known_others / len(self.knowledge_data)
-                print(f"\nСреднее количество известных других агентов на агента: {avg_known_others:.1f}")
-                print()
+            avg_known_others = np.mean(self.knowledge.known_others())
+            print(f"\nСреднее количество известных других агентов на агента: {avg_known_others:.1f}")
+            print()
 
     def run_complete_analysis(self):
         """Запускает полный анализ"""
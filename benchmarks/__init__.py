@@ -0,0 +1,16 @@
+# Benchmarks: python -m benchmarks run / compare
+from .scenarios import Scenario, default_scenarios
+from .runner import measure, run_scenario, run_suite, compare_records, format_comparison, load_history
+from .stats import welch_t_test
+
+__all__ = [
+    'Scenario',
+    'default_scenarios',
+    'measure',
+    'run_scenario',
+    'run_suite',
+    'compare_records',
+    'format_comparison',
+    'load_history',
+    'welch_t_test',
+]
@@ -0,0 +1,75 @@
+import argparse
+import fnmatch
+import sys
+
+from benchmarks.runner import (BASELINE_PATH, CACHE_DIR, HISTORY_PATH, append_history, compare_records,
+                               format_comparison, load_history, load_record, run_suite, save_record)
+from benchmarks.scenarios import GEOGRAPHIES, SIZES, default_scenarios
+
+
+def _select(history_path: str, commit: str) -> dict:
+    history = load_history(history_path)
+    if not commit:
+        return history[-1]
+    for record in reversed(history):
+        if record.get('commit') == commit or record.get('label') == commit:
+            return record
+    raise SystemExit(f"No history entry for {commit!r} in {history_path}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Zebra Puzzle benchmarks")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help="measure the scenarios and append the results to the history file")
+    run.add_argument('--repeat', type=int, default=5, help="measurements per scenario (default 5)")
+    run.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+    run.add_argument('--geographies', nargs='+', default=list(GEOGRAPHIES), choices=GEOGRAPHIES)
+    run.add_argument('--filter', default='*', help="glob on scenario names, e.g. 'ring-*'")
+    run.add_argument('--quick', action='store_true', help="only sizes up to 1000")
+    run.add_argument('--label', default='', help="free text stored with the results")
+    run.add_argument('--history', default=HISTORY_PATH)
+    run.add_argument('--cache', default=CACHE_DIR, help="directory for generated scenario files")
+    run.add_argument('--save-baseline', action='store_true', help="also store the results as the baseline")
+    run.add_argument('--baseline', default=BASELINE_PATH)
+
+    baseline = sub.add_parser('baseline', help="store a history entry as the baseline")
+    baseline.add_argument('entry', nargs='?', default='', help="commit or label (default: latest entry)")
+    baseline.add_argument('--history', default=HISTORY_PATH)
+    baseline.add_argument('--baseline', default=BASELINE_PATH)
+
+    compare = sub.add_parser('compare', help="compare a history entry with the baseline; exit code 1 on regressions")
+    compare.add_argument('entry', nargs='?', default='', help="commit or label (default: latest entry)")
+    compare.add_argument('--history', default=HISTORY_PATH)
+    compare.add_argument('--baseline', default=BASELINE_PATH)
+    compare.add_argument('--alpha', type=float, default=0.05, help="significance level (default 0.05)")
+    compare.add_argument('--min-change', type=float, default=0.05,
+                         help="smallest relative change reported as a regression (default 0.05)")
+    compare.add_argument('--regressions', action='store_true', help="print only regressed metrics")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        sizes = [n for n in args.sizes if n <= 1000] if args.quick else args.sizes
+        scenarios = [s for s in default_scenarios(sizes, args.geographies) if fnmatch.fnmatch(s.name, args.filter)]
+        if not scenarios:
+            print("No scenarios match")
+            return 1
+        record = run_suite(scenarios, args.repeat, args.label, args.cache, progress=print)
+        append_history(record, args.history)
+        if args.save_baseline:
+            save_record(record, args.baseline)
+        return 0
+
+    if args.command == 'baseline':
+        save_record(_select(args.history, args.entry), args.baseline)
+        return 0
+
+    rows = compare_records(load_record(args.baseline), _select(args.history, args.entry),
+                           args.alpha, args.min_change)
+    print(format_comparison(rows, args.regressions))
+    return 1 if any(row['regression'] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
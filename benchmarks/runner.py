@@ -0,0 +1,230 @@
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from benchmarks.scenarios import BASE_DIR, Scenario
+from benchmarks.stats import mean_and_variance, welch_t_test
+
+# Metric -> True if larger is better. "events" is the workload itself and is
+# compared for equality: a different count means the versions did not
+# simulate the same thing, so their timings are not comparable either.
+METRICS = {
+    'load_time': False,
+    'init_time': False,
+    'run_time': False,
+    'events_per_s': True,
+    'analyzer_time': False,
+    'knowledge_log_time': False,
+    'peak_rss_mb': False,
+}
+
+RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks', 'results')
+HISTORY_PATH = os.path.join(RESULTS_DIR, 'history.jsonl')
+BASELINE_PATH = os.path.join(RESULTS_DIR, 'baseline.json')
+CACHE_DIR = os.path.join(RESULTS_DIR, 'scenarios')
+
+
+def _peak_rss_mb() -> float:
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(paths: Dict[str, str], max_time: int, work_dir: str, seed: int = 1) -> Dict[str, float]:
+    """
+    One measurement: load the inputs, run the simulation with observer.csv
+    and a knowledge snapshot as main.py does, then analyze the logs.
+
+    Meant to run in a fresh process (see run_scenario), so that the peak RSS
+    belongs to this scenario alone.
+    """
+    from analysis import SimulationAnalyzer
+    from knowledge_logging import KnowledgeLogAnalyzer
+    from loaders.csv_utils import count_houses, load_initial_data, load_strategies, load_travel_graph
+    from loaders.knowledge_snapshot import write_knowledge_snapshot
+    from simulation.environment import Environment
+    from simulation.sinks import FileSink
+
+    start = perf_counter()
+    strategies = load_strategies(paths['strategies'], count_houses(paths['agents']))
+    agents, houses = load_initial_data(paths['agents'], strategies=strategies)
+    graph = load_travel_graph(paths['geo'])
+    load_time = perf_counter() - start
+
+    start = perf_counter()
+    env = Environment(agents, houses, graph, max_time, seed=seed)
+    init_time = perf_counter() - start
+
+    log_path = os.path.join(work_dir, 'observer.csv')
+    start = perf_counter()
+    with FileSink(log_path) as sink:
+        env.run(max_time, sink=sink)
+    run_time = perf_counter() - start
+    events = env.event_counter - 1
+
+    knowledge_path = os.path.join(work_dir, 'knowledge.snapshot')
+    write_knowledge_snapshot(knowledge_path, env.agents)
+    del env, agents, houses
+
+    # The reports print per agent; only their cost matters here
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = perf_counter()
+        analyzer = SimulationAnalyzer(log_path, knowledge_path, use_cache=False)
+        analyzer.create_summary_report()
+        analyzer.analyze_knowledge_evolution()
+        analyzer_time = perf_counter() - start
+
+        start = perf_counter()
+        logs_dir = os.path.join(work_dir, 'knowledge_logs')
+        os.makedirs(logs_dir, exist_ok=True)
+        KnowledgeLogAnalyzer(log_path, paths['agents'], output_dir=logs_dir, log_format='delta').generate_knowledge_logs()
+        knowledge_log_time = perf_counter() - start
+
+    return {
+        'events': events,
+        'load_time': load_time,
+        'init_time': init_time,
+        'run_time': run_time,
+        'events_per_s': events / run_time if run_time > 0 else 0.0,
+        'analyzer_time': analyzer_time,
+        'knowledge_log_time': knowledge_log_time,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def run_scenario(scenario: Scenario, repeat: int = 5, cache_dir: str = CACHE_DIR, seed: int = 1) -> Dict[str, List[float]]:
+    """repeat measurements of scenario, each in a new process; metric -> list of values."""
+    paths = scenario.prepare(cache_dir)
+    samples: Dict[str, List[float]] = {}
+    for _ in range(repeat):
+        work_dir = tempfile.mkdtemp(prefix='zebra-bench-')
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                result = pool.submit(measure, paths, scenario.max_time, work_dir, seed).result()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        for metric, value in result.items():
+            samples.setdefault(metric, []).append(value)
+    return samples
+
+
+def _commit() -> Optional[str]:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                             capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def run_suite(scenarios: Sequence[Scenario], repeat: int = 5, label: str = '', cache_dir: str = CACHE_DIR,
+              progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Measures every scenario; the returned record is one line of the history file."""
+    results = {}
+    for scenario in scenarios:
+        samples = run_scenario(scenario, repeat, cache_dir)
+        results[scenario.name] = samples
+        if progress is not None:
+            mean, _ = mean_and_variance(samples['events_per_s'])
+            progress(f"{scenario.name:<16} {int(samples['events'][0]):>10} events  {mean:>12,.0f} ev/s  "
+                     f"{max(samples['peak_rss_mb']):>8.1f} MB")
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _commit(),
+        'label': label,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def append_history(record: Dict[str, Any], path: str = HISTORY_PATH) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+def load_history(path: str = HISTORY_PATH) -> List[Dict[str, Any]]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_record(record: Dict[str, Any], path: str) -> None:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(record, f, indent=1, sort_keys=True)
+
+
+def load_record(path: str) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_records(baseline: Dict[str, Any], current: Dict[str, Any], alpha: float = 0.05,
+                    min_change: float = 0.05) -> List[Dict[str, Any]]:
+    """
+    Per scenario and metric: the relative change of the mean and whether it is a regression.
+
+    A regression is a change in the bad direction of at least min_change
+    that a one-sided Welch's t-test finds significant at level alpha. With
+    fewer than two values on either side p is None and nothing is flagged.
+    """
+    rows = []
+    for name in sorted(set(baseline['results']) & set(current['results'])):
+        before, after = baseline['results'][name], current['results'][name]
+        if set(before.get('events', ())) != set(after.get('events', ())):
+            rows.append({'scenario': name, 'metric': 'events', 'before': before.get('events', [None])[0],
+                         'after': after.get('events', [None])[0], 'change': None, 'p': None, 'regression': False})
+        for metric, higher_is_better in METRICS.items():
+            if metric not in before or metric not in after:
+                continue
+            mean_before, _ = mean_and_variance(before[metric])
+            mean_after, _ = mean_and_variance(after[metric])
+            change = (mean_after - mean_before) / mean_before if mean_before else 0.0
+            p = None
+            if len(before[metric]) >= 2 and len(after[metric]) >= 2:
+                # Test the direction that makes things worse
+                if higher_is_better:
+                    _, _, p = welch_t_test(after[metric], before[metric])
+                else:
+                    _, _, p = welch_t_test(before[metric], after[metric])
+            worse = -change if higher_is_better else change
+            rows.append({
+                'scenario': name,
+                'metric': metric,
+                'before': mean_before,
+                'after': mean_after,
+                'change': change,
+                'p': p,
+                'regression': p is not None and p < alpha and worse >= min_change,
+            })
+    return rows
+
+
+def format_comparison(rows: Sequence[Dict[str, Any]], only_changes: bool = False) -> str:
+    lines = [f"{'scenario':<16}{'metric':<20}{'before':>12}{'after':>12}{'change':>9}{'p':>9}"]
+    for row in rows:
+        if row['metric'] == 'events':
+            lines.append(f"{row['scenario']:<16}{'events':<20}{row['before']:>12}{row['after']:>12}"
+                         f"  workload differs, timings not comparable")
+            continue
+        if only_changes and not row['regression']:
+            continue
+        p = f"{row['p']:>9.3f}" if row['p'] is not None else f"{'-':>9}"
+        flag = '  REGRESSION' if row['regression'] else ''
+        lines.append(f"{row['scenario']:<16}{row['metric']:<20}{row['before']:>12.4g}{row['after']:>12.4g}"
+                     f"{row['change'] * 100:>8.1f}%{p}{flag}")
+    return "\n".join(lines)
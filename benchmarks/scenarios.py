@@ -0,0 +1,62 @@
+import os
+from typing import Dict, List, Optional, Sequence
+
+from loaders.scenario_generator import generate_scenario
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIZES = (10, 100, 1000, 10000)
+GEOGRAPHIES = ('ring', 'star', 'complete', 'random')
+# Largest size per geography. A complete geography has N^2 routes, so its
+# files alone take gigabytes past 1000 houses; on a star every trip passes the
+# hub, where knowledge sync is quadratic in the crowd.
+SIZE_LIMITS = {'complete': 1000, 'star': 1000}
+# Horizon per size, so that every scenario runs for seconds rather than minutes
+MAX_TIME = {10: 2000, 100: 1000, 1000: 200, 10000: 40}
+
+
+class Scenario:
+    """One benchmark input: the bundled island or a generated one."""
+
+    def __init__(self, name: str, max_time: int, n: Optional[int] = None, geography: Optional[str] = None,
+                 strategy: str = 'random', seed: int = 0):
+        self.name = name
+        self.max_time = max_time
+        self.n = n
+        self.geography = geography
+        self.strategy = strategy
+        self.seed = seed
+
+    @property
+    def generated(self) -> bool:
+        return self.n is not None
+
+    def prepare(self, cache_dir: str) -> Dict[str, str]:
+        """Paths of agents, strategies and geo files; generated files are written once into cache_dir."""
+        if not self.generated:
+            input_dir = os.path.join(BASE_DIR, 'data', 'input_data')
+            return {
+                'agents': os.path.join(input_dir, 'zebra-01.csv'),
+                'strategies': os.path.join(input_dir, 'ZEBRA-strategies.csv'),
+                'geo': os.path.join(input_dir, 'ZEBRA-geo.csv'),
+            }
+        out_dir = os.path.join(cache_dir, f"{self.name}-s{self.seed}")
+        paths = {name: os.path.join(out_dir, f"{name}.csv") for name in ('agents', 'strategies', 'geo')}
+        if not all(os.path.exists(path) for path in paths.values()):
+            paths = generate_scenario(out_dir, self.n, self.geography, self.strategy, seed=self.seed)
+        return paths
+
+    def __repr__(self) -> str:
+        return f"Scenario({self.name!r}, max_time={self.max_time})"
+
+
+def default_scenarios(sizes: Sequence[int] = SIZES, geographies: Sequence[str] = GEOGRAPHIES) -> List[Scenario]:
+    """The bundled island, then every geography at every size up to its SIZE_LIMITS entry."""
+    scenarios = [Scenario('bundled', 2000)]
+    for n in sizes:
+        for geography in geographies:
+            if n > SIZE_LIMITS.get(geography, n):
+                continue
+            max_time = MAX_TIME.get(n, min(MAX_TIME.values()))
+            scenarios.append(Scenario(f"{geography}-{n}", max_time, n, geography))
+    return scenarios
@@ -0,0 +1,76 @@
+import math
+from typing import Sequence, Tuple
+
+
+# Welch's t-test without scipy: the Student t distribution function comes from
+# the regularized incomplete beta function, evaluated by its continued fraction.
+
+
+def _beta_continued_fraction(a: float, b: float, x: float, max_iter: int = 300, eps: float = 1e-14) -> float:
+    # Modified Lentz's method for the continued fraction of I_x(a, b)
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, max_iter + 1):
+        m2 = 2 * m
+        for numerator in (m * (b - m) * x / ((a + m2 - 1.0) * (a + m2)),
+                          -(a + m) * (a + b + m) * x / ((a + m2) * (a + m2 + 1.0))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < eps:
+            break
+    return h
+
+
+def regularized_beta(a: float, b: float, x: float) -> float:
+    """I_x(a, b) for 0 <= x <= 1."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    log_front = math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x)
+    # The continued fraction converges fast only below the mean of the distribution
+    if x < (a + 1.0) / (a + b + 2.0):
+        return math.exp(log_front) * _beta_continued_fraction(a, b, x) / a
+    return 1.0 - math.exp(log_front) * _beta_continued_fraction(b, a, 1.0 - x) / b
+
+
+def t_sf(t: float, df: float) -> float:
+    """P(T > t) for Student's t with df degrees of freedom."""
+    tail = 0.5 * regularized_beta(df / 2.0, 0.5, df / (df + t * t))
+    return tail if t > 0 else 1.0 - tail
+
+
+def mean_and_variance(values: Sequence[float]) -> Tuple[float, float]:
+    n = len(values)
+    mean = sum(values) / n
+    variance = sum((v - mean) ** 2 for v in values) / (n - 1) if n > 1 else 0.0
+    return mean, variance
+
+
+def welch_t_test(before: Sequence[float], after: Sequence[float]) -> Tuple[float, float, float]:
+    """
+    One-sided Welch's t-test of mean(after) > mean(before).
+
+    Returns (t, degrees of freedom, p-value). Needs at least two values on
+    each side; two constant samples give p = 0 if after is larger, else 1.
+    """
+    if len(before) < 2 or len(after) < 2:
+        raise ValueError("Welch's t-test needs at least two values per sample")
+    mean_a, var_a = mean_and_variance(before)
+    mean_b, var_b = mean_and_variance(after)
+    se2_a = var_a / len(before)
+    se2_b = var_b / len(after)
+    se2 = se2_a + se2_b
+    if se2 == 0.0:
+        if mean_b > mean_a:
+            return math.inf, math.inf, 0.0
+        return (-math.inf if mean_b < mean_a else 0.0), math.inf, 1.0
+    t = (mean_b - mean_a) / math.sqrt(se2)
+    df = se2 * se2 / (se2_a * se2_a / (len(before) - 1) + se2_b * se2_b / (len(after) - 1))
+    return t, df, t_sf(t, df)
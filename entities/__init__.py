@@ -1,6 +1,7 @@
 # Entities module
-from .agent import Agent
-from .house import House
-
-__all__ = ['Agent', 'House']
+from .agent import Agent, AgentBase
+from .house import House, HouseBase
+from .knowledge import KnowledgeObserver
+from .store import EntityStore, AgentView, HouseView
 
+__all__ = ['Agent', 'AgentBase', 'House', 'HouseBase', 'KnowledgeObserver', 'EntityStore', 'AgentView', 'HouseView']
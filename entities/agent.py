@@ -1,24 +1,38 @@
-from typing import Dict, Any
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 
+if TYPE_CHECKING:
+    from entities.knowledge import KnowledgeObserver, KnowledgeStore
+    from simulation.rng import BlockStream
 
-class Agent:
-    def __init__(self, agent_id: int, nationality: str, drink: str, cigarettes: str, pet: str,
-                 house_id: int, route_probs: Dict[int, int], house_exchange_prob: int, pet_exchange_prob: int):
-        self.id = agent_id
-        self.nationality = nationality
-        self.drink = drink
-        self.cigarettes = cigarettes
-        self.pet = pet
 
-        self.house_id = house_id
-        self.location = house_id
-        self.is_travelling = False
+class AgentBase:
+    """
+    Behaviour and object-side state of an agent.
 
+    The scalar fields (nationality, drink, cigarettes, pet, house_id,
+    location, is_travelling, house_exchange_prob, pet_exchange_prob) are
+    declared by the subclasses: slots on Agent, properties over an
+    EntityStore on AgentView.
+    """
+
+    __slots__ = ('id', '_trip_tables', '_trip_tables_source', '_route_probs', 'last_update_time',
+                 'knowledge_store', 'knowledge_observer', 'knowledge')
+    # Attributes that make up the pickled state; views over an EntityStore keep the scalar fields in its arrays
+    _state_fields = __slots__
+
+    def __init__(self, agent_id: int, route_probs: Dict[int, int]):
+        # The scalar fields must be readable already: the agent's first knowledge entry is about itself
+        self.id = agent_id
+        self._trip_tables: Dict[int, Tuple[List[int], List[int], int]] = {}
+        self._trip_tables_source: Optional[Tuple[Any, Any, Any]] = None
         self.route_probs = route_probs
-        self.house_exchange_prob = house_exchange_prob
-        self.pet_exchange_prob = pet_exchange_prob
         self.last_update_time = 0
 
+        # Set by KnowledgeStore, which then replaces `knowledge` with a read-only view
+        self.knowledge_store: Optional['KnowledgeStore'] = None
+        # Set by Environment when a knowledge observer is attached
+        self.knowledge_observer: Optional['KnowledgeObserver'] = None
         self.knowledge = {
             self.id: {
                 # "nationality": self.nationality,
@@ -31,6 +45,16 @@ class Agent:
             }
         }
 
+    def __getstate__(self) -> Dict[str, Any]:
+        state = {name: getattr(self, name) for name in self._state_fields}
+        # The observer belongs to the environment run, not to the agent's state
+        state['knowledge_observer'] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def _get_agent_info(self) -> Dict[str, Any]:
         return {
             # "nationality": self.nationality,
@@ -41,36 +65,69 @@ class Agent:
             "location": self.location
         }
 
-    def update_knowledge(self, other_agent: 'Agent', time: int) -> None:
-        self.knowledge[other_agent.id] = {**other_agent._get_agent_info(), "t": time}
+    def update_knowledge(self, other_agent: 'Agent', time: int) -> bool:
+        # True if other_agent was not known before
+        if self.knowledge_store is not None:
+            return self.knowledge_store.set_entry(self.id, other_agent.id, other_agent.pet, other_agent.house_id,
+                                                  other_agent.location, time)
+        info = {**other_agent._get_agent_info(), "t": time}
+        old = self.knowledge.get(other_agent.id)
+        if self.knowledge_observer is not None:
+            self.knowledge_observer.entry_updated(self.id, other_agent.id, old, info)
+        self.knowledge[other_agent.id] = info
+        return old is None
+
+    @property
+    def route_probs(self) -> Dict[int, int]:
+        return self._route_probs
+
+    @route_probs.setter
+    def route_probs(self, route_probs: Dict[int, int]) -> None:
+        self._route_probs = route_probs
+        self.invalidate_trip_tables()
 
-    def choose_trip_target(self, travel_matrix, houses, color_to_prob_index):
-        import random
-        possible_targets = [
-            h for h in range(1, len(travel_matrix))
-            if travel_matrix[self.location][h] is not None and h != self.location
-        ]
+    def invalidate_trip_tables(self) -> None:
+        # Must be called whenever house colors, the travel matrix or route_probs change in place
+        self._trip_tables.clear()
+
+    def _build_trip_table(self, travel_matrix, houses, color_to_prob_index) -> Tuple[List[int], List[int], int]:
+        if hasattr(travel_matrix, 'neighbors'):
+            # TravelGraph: only the routes out of the current location, O(degree)
+            targets = travel_matrix.neighbors(self.location)[0]
+        else:
+            targets = [
+                h for h in range(1, len(travel_matrix))
+                if travel_matrix[self.location][h] is not None and h != self.location
+            ]
+        cumulative = []
+        total = 0
+        for h in targets:
+            prob_index = color_to_prob_index.get(houses[h].color, 0)
+            total += self._route_probs.get(prob_index, 0)
+            cumulative.append(total)
+        return targets, cumulative, total
+
+    def choose_trip_target(self, travel_matrix, houses, color_to_prob_index, rng: 'BlockStream'):
+        source = self._trip_tables_source
+        if (source is None or source[0] is not travel_matrix or source[1] is not houses
+                or source[2] is not color_to_prob_index):
+            self._trip_tables.clear()
+            self._trip_tables_source = (travel_matrix, houses, color_to_prob_index)
+
+        table = self._trip_tables.get(self.location)
+        if table is None:
+            table = self._build_trip_table(travel_matrix, houses, color_to_prob_index)
+            self._trip_tables[self.location] = table
+        possible_targets, cumulative, total = table
 
         if not possible_targets:
             return None
 
-        weights = []
-        for h in possible_targets:
-            house_color = houses[h].color
-            prob_index = color_to_prob_index.get(house_color, 0)
-            weight = self.route_probs.get(prob_index, 0)
-            weights.append(weight)
+        if total == 0:
+            return possible_targets[int(rng.next() * len(possible_targets))]
 
-        if sum(weights) == 0:
-            return random.choice(possible_targets)
-
-        total = sum(weights)
-        rnd = random.uniform(0, total)
-        cumulative = 0
-        for h, w in zip(possible_targets, weights):
-            cumulative += w
-            if rnd <= cumulative:
-                return h
+        # First target whose cumulative weight reaches the draw
+        return possible_targets[bisect_left(cumulative, rng.next() * total)]
 
     def __repr__(self) -> str:
         loc = self.location if self.location == self.house_id else f"travel→{self.location}"
@@ -78,3 +135,23 @@ class Agent:
                 f"drink={self.drink}, cig={self.cigarettes}, pet={self.pet}, "
                 f"home={self.house_id}, loc={loc})")
 
+
+class Agent(AgentBase):
+    __slots__ = ('nationality', 'drink', 'cigarettes', 'pet', 'house_id', 'location', 'is_travelling',
+                 'house_exchange_prob', 'pet_exchange_prob')
+    _state_fields = AgentBase._state_fields + __slots__
+
+    def __init__(self, agent_id: int, nationality: str, drink: str, cigarettes: str, pet: str,
+                 house_id: int, route_probs: Dict[int, int], house_exchange_prob: int, pet_exchange_prob: int):
+        self.nationality = nationality
+        self.drink = drink
+        self.cigarettes = cigarettes
+        self.pet = pet
+
+        self.house_id = house_id
+        self.location = house_id
+        self.is_travelling = False
+
+        self.house_exchange_prob = house_exchange_prob
+        self.pet_exchange_prob = pet_exchange_prob
+        super().__init__(agent_id, route_probs)
@@ -1,23 +1,66 @@
-class House:
-    def __init__(self, house_id: int, color: str, owner_id: int):
+from bisect import insort
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from simulation.occupancy import OccupancyIndex
+
+
+class HouseBase:
+    """
+    Behaviour and object-side state of a house; color and owner_id are
+    declared by the subclasses (slots on House, properties on HouseView).
+    """
+
+    __slots__ = ('id', 'occupants', 'occupancy')
+    _state_fields = __slots__
+
+    def __init__(self, house_id: int):
         self.id = house_id
+        # Present agents, kept sorted for exchange detection
+        self.occupants: List[int] = []
+        self.occupancy: Optional['OccupancyIndex'] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self._state_fields}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def set_owner(self, new_owner_id: int) -> None:
+        self.owner_id = new_owner_id
+
+    def __repr__(self) -> str:
+        return (f"House(id={self.id}, color={self.color}, "
+                f"owner={self.owner_id}, present={list(self.present_agents)})")
+
+
+class House(HouseBase):
+    __slots__ = ('color', 'owner_id', 'present_agents')
+    _state_fields = HouseBase._state_fields + __slots__
+
+    def __init__(self, house_id: int, color: str, owner_id: int):
+        super().__init__(house_id)
         self.color = color
         self.owner_id = owner_id
+        # Same agents as occupants, for O(1) membership tests
         self.present_agents = set()
 
     def enter(self, agent_id: int) -> None:
+        if agent_id in self.present_agents:
+            return
         self.present_agents.add(agent_id)
+        insort(self.occupants, agent_id)
+        if self.occupancy is not None:
+            self.occupancy.entered(self)
 
     def leave(self, agent_id: int) -> None:
+        if agent_id not in self.present_agents:
+            return
         self.present_agents.discard(agent_id)
-
-    def set_owner(self, new_owner_id: int) -> None:
-        self.owner_id = new_owner_id
+        self.occupants.remove(agent_id)
+        if self.occupancy is not None:
+            self.occupancy.left(self)
 
     def is_owner_home(self) -> bool:
         return self.owner_id in self.present_agents
-
-    def __repr__(self) -> str:
-        return (f"House(id={self.id}, color={self.color}, "
-                f"owner={self.owner_id}, present={list(self.present_agents)})")
-
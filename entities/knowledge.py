@@ -0,0 +1,203 @@
+from collections.abc import Mapping
+from numbers import Integral
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Any
+
+import numpy as np
+
+from entities.store import EntityStore, StringTable
+
+if TYPE_CHECKING:
+    from entities.agent import Agent
+
+
+class KnowledgeObserver:
+    """
+    Receives knowledge changes while the simulation runs.
+
+    entry_updated is called from Agent.update_knowledge and KnowledgeStore
+    writes with the previous entry (None if the subject was unknown) and the
+    new one. KnowledgeStore.record reports refreshes that only move 't'
+    together through entries_refreshed instead. The environment
+    calls flush at the end of each phase of a batch with a label of what
+    caused the changes: "ChangeHouse", "FinishTrip" or "ChangePet".
+    """
+
+    def attach(self, agents: Dict[int, 'Agent'], time: int) -> None:
+        pass
+
+    def entry_updated(self, observer_id: int, subject_id: int, old: Optional[Dict[str, Any]],
+                      new: Dict[str, Any]) -> None:
+        pass
+
+    def entries_refreshed(self, observer_ids: np.ndarray, subject_ids: np.ndarray, t: int) -> None:
+        pass
+
+    def flush(self, time: int, label: str) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> 'KnowledgeObserver':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class KnowledgeStore:
+    """
+    Knowledge of all agents in N×N arrays indexed by [observer, subject].
+
+    Alternative to the per-agent dict-of-dicts: a meeting of k agents is one
+    fancy-indexed assignment instead of k² dict allocations. Pets are stored as
+    codes into the pets StringTable. `order` remembers when an entry was first learned, so
+    the dict projection keeps the same key order as the dict backend.
+    """
+
+    def __init__(self, agents: Dict[int, 'Agent']):
+        size = max(agents) + 1
+        # Agents kept in an EntityStore share its pet codes, so record() copies them from its arrays
+        self.entities = EntityStore.of(agents)
+        self.pets = self.entities.pets if self.entities is not None else StringTable()
+        self.pet = np.full((size, size), -1, dtype=np.int32)
+        self.house = np.zeros((size, size), dtype=np.int32)
+        self.location = np.zeros((size, size), dtype=np.int32)
+        self.t = np.zeros((size, size), dtype=np.int32)
+        self.known = np.zeros((size, size), dtype=bool)
+        self.order = np.zeros((size, size), dtype=np.int64)
+        self.known_count = np.zeros(size, dtype=np.int64)
+        self._next_order = 0
+        self.observer: Optional[KnowledgeObserver] = None
+
+        # Take over whatever the agents already know, then serve their knowledge from here
+        for agent in agents.values():
+            for subject_id, info in agent.knowledge.items():
+                self.set_entry(agent.id, subject_id, info['pet'], info['house'], info['location'], info['t'])
+            agent.knowledge_store = self
+            agent.knowledge = KnowledgeView(self, agent.id)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state['observer'] = None
+        return state
+
+    def set_entry(self, observer: int, subject: int, pet: str, house: int, location: int, t: int) -> bool:
+        """Stores one entry; True if observer did not know subject before."""
+        is_new = not self.known[observer, subject]
+        if self.observer is not None:
+            old = None if is_new else self.entry(observer, subject)
+            self.observer.entry_updated(observer, subject, old,
+                                        {'pet': pet, 'house': house, 'location': location, 't': t})
+        if is_new:
+            self.known[observer, subject] = True
+            self.order[observer, subject] = self._next_order
+            self._next_order += 1
+            self.known_count[observer] += 1
+        self.pet[observer, subject] = self.pets.code(pet)
+        self.house[observer, subject] = house
+        self.location[observer, subject] = location
+        self.t[observer, subject] = t
+        return is_new
+
+    def record(self, observer_ids: Sequence[int], subject_ids: Sequence[int], time: int,
+               agents: Dict[int, 'Agent']) -> int:
+        """
+        Every observer learns the current info of every subject (except itself) at `time`.
+
+        Returns the number of (observer, subject) pairs that were not known before.
+        """
+        k_obs = len(observer_ids)
+        k_sub = len(subject_ids)
+        if not k_obs or not k_sub:
+            return 0
+
+        if self.entities is not None:
+            pet, house, location = self.entities.agent_columns(subject_ids)
+        else:
+            subjects = [agents[subject_id] for subject_id in subject_ids]
+            pet = np.array([self.pets.code(s.pet) for s in subjects], dtype=np.int32)
+            house = np.array([s.house_id for s in subjects], dtype=np.int32)
+            location = np.array([s.location for s in subjects], dtype=np.int32)
+
+        # Row-major (observer, subject) pairs, the same order as the nested loops of the dict backend
+        rows = np.repeat(np.asarray(observer_ids, dtype=np.intp), k_sub)
+        cols = np.tile(np.asarray(subject_ids, dtype=np.intp), k_obs)
+        pos = np.tile(np.arange(k_sub), k_obs)
+        mask = rows != cols
+        rows, cols, pos = rows[mask], cols[mask], pos[mask]
+
+        new = ~self.known[rows, cols]
+        if self.observer is not None:
+            self._notify(rows, cols, new, pet[pos], house[pos], location[pos], time)
+        n_new = int(new.sum())
+        if n_new:
+            new_rows = rows[new]
+            self.known[new_rows, cols[new]] = True
+            self.order[new_rows, cols[new]] = np.arange(self._next_order, self._next_order + n_new)
+            self._next_order += n_new
+            np.add.at(self.known_count, new_rows, 1)
+
+        self.pet[rows, cols] = pet[pos]
+        self.house[rows, cols] = house[pos]
+        self.location[rows, cols] = location[pos]
+        self.t[rows, cols] = time
+        return n_new
+
+    def _notify(self, rows: np.ndarray, cols: np.ndarray, new: np.ndarray, pet: np.ndarray,
+                house: np.ndarray, location: np.ndarray, time: int) -> None:
+        # Only pairs that are new or whose pet/house/location is about to change
+        changed = new | (self.pet[rows, cols] != pet) | (self.house[rows, cols] != house) \
+            | (self.location[rows, cols] != location)
+        for i in np.flatnonzero(changed).tolist():
+            observer, subject = int(rows[i]), int(cols[i])
+            old = None if new[i] else self.entry(observer, subject)
+            self.observer.entry_updated(observer, subject, old, {
+                'pet': self.pets.names[pet[i]],
+                'house': int(house[i]),
+                'location': int(location[i]),
+                't': time,
+            })
+        refreshed = ~changed
+        if refreshed.any():
+            self.observer.entries_refreshed(rows[refreshed], cols[refreshed], time)
+
+    def entry(self, observer: int, subject: int) -> Dict[str, Any]:
+        return {
+            'pet': self.pets.names[self.pet[observer, subject]],
+            'house': int(self.house[observer, subject]),
+            'location': int(self.location[observer, subject]),
+            't': int(self.t[observer, subject]),
+        }
+
+    def known_subjects(self, observer: int) -> List[int]:
+        subjects = np.flatnonzero(self.known[observer])
+        return subjects[np.argsort(self.order[observer, subjects], kind='stable')].tolist()
+
+
+class KnowledgeView(Mapping):
+    """Lazy read-only dict projection of one observer's row of a KnowledgeStore."""
+
+    __slots__ = ('store', 'observer')
+
+    def __init__(self, store: KnowledgeStore, observer: int):
+        self.store = store
+        self.observer = observer
+
+    def __getitem__(self, subject: int) -> Dict[str, Any]:
+        if subject not in self:
+            raise KeyError(subject)
+        return self.store.entry(self.observer, subject)
+
+    def __contains__(self, subject: object) -> bool:
+        return (isinstance(subject, Integral) and 0 <= subject < len(self.store.known)
+                and bool(self.store.known[self.observer, subject]))
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.store.known_subjects(self.observer))
+
+    def __len__(self) -> int:
+        return int(self.store.known_count[self.observer])
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
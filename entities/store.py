@@ -0,0 +1,300 @@
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from entities.agent import Agent, AgentBase
+from entities.house import House, HouseBase
+
+
+class StringTable:
+    """Interned strings: every distinct value is stored once and referred to by its code."""
+
+    __slots__ = ('names', 'codes')
+
+    def __init__(self):
+        self.names: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def code(self, name: str) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.codes[name] = code
+            self.names.append(name)
+        return code
+
+
+class EntityStore:
+    """
+    Struct-of-arrays storage for agents and houses.
+
+    Every per-agent and per-house scalar lives in a typed array indexed by
+    id; strings are codes into StringTables. AgentView and HouseView are the
+    agent and house objects on top of it. They share AgentBase and HouseBase
+    with Agent and House, but the attributes below are properties over the
+    arrays rather than slots; everything else (route_probs, knowledge, trip
+    tables, occupants) stays on the view.
+
+    agents  nationality, drink, cigarettes, pet (codes), house_id, location,
+            is_travelling, house_exchange_prob, pet_exchange_prob
+    houses  color (code), owner_id
+
+    Per agent this replaces an instance __dict__ and four string objects by
+    about forty bytes of arrays; the arrays can be read as numpy views
+    (agent_columns) by loops that work on many agents at once.
+    """
+
+    def __init__(self):
+        self.nationalities = StringTable()
+        self.drinks = StringTable()
+        self.cigarettes = StringTable()
+        self.pets = StringTable()
+        self.colors = StringTable()
+
+        self.nationality = array('i')
+        self.drink = array('i')
+        self.cigarette = array('i')
+        self.pet = array('i')
+        self.house_id = array('i')
+        self.location = array('i')
+        self.is_travelling = array('b')
+        self.house_exchange_prob = array('i')
+        self.pet_exchange_prob = array('i')
+
+        self.color = array('i')
+        self.owner_id = array('i')
+
+    @staticmethod
+    def _reserve(columns: Sequence[array], index: int) -> None:
+        # Ids need not be contiguous: the arrays grow up to the largest id seen
+        missing = index + 1 - len(columns[0])
+        if missing > 0:
+            for column in columns:
+                column.frombytes(bytes(missing * column.itemsize))
+
+    def _agent_columns(self) -> Tuple[array, ...]:
+        return (self.nationality, self.drink, self.cigarette, self.pet, self.house_id, self.location,
+                self.is_travelling, self.house_exchange_prob, self.pet_exchange_prob)
+
+    def add_agent(self, agent_id: int, nationality: str, drink: str, cigarettes: str, pet: str, house_id: int,
+                  route_probs: Dict[int, int], house_exchange_prob: int, pet_exchange_prob: int) -> 'AgentView':
+        """Stores a new agent; same arguments as Agent."""
+        self._reserve(self._agent_columns(), agent_id)
+        self.nationality[agent_id] = self.nationalities.code(nationality)
+        self.drink[agent_id] = self.drinks.code(drink)
+        self.cigarette[agent_id] = self.cigarettes.code(cigarettes)
+        self.pet[agent_id] = self.pets.code(pet)
+        self.house_id[agent_id] = house_id
+        self.location[agent_id] = house_id
+        self.is_travelling[agent_id] = False
+        self.house_exchange_prob[agent_id] = house_exchange_prob
+        self.pet_exchange_prob[agent_id] = pet_exchange_prob
+        return AgentView(self, agent_id, route_probs)
+
+    def add_house(self, house_id: int, color: str, owner_id: int) -> 'HouseView':
+        self._reserve((self.color, self.owner_id), house_id)
+        self.color[house_id] = self.colors.code(color)
+        self.owner_id[house_id] = owner_id
+        return HouseView(self, house_id)
+
+    @classmethod
+    def from_entities(cls, agents: Dict[int, Agent], houses: Dict[int, House]) -> Tuple[Dict[int, 'AgentView'], Dict[int, 'HouseView']]:
+        """
+        Copies plain agents and houses into a new store and returns views of them.
+
+        The objects keep their state (location, knowledge, occupants), so this
+        works before the first run and between runs, but not once an
+        Environment has attached a KnowledgeStore to the agents.
+        """
+        store = cls()
+        new_houses = {}
+        for house_id, house in houses.items():
+            view = store.add_house(house_id, house.color, house.owner_id)
+            view.occupants = list(house.occupants)
+            new_houses[house_id] = view
+        new_agents = {}
+        for agent_id, agent in agents.items():
+            if agent.knowledge_store is not None:
+                raise ValueError("Agents already use a KnowledgeStore; convert them before creating the Environment")
+            view = store.add_agent(agent_id, agent.nationality, agent.drink, agent.cigarettes, agent.pet,
+                                   agent.house_id, dict(agent.route_probs), agent.house_exchange_prob,
+                                   agent.pet_exchange_prob)
+            view.location = agent.location
+            view.is_travelling = agent.is_travelling
+            view.last_update_time = agent.last_update_time
+            view.knowledge = {subject: dict(info) for subject, info in agent.knowledge.items()}
+            new_agents[agent_id] = view
+        return new_agents, new_houses
+
+    @staticmethod
+    def of(agents: Dict[int, Agent]) -> Optional['EntityStore']:
+        """The store behind agents if they are views, else None."""
+        for agent in agents.values():
+            return agent.entity_store if isinstance(agent, AgentView) else None
+        return None
+
+    def agent_columns(self, agent_ids: Sequence[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Pet codes, homes and locations of agent_ids as int32 arrays."""
+        index = np.asarray(agent_ids, dtype=np.intp)
+        return (np.frombuffer(self.pet, dtype=np.int32)[index],
+                np.frombuffer(self.house_id, dtype=np.int32)[index],
+                np.frombuffer(self.location, dtype=np.int32)[index])
+
+    def nbytes(self) -> int:
+        columns = self._agent_columns() + (self.color, self.owner_id)
+        return sum(len(column) * column.itemsize for column in columns)
+
+
+class AgentView(AgentBase):
+    """An agent whose scalar attributes live in an EntityStore; it has no slots for them."""
+
+    __slots__ = ('entity_store',)
+    _state_fields = AgentBase._state_fields + __slots__
+
+    def __init__(self, store: EntityStore, agent_id: int, route_probs: Dict[int, int]):
+        # The store already holds the row; only the object-side state is set here
+        self.entity_store = store
+        super().__init__(agent_id, route_probs)
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        # The store first: the other attributes may be properties over it
+        self.entity_store = state['entity_store']
+        super().__setstate__(state)
+
+    @property
+    def nationality(self) -> str:
+        return self.entity_store.nationalities.names[self.entity_store.nationality[self.id]]
+
+    @nationality.setter
+    def nationality(self, value: str) -> None:
+        self.entity_store.nationality[self.id] = self.entity_store.nationalities.code(value)
+
+    @property
+    def drink(self) -> str:
+        return self.entity_store.drinks.names[self.entity_store.drink[self.id]]
+
+    @drink.setter
+    def drink(self, value: str) -> None:
+        self.entity_store.drink[self.id] = self.entity_store.drinks.code(value)
+
+    @property
+    def cigarettes(self) -> str:
+        return self.entity_store.cigarettes.names[self.entity_store.cigarette[self.id]]
+
+    @cigarettes.setter
+    def cigarettes(self, value: str) -> None:
+        self.entity_store.cigarette[self.id] = self.entity_store.cigarettes.code(value)
+
+    @property
+    def pet(self) -> str:
+        return self.entity_store.pets.names[self.entity_store.pet[self.id]]
+
+    @pet.setter
+    def pet(self, value: str) -> None:
+        self.entity_store.pet[self.id] = self.entity_store.pets.code(value)
+
+    @property
+    def house_id(self) -> int:
+        return self.entity_store.house_id[self.id]
+
+    @house_id.setter
+    def house_id(self, value: int) -> None:
+        self.entity_store.house_id[self.id] = value
+
+    @property
+    def location(self) -> int:
+        return self.entity_store.location[self.id]
+
+    @location.setter
+    def location(self, value: int) -> None:
+        self.entity_store.location[self.id] = value
+
+    @property
+    def is_travelling(self) -> bool:
+        return self.entity_store.is_travelling[self.id] != 0
+
+    @is_travelling.setter
+    def is_travelling(self, value: bool) -> None:
+        self.entity_store.is_travelling[self.id] = value
+
+    @property
+    def house_exchange_prob(self) -> int:
+        return self.entity_store.house_exchange_prob[self.id]
+
+    @house_exchange_prob.setter
+    def house_exchange_prob(self, value: int) -> None:
+        self.entity_store.house_exchange_prob[self.id] = value
+
+    @property
+    def pet_exchange_prob(self) -> int:
+        return self.entity_store.pet_exchange_prob[self.id]
+
+    @pet_exchange_prob.setter
+    def pet_exchange_prob(self, value: int) -> None:
+        self.entity_store.pet_exchange_prob[self.id] = value
+
+
+class HouseView(HouseBase):
+    """
+    A house whose color and owner live in an EntityStore.
+
+    Presence is kept only in the sorted occupants list; present_agents is
+    built from it on request.
+    """
+
+    __slots__ = ('entity_store',)
+    _state_fields = HouseBase._state_fields + __slots__
+
+    def __init__(self, store: EntityStore, house_id: int):
+        self.entity_store = store
+        super().__init__(house_id)
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.entity_store = state['entity_store']
+        super().__setstate__(state)
+
+    @property
+    def color(self) -> str:
+        return self.entity_store.colors.names[self.entity_store.color[self.id]]
+
+    @color.setter
+    def color(self, value: str) -> None:
+        self.entity_store.color[self.id] = self.entity_store.colors.code(value)
+
+    @property
+    def owner_id(self) -> int:
+        return self.entity_store.owner_id[self.id]
+
+    @owner_id.setter
+    def owner_id(self, value: int) -> None:
+        self.entity_store.owner_id[self.id] = value
+
+    @property
+    def present_agents(self) -> frozenset:
+        return frozenset(self.occupants)
+
+    def enter(self, agent_id: int) -> None:
+        occupants = self.occupants
+        i = bisect_left(occupants, agent_id)
+        if i < len(occupants) and occupants[i] == agent_id:
+            return
+        occupants.insert(i, agent_id)
+        if self.occupancy is not None:
+            self.occupancy.entered(self)
+
+    def leave(self, agent_id: int) -> None:
+        occupants = self.occupants
+        i = bisect_left(occupants, agent_id)
+        if i == len(occupants) or occupants[i] != agent_id:
+            return
+        del occupants[i]
+        if self.occupancy is not None:
+            self.occupancy.left(self)
+
+    def is_owner_home(self) -> bool:
+        occupants = self.occupants
+        owner = self.owner_id
+        i = bisect_left(occupants, owner)
+        return i < len(occupants) and occupants[i] == owner
@@ -2,6 +2,7 @@
 from .base import Event, EVENT_PRIORITY_FINISH_TRIP, EVENT_PRIORITY_EXCHANGE, EVENT_PRIORITY_START_TRIP
 from .trip import StartTripEvent, FinishTripEvent
 from .exchange import ChangeHouseEvent, ChangePetEvent
+from .pool import TripEventPool
 
 __all__ = [
     'Event',
@@ -12,5 +13,6 @@ __all__ = [
     'FinishTripEvent',
     'ChangeHouseEvent',
     'ChangePetEvent',
+    'TripEventPool',
 ]
 
@@ -11,6 +11,10 @@ EVENT_PRIORITY_START_TRIP = 3
 
 
 class Event:
+    __slots__ = ('time', 'agent_id')
+
+    priority = EVENT_PRIORITY_START_TRIP
+
     def __init__(self, time: int, agent_id: Optional[int] = None):
         self.time = time
         self.agent_id = agent_id
@@ -18,6 +22,10 @@ class Event:
     def run(self, env: 'Environment') -> Tuple[List[int], List[int]]:
         return ([self.agent_id] if self.agent_id is not None else [], [])
 
+    def heap_key(self, seq: int) -> Tuple[int, int, int, int, 'Event']:
+        # Queue entries pop in processing order: time, priority, then scheduling order.
+        # seq is unique, so the event itself is never compared
+        return (self.time, self.priority, 0, seq, self)
+
     def __lt__(self, other: 'Event') -> bool:
         return self.time < other.time
-
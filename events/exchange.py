@@ -1,12 +1,16 @@
 from typing import TYPE_CHECKING, Tuple, Optional, List, Any
 
-from .base import Event
+from .base import Event, EVENT_PRIORITY_EXCHANGE
 
 if TYPE_CHECKING:
     from simulation.environment import Environment
 
 
 class ChangeHouseEvent(Event):
+    __slots__ = ('participant_ids', 'houses_after_exchange', 'qty_participants')
+
+    priority = EVENT_PRIORITY_EXCHANGE
+
     def __init__(self, time: int, participant_ids: List[int], houses_after_exchange: List[int]):
         super().__init__(time)
         self.participant_ids = participant_ids
@@ -27,7 +31,7 @@ class ChangeHouseEvent(Event):
         for agent_id, new_house_id in zip(self.participant_ids, self.houses_after_exchange):
             agent = env.agents[agent_id]
             agent.house_id = new_house_id
-            agent.knowledge[agent_id] = {**agent._get_agent_info(), "t": self.time}
+            agent.update_knowledge(agent, self.time)
             agent.last_update_time = self.time
 
         # Update house owners
@@ -35,13 +39,17 @@ class ChangeHouseEvent(Event):
             env.houses[new_house_id].set_owner(new_owner_id)
 
         # Update knowledge of all present agents about each other
-        present_agents = list(house.present_agents)
-        for agent_id in present_agents:
-            agent = env.agents[agent_id]
-            for other_id in present_agents:
-                if other_id != agent_id:
-                    other_agent = env.agents[other_id]
-                    agent.update_knowledge(other_agent, self.time)
+        present_agents = house.occupants
+        if env.knowledge_store is not None:
+            env.known_pairs += env.knowledge_store.record(present_agents, present_agents, self.time, env.agents)
+        else:
+            for agent_id in present_agents:
+                agent = env.agents[agent_id]
+                for other_id in present_agents:
+                    if other_id != agent_id:
+                        other_agent = env.agents[other_id]
+                        if agent.update_knowledge(other_agent, self.time):
+                            env.known_pairs += 1
 
         return self.participant_ids, []
 
@@ -52,6 +60,10 @@ class ChangeHouseEvent(Event):
 
 
 class ChangePetEvent(Event):
+    __slots__ = ('participant_ids', 'pets_after_exchange', 'qty_participants')
+
+    priority = EVENT_PRIORITY_EXCHANGE
+
     def __init__(self, time: int, participant_ids: List[int], pets_after_exchange: List[str]):
         super().__init__(time)
         self.participant_ids = participant_ids
@@ -71,13 +83,18 @@ class ChangePetEvent(Event):
         for agent_id, new_pet in zip(self.participant_ids, self.pets_after_exchange):
             agent = env.agents[agent_id]
             agent.pet = new_pet
-            agent.knowledge[agent_id] = {**agent._get_agent_info(), "t": self.time}
+            agent.update_knowledge(agent, self.time)
             agent.last_update_time = self.time
 
-        for witness_id in list(house.present_agents):
-            witness = env.agents[witness_id]
-            for participant_id in self.participant_ids:
-                witness.update_knowledge(env.agents[participant_id], self.time)
+        if env.knowledge_store is not None:
+            # Participants already refreshed their own entries above
+            env.known_pairs += env.knowledge_store.record(house.occupants, self.participant_ids, self.time, env.agents)
+        else:
+            for witness_id in house.occupants:
+                witness = env.agents[witness_id]
+                for participant_id in self.participant_ids:
+                    if witness.update_knowledge(env.agents[participant_id], self.time):
+                        env.known_pairs += 1
 
         return self.participant_ids, []
 
@@ -0,0 +1,48 @@
+from typing import Iterable, List
+
+from .base import Event
+from .trip import StartTripEvent, FinishTripEvent
+
+
+class TripEventPool:
+    """
+    Free lists of trip events.
+
+    Every trip allocates a StartTripEvent and a FinishTripEvent; once a batch
+    has been logged and planned, the Environment hands them back here and the
+    objects are reinitialised for later trips.
+    """
+
+    __slots__ = ('_start', '_finish')
+
+    def __init__(self):
+        self._start: List[StartTripEvent] = []
+        self._finish: List[FinishTripEvent] = []
+
+    def start_trip(self, time: int, agent_id: int, target_house: int) -> StartTripEvent:
+        if self._start:
+            event = self._start.pop()
+            event.time = time
+            event.agent_id = agent_id
+            event.target_house = target_house
+            return event
+        return StartTripEvent(time, agent_id, target_house)
+
+    def finish_trip(self, time: int, agent_id: int, target_house: int, agent_house_id: int) -> FinishTripEvent:
+        if self._finish:
+            event = self._finish.pop()
+            event.time = time
+            event.agent_id = agent_id
+            event.target_house = target_house
+            event.success = 0
+            event.is_return_home = (target_house == agent_house_id)
+            return event
+        return FinishTripEvent(time, agent_id, target_house, agent_house_id)
+
+    def release(self, events: Iterable[Event]) -> None:
+        for event in events:
+            cls = type(event)
+            if cls is FinishTripEvent:
+                self._finish.append(event)
+            elif cls is StartTripEvent:
+                self._start.append(event)
@@ -1,4 +1,3 @@
-import random
 from typing import TYPE_CHECKING, Tuple, Optional, List, Any
 
 from .base import Event, EVENT_PRIORITY_FINISH_TRIP, EVENT_PRIORITY_EXCHANGE, EVENT_PRIORITY_START_TRIP
@@ -9,6 +8,10 @@ if TYPE_CHECKING:
 
 
 class StartTripEvent(Event):
+    __slots__ = ('target_house',)
+
+    priority = EVENT_PRIORITY_START_TRIP
+
     def __init__(self, time: int, agent_id: int, target_house: int):
         super().__init__(time, agent_id)
         self.target_house = target_house
@@ -23,7 +26,7 @@ class StartTripEvent(Event):
 
         agent.is_travelling = True
 
-        travel_time = env.travel_matrix[agent.location][self.target_house]
+        travel_time = env.travel_graph.time(agent.location, self.target_house)
         if travel_time is None or travel_time < 0:
             agent.is_travelling = False
             return [], []
@@ -33,7 +36,7 @@ class StartTripEvent(Event):
             agent.is_travelling = False
             return [], []
 
-        finish_event = FinishTripEvent(arrival_time, agent.id, self.target_house, agent.house_id)
+        finish_event = env.trip_events.finish_trip(arrival_time, agent.id, self.target_house, agent.house_id)
         env.push_event(finish_event)
 
         return [agent.id], []
@@ -44,6 +47,10 @@ class StartTripEvent(Event):
 
 
 class FinishTripEvent(Event):
+    __slots__ = ('target_house', 'success', 'is_return_home')
+
+    priority = EVENT_PRIORITY_FINISH_TRIP
+
     def __init__(self, time: int, agent_id: int, target_house: int, agent_house_id: int):
         super().__init__(time, agent_id)
         self.target_house = target_house
@@ -73,16 +80,20 @@ class FinishTripEvent(Event):
 
         return [agent.id], [self.target_house]
 
+    def heap_key(self, seq: int) -> Tuple[int, int, int, int, Event]:
+        # Owners returning home are processed before visitors arriving at the same time
+        return (self.time, EVENT_PRIORITY_FINISH_TRIP, 0 if self.is_return_home else 1, seq, self)
+
     def detect_house_exchange(self, env: 'Environment', house: 'House') -> Optional['ChangeHouseEvent']:
-        present_agents = sorted(list(house.present_agents))
+        present_agents = house.occupants
         if len(present_agents) < 2:
             return None
 
-        ready_participants = []
-        for agent_id in present_agents:
-            agent = env.agents[agent_id]
-            if random.randint(1, 100) <= agent.house_exchange_prob:
-                ready_participants.append(agent_id)
+        draws = env.rng.house_exchange.take(len(present_agents))
+        ready_participants = [
+            agent_id for agent_id, draw in zip(present_agents, draws)
+            if draw <= env.agents[agent_id].house_exchange_prob
+        ]
 
         if len(ready_participants) < 2:
             return None
@@ -1,5 +1,20 @@
 # Logging module
 from .knowledge_logger import KnowledgeLogAnalyzer
+from .live_logger import LiveKnowledgeLogger
+from .log_writers import (
+    KnowledgeLogWriter,
+    ReprKnowledgeLogWriter,
+    DeltaKnowledgeLogWriter,
+    DeltaLogReader,
+    convert_delta_log,
+)
 
-__all__ = ['KnowledgeLogAnalyzer']
-
+__all__ = [
+    'KnowledgeLogAnalyzer',
+    'LiveKnowledgeLogger',
+    'KnowledgeLogWriter',
+    'ReprKnowledgeLogWriter',
+    'DeltaKnowledgeLogWriter',
+    'DeltaLogReader',
+    'convert_delta_log',
+]
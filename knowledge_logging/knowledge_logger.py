@@ -1,22 +1,45 @@
-import os
 import csv
 from collections import defaultdict
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, List, Any, Tuple, Optional, Set
+
+from loaders.event_log import EVENT_TYPES
+from loaders.observer_log import load_observer_log
+from .log_writers import MISSING, TRACKED_FIELDS, KnowledgeLogWriter, knowledge_changed, make_knowledge_log_writer
+
 
 class KnowledgeLogAnalyzer:
-    def __init__(self, observer_log_path: str, agents_csv_path: str, output_dir: str = "data/output_data/logs"):
+    """
+    Replays observer.csv and writes one knowledge log per agent.
+
+    The replay keeps a nationality -> id map, a location -> agents index built
+    from the agents' own locations, and a version counter per agent that is
+    bumped whenever a tracked field of its knowledge changes. Only agents whose
+    version moved since their previous line are checked, and only against the
+    logged values of the fields they touched: exchanges at one tick can move a
+    field away and back (house 2 -> 1 -> 2), which is not logged again.
+    """
+
+    def __init__(self, observer_log_path: str, agents_csv_path: str, output_dir: str = "data/output_data/logs",
+                 log_format: str = "repr", keyframe_interval: int = 0):
         self.observer_log_path = observer_log_path
         self.agents_csv_path = agents_csv_path
         self.output_dir = output_dir
-
-        os.makedirs(self.output_dir, exist_ok=True)
+        # "repr": full knowledge on every line; "delta": changed entries only (see log_writers)
+        self.writer: KnowledgeLogWriter = make_knowledge_log_writer(log_format, output_dir,
+                                                                    keyframe_interval=keyframe_interval)
 
         self.agents_metadata = self._load_agents_metadata()
+        self.nationality_to_id: Dict[str, int] = {}
+        for agent_id, meta in self.agents_metadata.items():
+            # First agent wins, as with the former linear search
+            self.nationality_to_id.setdefault(meta['nationality'].strip().lower(), agent_id)
+
         self.agents_knowledge: Dict[int, Dict[int, Dict[str, Any]]] = {}
+        self.agents_at_location: Dict[int, Set[int]] = defaultdict(set)
+        self.knowledge_versions: Dict[int, int] = {}
+        self._logged_versions: Dict[int, int] = {}
+        self._touched: Dict[int, Dict[Tuple[int, str], Any]] = {}
         self._initialize_knowledge_states()
-        self.previous_knowledge_states: Dict[int, Dict[int, Dict[str, Any]]] = {}
-        for agent_id in self.agents_metadata.keys():
-            self.previous_knowledge_states[agent_id] = {}
         self.events_by_time = self._parse_observer_log()
 
     def _load_agents_metadata(self) -> Dict[int, Dict[str, str]]:
@@ -49,95 +72,102 @@ class KnowledgeLogAnalyzer:
                     't': 0
                 }
             }
+            self.agents_at_location[agent_id].add(agent_id)
+            self.knowledge_versions[agent_id] = 0
 
     def _parse_observer_log(self) -> Dict[int, List[Dict[str, Any]]]:
         events_by_time = defaultdict(list)
         try:
-            with open(self.observer_log_path, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f, delimiter=';')
-                next(reader, None)
-                for row in reader:
-                    if not row or len(row) < 3:
-                        continue
-                    try:
-                        event_num = int(row[0])
-                        time = int(row[1])
-                        event_type = row[2].strip()
+            events = load_observer_log(self.observer_log_path).events
+        except (OSError, ValueError):
+            return {}
 
-                        event_data = {
-                            'event_num': event_num,
-                            'time': time,
-                            'event_type': event_type,
-                        }
+        nationalities = events.agents
+        pets = events.pets
+        participant_agents = events.participants['agent'].tolist()
+        participant_values = events.participants['value'].tolist()
+        rows = zip(events['event_number'].tolist(), events['time'].tolist(), events['event_type'].tolist(),
+                   events['agent'].tolist(), events['from_house'].tolist(), events['to_house'].tolist(),
+                   events['success'].tolist(), events['participants_start'].tolist(),
+                   events['participants_count'].tolist())
+        for event_num, time, type_code, agent, from_house, to_house, success, start, count in rows:
+            event_type = EVENT_TYPES[type_code]
+            event_data = {
+                'event_num': event_num,
+                'time': time,
+                'event_type': event_type,
+            }
 
-                        if event_type == 'StartTrip':
-                            if len(row) >= 6:
-                                event_data.update({
-                                    'nationality': row[3],
-                                    'from_house': int(row[4]),
-                                    'to_house': int(row[5])
-                                })
-                        elif event_type == 'FinishTrip':
-                            if len(row) == 6:
-                                event_data.update({
-                                    'success': int(row[3]),
-                                    'nationality': row[4],
-                                    'house_id': int(row[5])
-                                })
-                            elif len(row) >= 5:
-                                event_data.update({
-                                    'nationality': row[3],
-                                    'house_id': int(row[4]),
-                                    'success': 1
-                                })
-                        elif event_type in ['changeHouse', 'ChangePet']:
-                            if len(row) >= 4:
-                                try:
-                                    qty_participants = int(row[3])
-                                    event_data['qty_participants'] = qty_participants
-                                    event_data['nationalities'] = row[4:4 + qty_participants]
-                                    if event_type == 'changeHouse' and len(
-                                            row) >= 4 + qty_participants + qty_participants:
-                                        event_data['houses_after'] = [int(x) for x in row[4 + qty_participants:4 + qty_participants + qty_participants]]
-                                    elif event_type == 'ChangePet' and len(
-                                            row) >= 4 + qty_participants + qty_participants:
-                                        event_data['pets_after'] = row[4 + qty_participants:4 + qty_participants + qty_participants]
-                                except (ValueError, IndexError):
-                                    pass
+            if event_type == 'StartTrip':
+                event_data.update({
+                    'nationality': nationalities[agent],
+                    'from_house': from_house,
+                    'to_house': to_house
+                })
+            elif event_type == 'FinishTrip':
+                # Returns home carry no success flag and count as successful
+                event_data.update({
+                    'success': success if success >= 0 else 1,
+                    'nationality': nationalities[agent],
+                    'house_id': to_house
+                })
+            else:
+                event_data['qty_participants'] = count
+                event_data['nationalities'] = [nationalities[a] for a in participant_agents[start:start + count]]
+                values = participant_values[start:start + count]
+                if event_type == 'changeHouse':
+                    event_data['houses_after'] = values
+                else:
+                    event_data['pets_after'] = [pets[v] for v in values]
 
-                        events_by_time[time].append(event_data)
-                    except (ValueError, IndexError):
-                        continue
+            events_by_time[time].append(event_data)
 
-            return events_by_time
-        except Exception:
-            return {}
+        return events_by_time
 
     def _get_agent_id_by_nationality(self, nationality: str) -> Optional[int]:
-        nationality_clean = nationality.strip().lower()
-        for agent_id, meta in self.agents_metadata.items():
-            if meta['nationality'].strip().lower() == nationality_clean:
-                return agent_id
-        return None
+        return self.nationality_to_id.get(nationality.strip().lower())
+
+    def _bump_version(self, agent_id: int, subject_id: int, field: str, logged_value: Any) -> None:
+        self.knowledge_versions[agent_id] += 1
+        touched = self._touched.get(agent_id)
+        if touched is None:
+            touched = self._touched[agent_id] = {}
+        touched.setdefault((subject_id, field), logged_value)
+
+    def _knowledge_changed(self, agent_id: int) -> bool:
+        if self.knowledge_versions[agent_id] == self._logged_versions.get(agent_id):
+            return False
+        return knowledge_changed(self.agents_knowledge[agent_id], self._touched.get(agent_id, {}))
 
-    def _knowledge_changed(self, agent_id: int, current_knowledge: Dict[int, Dict[str, Any]]) -> bool:
-        previous_knowledge = self.previous_knowledge_states.get(agent_id, {})
-        if not previous_knowledge:
-            return True
-        if len(previous_knowledge) != len(current_knowledge):
-            return True
-        for other_agent_id, info in current_knowledge.items():
-            if other_agent_id not in previous_knowledge:
-                return True
-            prev_info = previous_knowledge[other_agent_id]
-            fields_to_compare = ['pet', 'house', 'location']
-            for field in fields_to_compare:
-                current_value = info.get(field)
-                prev_value = prev_info.get(field)
-                if current_value != prev_value:
-                    return True
+    def _set_self(self, agent_id: int, field: str, value: Any, time: int) -> None:
+        info = self.agents_knowledge[agent_id][agent_id]
+        if info[field] != value:
+            if field == 'location':
+                self.agents_at_location[info['location']].discard(agent_id)
+                self.agents_at_location[value].add(agent_id)
+            self._bump_version(agent_id, agent_id, field, info[field])
+            info[field] = value
+        info['t'] = time
 
-        return False
+    def _learn(self, observer_id: int, subject_id: int, time: int) -> None:
+        """observer_id copies subject_id's own entry about itself"""
+        knowledge = self.agents_knowledge[observer_id]
+        source = self.agents_knowledge[subject_id][subject_id]
+        info = knowledge.get(subject_id)
+        if info is None:
+            knowledge[subject_id] = {
+                'pet': source['pet'],
+                'house': source['house'],
+                'location': source['location'],
+                't': time
+            }
+            self._bump_version(observer_id, subject_id, 'pet', MISSING)
+            return
+        for field in TRACKED_FIELDS:
+            if info[field] != source[field]:
+                self._bump_version(observer_id, subject_id, field, info[field])
+                info[field] = source[field]
+        info['t'] = time
 
     def _process_finish_trips(self, events: List[Dict[str, Any]], time: int) -> None:
         houses_occupants = defaultdict(list)
@@ -146,66 +176,30 @@ class KnowledgeLogAnalyzer:
                 agent_id = self._get_agent_id_by_nationality(event['nationality'])
                 success = event.get('success', 1)
                 if agent_id:
-                    if agent_id in self.agents_knowledge[agent_id]:
-                        self.agents_knowledge[agent_id][agent_id]['location'] = event['house_id']
-                        self.agents_knowledge[agent_id][agent_id]['t'] = time
+                    self._set_self(agent_id, 'location', event['house_id'], time)
                     if success == 1:
                         houses_occupants[event['house_id']].append(agent_id)
         for house_id, occupants in houses_occupants.items():
             if len(occupants) > 1:
                 for i, agent1_id in enumerate(occupants):
                     for agent2_id in occupants[i + 1:]:
-                        if agent1_id in self.agents_knowledge and agent2_id in self.agents_knowledge:
-                            if agent2_id not in self.agents_knowledge[agent1_id]:
-                                self.agents_knowledge[agent1_id][agent2_id] = {}
-                            if agent2_id in self.agents_knowledge[agent2_id]:
-                                self.agents_knowledge[agent1_id][agent2_id].update({
-                                    'pet': self.agents_knowledge[agent2_id][agent2_id]['pet'],
-                                    'house': self.agents_knowledge[agent2_id][agent2_id]['house'],
-                                    'location': self.agents_knowledge[agent2_id][agent2_id]['location'],
-                                    't': time
-                                })
-                            if agent1_id not in self.agents_knowledge[agent2_id]:
-                                self.agents_knowledge[agent2_id][agent1_id] = {}
-                            if agent1_id in self.agents_knowledge[agent1_id]:
-                                self.agents_knowledge[agent2_id][agent1_id].update({
-                                    'pet': self.agents_knowledge[agent1_id][agent1_id]['pet'],
-                                    'house': self.agents_knowledge[agent1_id][agent1_id]['house'],
-                                    'location': self.agents_knowledge[agent1_id][agent1_id]['location'],
-                                    't': time
-                                })
+                        self._learn(agent1_id, agent2_id, time)
+                        self._learn(agent2_id, agent1_id, time)
 
     def _find_witnesses_for_exchange(self, participants: List[int], time: int) -> List[int]:
+        participant_set = set(participants)
+        participant_locations = {self.agents_knowledge[p][p]['location'] for p in participant_set}
         witnesses = []
-        participant_locations = set()
-        for participant_id in participants:
-            if participant_id in self.agents_knowledge[participant_id]:
-                location = self.agents_knowledge[participant_id][participant_id]['location']
-                participant_locations.add(location)
-        for agent_id in self.agents_knowledge:
-            if agent_id in participants:
-                continue
-            if agent_id in self.agents_knowledge[agent_id]:
-                agent_location = self.agents_knowledge[agent_id][agent_id]['location']
-                if agent_location in participant_locations:
-                    witnesses.append(agent_id)
-
+        for location in participant_locations:
+            witnesses.extend(a for a in self.agents_at_location.get(location, ()) if a not in participant_set)
+        witnesses.sort()
         return witnesses
 
     def _update_witnesses_knowledge(self, participants: List[int], time: int) -> None:
         witnesses = self._find_witnesses_for_exchange(participants, time)
         for witness_id in witnesses:
             for participant_id in participants:
-                if participant_id not in self.agents_knowledge[witness_id]:
-                    self.agents_knowledge[witness_id][participant_id] = {}
-                if participant_id in self.agents_knowledge[participant_id]:
-                    participant_info = self.agents_knowledge[participant_id][participant_id]
-                    self.agents_knowledge[witness_id][participant_id].update({
-                        'pet': participant_info['pet'],
-                        'house': participant_info['house'],
-                        'location': participant_info['location'],
-                        't': time
-                    })
+                self._learn(witness_id, participant_id, time)
 
     def _process_change_events(self, events: List[Dict[str, Any]], time: int) -> None:
         for event in events:
@@ -233,10 +227,7 @@ class KnowledgeLogAnalyzer:
             return
 
         for i, agent_id in enumerate(participants):
-            if agent_id in self.agents_knowledge and agent_id in self.agents_knowledge[agent_id]:
-                new_house_id = event['houses_after'][i]
-                self.agents_knowledge[agent_id][agent_id]['house'] = new_house_id
-                self.agents_knowledge[agent_id][agent_id]['t'] = time
+            self._set_self(agent_id, 'house', event['houses_after'][i], time)
 
     def _process_pet_exchange(self, event: Dict[str, Any], time: int) -> None:
         participants = []
@@ -249,35 +240,19 @@ class KnowledgeLogAnalyzer:
                 event.get('pets_after', [])):
             return
         for i, agent_id in enumerate(participants):
-            if agent_id in self.agents_knowledge and agent_id in self.agents_knowledge[agent_id]:
-                new_pet = event['pets_after'][i]
-                self.agents_knowledge[agent_id][agent_id]['pet'] = new_pet
-                self.agents_knowledge[agent_id][agent_id]['t'] = time
+            self._set_self(agent_id, 'pet', event['pets_after'][i], time)
 
     def _log_knowledge_state(self, time: int, event_type: str) -> None:
-        for agent_id, knowledge in self.agents_knowledge.items():
-            if self._knowledge_changed(agent_id, knowledge):
-                nationality = self.agents_metadata[agent_id]['nationality']
-                filename = os.path.join(self.output_dir, f"agent_{agent_id}_knowledge.log")
-                knowledge_str = str(knowledge).replace('\n', ' ').replace('\r', '')
-                with open(filename, 'a', encoding='utf-8') as f:
-                    f.write(f"{time};{event_type};{knowledge_str}\n")
-                self.previous_knowledge_states[agent_id] = {
-                    k: {sub_k: sub_v for sub_k, sub_v in v.items()} if isinstance(v, dict) else v
-                    for k, v in knowledge.items()
-                }
+        for agent_id in sorted(self._touched):
+            if self._knowledge_changed(agent_id):
+                self.writer.write(agent_id, time, event_type, self.agents_knowledge[agent_id])
+            self._logged_versions[agent_id] = self.knowledge_versions[agent_id]
+        self._touched.clear()
 
     def generate_knowledge_logs(self) -> None:
         for agent_id in self.agents_knowledge:
-            nationality = self.agents_metadata[agent_id]['nationality']
-            filename = os.path.join(self.output_dir, f"agent_{agent_id}_knowledge.log")
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(
-                    f"0;INIT;{{{agent_id}: {{'pet': '{self.agents_metadata[agent_id]['pet']}', 'house': {agent_id}, 'location': {agent_id}, 't': 0}}}}\n")
-            self.previous_knowledge_states[agent_id] = {
-                k: {sub_k: sub_v for sub_k, sub_v in v.items()} if isinstance(v, dict) else v
-                for k, v in self.agents_knowledge[agent_id].items()
-            }
+            self.writer.start(agent_id, 0, self.agents_knowledge[agent_id])
+            self._logged_versions[agent_id] = self.knowledge_versions[agent_id]
         sorted_times = sorted(self.events_by_time.keys())
         for t in sorted_times:
             batch = self.events_by_time[t]
@@ -292,4 +267,5 @@ class KnowledgeLogAnalyzer:
                 self._log_knowledge_state(t, "ChangeHouse")
             if change_pet_events:
                 self._process_change_events(change_pet_events, t)
-                self._log_knowledge_state(t, "ChangePet")
\ No newline at end of file
+                self._log_knowledge_state(t, "ChangePet")
+        self.writer.close()
@@ -0,0 +1,83 @@
+from typing import TYPE_CHECKING, Dict, Any, Tuple, Optional
+
+import numpy as np
+
+from entities.knowledge import KnowledgeObserver
+from .log_writers import MISSING, TRACKED_FIELDS, KnowledgeLogWriter, knowledge_changed, make_knowledge_log_writer
+
+if TYPE_CHECKING:
+    from entities.agent import Agent
+
+
+class LiveKnowledgeLogger(KnowledgeObserver):
+    """
+    Writes agent_N_knowledge.log files while the simulation runs.
+
+    Attach it with Environment(..., knowledge_observer=logger). The format is
+    the one KnowledgeLogAnalyzer produces from observer.csv (an INIT line,
+    then "time;event_type;knowledge" whenever pet, house or location of some
+    entry changed), but the lines hold what the agents actually know rather
+    than a reconstruction. log_format="delta" writes the compact delta logs of
+    knowledge_logging.log_writers instead.
+    """
+
+    def __init__(self, output_dir: str = "data/output_data/logs", flush_size: int = 65536,
+                 log_format: str = "repr", keyframe_interval: int = 0):
+        self.output_dir = output_dir
+        self.writer: KnowledgeLogWriter = make_knowledge_log_writer(log_format, output_dir, flush_size,
+                                                                    keyframe_interval)
+
+        self.agents: Dict[int, 'Agent'] = {}
+        # Per agent: logged value of every (subject, field) changed since its last line
+        self._touched: Dict[int, Dict[Tuple[int, str], Any]] = {}
+        # Per agent: every subject written since its last line, t-only refreshes included, in first-write
+        # order; kept only for writers that log just those subjects
+        self._updated: Dict[int, Dict[int, None]] = {}
+
+    def attach(self, agents: Dict[int, 'Agent'], time: int) -> None:
+        self.agents = agents
+        self._touched.clear()
+        self._updated.clear()
+        for agent_id, agent in agents.items():
+            self.writer.start(agent_id, time, agent.knowledge)
+
+    def entry_updated(self, observer_id: int, subject_id: int, old: Optional[Dict[str, Any]],
+                      new: Dict[str, Any]) -> None:
+        if self.writer.takes_subjects:
+            updated = self._updated.get(observer_id)
+            if updated is None:
+                updated = self._updated[observer_id] = {}
+            updated[subject_id] = None
+        touched = self._touched.get(observer_id)
+        if old is None:
+            if touched is None:
+                touched = self._touched[observer_id] = {}
+            touched.setdefault((subject_id, 'pet'), MISSING)
+            return
+        for field in TRACKED_FIELDS:
+            if old[field] != new[field]:
+                if touched is None:
+                    touched = self._touched[observer_id] = {}
+                touched.setdefault((subject_id, field), old[field])
+
+    def entries_refreshed(self, observer_ids: np.ndarray, subject_ids: np.ndarray, t: int) -> None:
+        if not self.writer.takes_subjects:
+            return
+        for observer_id, subject_id in zip(observer_ids.tolist(), subject_ids.tolist()):
+            updated = self._updated.get(observer_id)
+            if updated is None:
+                updated = self._updated[observer_id] = {}
+            updated[subject_id] = None
+
+    def flush(self, time: int, label: str) -> None:
+        if not self._touched:
+            return
+        for agent_id in sorted(self._touched):
+            knowledge = self.agents[agent_id].knowledge
+            if knowledge_changed(knowledge, self._touched[agent_id]):
+                # Only the subjects updated since the agent's last line can differ from it
+                self.writer.write(agent_id, time, label, knowledge, self._updated.pop(agent_id, None))
+        self._touched.clear()
+
+    def close(self) -> None:
+        self.writer.close()
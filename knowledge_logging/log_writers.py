@@ -0,0 +1,236 @@
+import json
+import os
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+# Knowledge log formats, one file per agent.
+#
+# "repr" (agent_N_knowledge.log): the whole knowledge dict on every line
+#   time;event;{subject: {'pet': ..., 'house': ..., 'location': ..., 't': ...}, ...}
+#
+# "delta" (agent_N_knowledge.delta.log): only what changed since the previous line
+#   time;event;K;[[subject, pet, house, location, t], ...]     keyframe, full state
+#   time;event;D;[[subject, {field: value, ...}, t], ...]      delta
+# A delta record lists the pet/house/location fields that changed (all three for
+# a newly known subject) and the entry's current t; a record with no fields is
+# a refresh of t only. New subjects are listed in the order they were learned,
+# so the reader appends them in the knowledge order. The first line (INIT) is always a
+# keyframe; with keyframe_interval=K every K-th line after it is one as well.
+
+# Fields whose change makes a knowledge entry worth logging again; t alone does not
+TRACKED_FIELDS = ('pet', 'house', 'location')
+
+# Logged value of an entry that did not exist at the previous log line
+MISSING = object()
+
+
+def knowledge_changed(knowledge: Mapping[int, Mapping[str, Any]], touched: Mapping[Tuple[int, str], Any]) -> bool:
+    """True if some (subject, field) in touched no longer has its logged value."""
+    for (subject_id, field), logged_value in touched.items():
+        if logged_value is MISSING or knowledge[subject_id][field] != logged_value:
+            return True
+    return False
+
+
+def _repr(knowledge: Mapping[int, Mapping[str, Any]]) -> str:
+    return str(knowledge).replace('\n', ' ').replace('\r', '')
+
+
+class KnowledgeLogWriter(ABC):
+    """Buffered per-agent knowledge log files; subclasses define the line format."""
+
+    suffix = "_knowledge.log"
+    # True if write() can be given just the subjects updated since the agent's previous line
+    takes_subjects = False
+
+    def __init__(self, output_dir: str, flush_size: int = 65536):
+        self.output_dir = output_dir
+        self.flush_size = flush_size
+        os.makedirs(output_dir, exist_ok=True)
+        self._pending_lines: Dict[int, List[str]] = defaultdict(list)
+        self._pending_count = 0
+
+    def path(self, agent_id: int) -> str:
+        return os.path.join(self.output_dir, f"agent_{agent_id}{self.suffix}")
+
+    def start(self, agent_id: int, time: int, knowledge: Mapping[int, Mapping[str, Any]]) -> None:
+        """Truncates the agent's log and writes its INIT line."""
+        self._pending_lines.pop(agent_id, None)
+        with open(self.path(agent_id), 'w', encoding='utf-8') as f:
+            f.write(self._init_line(agent_id, time, knowledge))
+
+    def write(self, agent_id: int, time: int, label: str, knowledge: Mapping[int, Mapping[str, Any]],
+              subjects: Optional[Iterable[int]] = None) -> None:
+        """Logs the agent's knowledge; subjects, if given, are all the entries updated since its previous line."""
+        self._pending_lines[agent_id].append(self._line(agent_id, time, label, knowledge, subjects))
+        self._pending_count += 1
+        if self._pending_count >= self.flush_size:
+            self.flush()
+
+    def _init_line(self, agent_id: int, time: int, knowledge: Mapping[int, Mapping[str, Any]]) -> str:
+        return self._line(agent_id, time, "INIT", knowledge, None)
+
+    @abstractmethod
+    def _line(self, agent_id: int, time: int, label: str, knowledge: Mapping[int, Mapping[str, Any]],
+              subjects: Optional[Iterable[int]]) -> str:
+        ...
+
+    def flush(self) -> None:
+        for agent_id, lines in self._pending_lines.items():
+            with open(self.path(agent_id), 'a', encoding='utf-8') as f:
+                f.write(''.join(lines))
+        self._pending_lines.clear()
+        self._pending_count = 0
+
+    def close(self) -> None:
+        self.flush()
+
+
+class ReprKnowledgeLogWriter(KnowledgeLogWriter):
+    """The full knowledge dict as its repr on every line."""
+
+    def _line(self, agent_id: int, time: int, label: str, knowledge: Mapping[int, Mapping[str, Any]],
+              subjects: Optional[Iterable[int]]) -> str:
+        return f"{time};{label};{_repr(knowledge)}\n"
+
+
+class DeltaKnowledgeLogWriter(KnowledgeLogWriter):
+    """Only the entries that changed since the agent's previous line, plus optional keyframes."""
+
+    suffix = "_knowledge.delta.log"
+    takes_subjects = True
+
+    def __init__(self, output_dir: str, flush_size: int = 65536, keyframe_interval: int = 0):
+        super().__init__(output_dir, flush_size)
+        self.keyframe_interval = keyframe_interval
+        # Per agent: subject -> (pet, house, location, t) as of its last line
+        self._written: Dict[int, Dict[int, Tuple[Any, int, int, int]]] = {}
+        self._since_keyframe: Dict[int, int] = {}
+
+    def _keyframe(self, agent_id: int, time: int, label: str, knowledge: Mapping[int, Mapping[str, Any]]) -> str:
+        written = self._written[agent_id] = {}
+        rows = []
+        for subject, info in knowledge.items():
+            row = (info['pet'], info['house'], info['location'], info['t'])
+            written[subject] = row
+            rows.append([subject, *row])
+        self._since_keyframe[agent_id] = 0
+        return f"{time};{label};K;{json.dumps(rows, ensure_ascii=False, separators=(',', ':'))}\n"
+
+    def _init_line(self, agent_id: int, time: int, knowledge: Mapping[int, Mapping[str, Any]]) -> str:
+        return self._keyframe(agent_id, time, "INIT", knowledge)
+
+    def _line(self, agent_id: int, time: int, label: str, knowledge: Mapping[int, Mapping[str, Any]],
+              subjects: Optional[Iterable[int]]) -> str:
+        self._since_keyframe[agent_id] += 1
+        if self.keyframe_interval and self._since_keyframe[agent_id] >= self.keyframe_interval:
+            return self._keyframe(agent_id, time, label, knowledge)
+
+        written = self._written[agent_id]
+        # Without subjects every entry is compared with the previous line
+        entries = knowledge.items() if subjects is None else ((subject, knowledge[subject]) for subject in subjects)
+        records = []
+        for subject, info in entries:
+            row = (info['pet'], info['house'], info['location'], info['t'])
+            previous = written.get(subject)
+            if previous == row:
+                continue
+            if previous is None:
+                changes = dict(zip(TRACKED_FIELDS, row))
+            else:
+                changes = {field: value for field, value, old in zip(TRACKED_FIELDS, row, previous) if value != old}
+            records.append([subject, changes, row[3]])
+            written[subject] = row
+        return f"{time};{label};D;{json.dumps(records, ensure_ascii=False, separators=(',', ':'))}\n"
+
+
+def make_knowledge_log_writer(log_format: str, output_dir: str, flush_size: int = 65536,
+                              keyframe_interval: int = 0) -> KnowledgeLogWriter:
+    # "repr": today's agent_N_knowledge.log; "delta": agent_N_knowledge.delta.log
+    if log_format == "repr":
+        return ReprKnowledgeLogWriter(output_dir, flush_size)
+    if log_format == "delta":
+        return DeltaKnowledgeLogWriter(output_dir, flush_size, keyframe_interval)
+    raise ValueError(f"Unknown knowledge log format: {log_format}")
+
+
+class DeltaLogReader:
+    """
+    Reconstructs full knowledge states from an agent_N_knowledge.delta.log.
+
+    Line offsets and keyframe positions are indexed on open, so state_at(n)
+    replays at most the deltas since the nearest keyframe before line n.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._offsets: List[int] = []
+        self._keyframes: List[int] = []
+        with open(path, 'rb') as f:
+            offset = 0
+            for raw in f:
+                if raw.strip():
+                    # time;event;K|D;... -- the kind is after the second separator
+                    if raw.split(b';', 3)[2] == b'K':
+                        self._keyframes.append(len(self._offsets))
+                    self._offsets.append(offset)
+                offset += len(raw)
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    @staticmethod
+    def _parse(line: str) -> Tuple[int, str, str, Any]:
+        time, label, kind, payload = line.rstrip('\n').split(';', 3)
+        return int(time), label, kind, json.loads(payload)
+
+    @staticmethod
+    def _apply(state: Dict[int, Dict[str, Any]], kind: str, records: Any) -> Dict[int, Dict[str, Any]]:
+        if kind == 'K':
+            return {subject: {'pet': pet, 'house': house, 'location': location, 't': t}
+                    for subject, pet, house, location, t in records}
+        for subject, changes, t in records:
+            info = state.get(subject)
+            if info is None:
+                info = state[subject] = {'pet': None, 'house': None, 'location': None, 't': t}
+            info.update(changes)
+            info['t'] = t
+        return state
+
+    def _iter_from(self, start: int) -> Iterator[Tuple[int, str, str, Any]]:
+        with open(self.path, 'rb') as f:
+            f.seek(self._offsets[start])
+            for raw in f:
+                if raw.strip():
+                    yield self._parse(raw.decode('utf-8'))
+
+    def __iter__(self) -> Iterator[Tuple[int, str, Dict[int, Dict[str, Any]]]]:
+        """Yields (time, event, full knowledge) for every line; the dict is reused, copy it to keep it."""
+        state: Dict[int, Dict[str, Any]] = {}
+        if not self._offsets:
+            return
+        for time, label, kind, records in self._iter_from(0):
+            state = self._apply(state, kind, records)
+            yield time, label, state
+
+    def state_at(self, line: int) -> Tuple[int, str, Dict[int, Dict[str, Any]]]:
+        """(time, event, full knowledge) as of line number `line` (0 is INIT)."""
+        if not 0 <= line < len(self._offsets):
+            raise IndexError(line)
+        keyframe = self._keyframes[bisect_right(self._keyframes, line) - 1]
+        state: Dict[int, Dict[str, Any]] = {}
+        entries = self._iter_from(keyframe)
+        for _ in range(line - keyframe + 1):
+            time, label, kind, records = next(entries)
+            state = self._apply(state, kind, records)
+        entries.close()
+        return time, label, state
+
+
+def convert_delta_log(delta_path: str, out_path: str) -> None:
+    """Rewrites a delta knowledge log in the repr format of agent_N_knowledge.log."""
+    with open(out_path, 'w', encoding='utf-8') as out:
+        for time, label, state in DeltaLogReader(delta_path):
+            out.write(f"{time};{label};{_repr(state)}\n")
@@ -3,17 +3,73 @@ from .csv_utils import (
     parse_csv_line,
     log_formatter,
     load_strategies,
+    count_houses,
     load_initial_data,
     load_geography,
     build_color_to_prob_index,
+    parse_sparse_tokens,
+    load_travel_graph,
+)
+from .travel_graph import (
+    TravelGraph,
+    TravelGraphBuilder,
+    as_travel_graph,
+)
+from .event_log import (
+    EVENT_TYPES,
+    EVENT_TYPE_CODES,
+    EventLog,
+    EventLogBuilder,
+    EventLogWriter,
+    convert_observer_log,
+)
+from .observer_log import (
+    ObserverLog,
+    parse_observer_log,
+    load_observer_log,
+)
+from .knowledge_snapshot import (
+    KnowledgeSnapshot,
+    KnowledgeSnapshotBuilder,
+    KnowledgeSnapshotWriter,
+    write_knowledge_snapshot,
+)
+from .scenario_generator import (
+    GEOGRAPHIES,
+    STRATEGIES,
+    Geography,
+    generate_scenario,
 )
 
 __all__ = [
     'parse_csv_line',
     'log_formatter',
     'load_strategies',
+    'count_houses',
     'load_initial_data',
     'load_geography',
     'build_color_to_prob_index',
+    'parse_sparse_tokens',
+    'load_travel_graph',
+    'TravelGraph',
+    'TravelGraphBuilder',
+    'as_travel_graph',
+    'EVENT_TYPES',
+    'EVENT_TYPE_CODES',
+    'EventLog',
+    'EventLogBuilder',
+    'EventLogWriter',
+    'convert_observer_log',
+    'ObserverLog',
+    'parse_observer_log',
+    'load_observer_log',
+    'KnowledgeSnapshot',
+    'KnowledgeSnapshotBuilder',
+    'KnowledgeSnapshotWriter',
+    'write_knowledge_snapshot',
+    'GEOGRAPHIES',
+    'STRATEGIES',
+    'Geography',
+    'generate_scenario',
 ]
 
@@ -1,6 +1,8 @@
 import os
 from typing import Dict, List, Optional, Any, Tuple
 
+from .travel_graph import TravelGraph, TravelGraphBuilder
+
 
 # Parse a CSV line by stripping whitespace and splitting by ';'
 def parse_csv_line(line: str) -> Optional[List[str]]:
@@ -16,8 +18,30 @@ def log_formatter(event_number: int, time: int, event_type: str, *extra: Any) ->
     return f"{event_number};{time};{event_type};{extra_str}"
 
 
+# Parse "index:value" tokens of a sparse row
+def parse_sparse_tokens(tokens: List[str]) -> Dict[int, int]:
+    values = {}
+    for token in tokens:
+        index, _, value = token.partition(':')
+        values[int(index)] = int(value)
+    return values
+
+
+# Number of houses of a scenario: its agents file has one row per house
+def count_houses(path_to_zebra_01: str) -> int:
+    with open(path_to_zebra_01, encoding='utf-8') as f:
+        return sum(1 for line in f if line.strip())
+
+
 # Load agent strategies from CSV file
-def load_strategies(path_to_strategies: str) -> Dict[int, Dict[str, Any]]:
+#
+# Route weights come in one of two layouts:
+#   id;nation;w1..wN;house_exch;pet_exch           dense, one weight per house
+#   id;nation;j:w;...;house_exch;pet_exch          sparse, only the listed houses
+# A dense row has num_houses weights (6 for the original island; pass
+# count_houses(agents_path) for other scenarios). Missing trailing columns
+# read as 0; a row longer than either layout is an error.
+def load_strategies(path_to_strategies: str, num_houses: int = 6) -> Dict[int, Dict[str, Any]]:
     strategies = {}
     with open(path_to_strategies, encoding='utf-8') as f:
         for line in f:
@@ -28,11 +52,23 @@ def load_strategies(path_to_strategies: str) -> Dict[int, Dict[str, Any]]:
             agent_id = int(parts[0])
             nation = parts[1]
 
-            route_probs_list = [int(x) if x else 0 for x in parts[2:8]]
-            route_probs = {i+1: p for i, p in enumerate(route_probs_list)}
-
-            house_exchange_prob = int(parts[8]) if len(parts) > 8 and parts[8] else 0
-            pet_exchange_prob = int(parts[9]) if len(parts) > 9 and parts[9] else 0
+            if len(parts) > 2 and ':' in parts[2]:
+                route_end = 2
+                while route_end < len(parts) and ':' in parts[route_end]:
+                    route_end += 1
+                route_probs = parse_sparse_tokens(parts[2:route_end])
+            else:
+                route_end = min(2 + num_houses, len(parts))
+                route_probs_list = [int(x) if x else 0 for x in parts[2:route_end]]
+                route_probs = {i+1: p for i, p in enumerate(route_probs_list)}
+            tail = parts[route_end:]
+            if len(tail) > 2:
+                layout = "sparse" if route_end > 2 and ':' in parts[2] else f"dense ({num_houses} houses)"
+                raise ValueError(f"{path_to_strategies}: the row of agent {agent_id} has {len(tail)} columns after "
+                                 f"its {layout} route weights; expected at most house_exch;pet_exch")
+
+            house_exchange_prob = int(tail[0]) if len(tail) > 0 and tail[0] else 0
+            pet_exchange_prob = int(tail[1]) if len(tail) > 1 and tail[1] else 0
 
             strategies[agent_id] = {
                 "route_probs": route_probs,
@@ -44,9 +80,16 @@ def load_strategies(path_to_strategies: str) -> Dict[int, Dict[str, Any]]:
 
 
 # Load initial agent and house data from CSV
-def load_initial_data(path_to_zebra_01: str, strategies: Optional[Dict[int, Dict[str, Any]]] = None) -> Tuple[Dict[int, 'Agent'], Dict[int, 'House']]:
+#
+# compact=True keeps the agents and houses in an EntityStore (see
+# entities/store.py) and returns views of it instead of plain objects.
+def load_initial_data(path_to_zebra_01: str, strategies: Optional[Dict[int, Dict[str, Any]]] = None,
+                      compact: bool = False) -> Tuple[Dict[int, 'Agent'], Dict[int, 'House']]:
     from entities.agent import Agent
     from entities.house import House
+    from entities.store import EntityStore
+
+    store = EntityStore() if compact else None
 
     agents = {}
     houses = {}
@@ -64,8 +107,10 @@ def load_initial_data(path_to_zebra_01: str, strategies: Optional[Dict[int, Dict
             smoke = parts[4] if len(parts) > 4 else ""
             pet = parts[5] if len(parts) > 5 else ""
 
-            house = House(house_id=house_id, color=color, owner_id=house_id)
-            houses[house_id] = house
+            if store is not None:
+                houses[house_id] = store.add_house(house_id, color, house_id)
+            else:
+                houses[house_id] = House(house_id=house_id, color=color, owner_id=house_id)
 
             if strategies and house_id in strategies:
                 strat = strategies[house_id]
@@ -77,18 +122,21 @@ def load_initial_data(path_to_zebra_01: str, strategies: Optional[Dict[int, Dict
                 house_exch = 0
                 pet_exch = 0
 
-            agent = Agent(
-                agent_id=house_id,
-                nationality=nation,
-                drink=drink,
-                cigarettes=smoke,
-                pet=pet,
-                house_id=house_id,
-                route_probs=route_probs,
-                house_exchange_prob=house_exch,
-                pet_exchange_prob=pet_exch
-            )
-            agents[house_id] = agent
+            if store is not None:
+                agents[house_id] = store.add_agent(house_id, nation, drink, smoke, pet, house_id, route_probs,
+                                                   house_exch, pet_exch)
+            else:
+                agents[house_id] = Agent(
+                    agent_id=house_id,
+                    nationality=nation,
+                    drink=drink,
+                    cigarettes=smoke,
+                    pet=pet,
+                    house_id=house_id,
+                    route_probs=route_probs,
+                    house_exchange_prob=house_exch,
+                    pet_exchange_prob=pet_exch
+                )
 
     return agents, houses
 
@@ -100,6 +148,9 @@ def build_color_to_prob_index(houses: Dict[int, 'House']) -> Dict[str, int]:
 
 
 # Load travel matrix from geography CSV
+#
+# Rows are either dense (id;color;t1..tN with NA for no route) or sparse
+# (id;color;j:t;... listing only the existing routes).
 def load_geography(path_to_geography: str) -> List[List[Optional[int]]]:
     rows = []
     with open(path_to_geography, encoding='utf-8') as f:
@@ -113,6 +164,12 @@ def load_geography(path_to_geography: str) -> List[List[Optional[int]]]:
     travel_matrix = [[None] * (num_houses + 1) for _ in range(num_houses + 1)]
 
     for i, row in enumerate(rows, start=1):
+        travel_matrix[i][i] = 0
+        if len(row) > 2 and ':' in row[2]:
+            for j, val in parse_sparse_tokens(row[2:]).items():
+                if j != i:
+                    travel_matrix[i][j] = val
+            continue
         for j, val in enumerate(row[2:], start=1):
             if i == j:
                 travel_matrix[i][j] = 0
@@ -123,3 +180,28 @@ def load_geography(path_to_geography: str) -> List[List[Optional[int]]]:
 
     return travel_matrix
 
+
+
+# Load the geography CSV as a sparse TravelGraph, without the dense matrix
+def load_travel_graph(path_to_geography: str) -> TravelGraph:
+    builder = TravelGraphBuilder()
+    i = 0
+    with open(path_to_geography, encoding='utf-8') as f:
+        for line in f:
+            parts = parse_csv_line(line)
+            if not parts:
+                continue
+            i += 1
+            if len(parts) > 2 and ':' in parts[2]:
+                routes = parse_sparse_tokens(parts[2:])
+                routes.pop(i, None)
+                builder.add_row(list(routes), list(routes.values()))
+                continue
+            targets, times = [], []
+            for j, val in enumerate(parts[2:], start=1):
+                val = val.strip()
+                if j != i and val and val.upper() != "NA":
+                    targets.append(j)
+                    times.append(int(val))
+            builder.add_row(targets, times)
+    return builder.build()
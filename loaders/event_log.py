@@ -0,0 +1,217 @@
+import json
+import os
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from entities.store import StringTable
+
+from .csv_utils import parse_csv_line
+
+
+# Binary columnar event log.
+#
+# A log is a directory with one raw little-endian file per column plus meta.json:
+#   events.<column>.bin        -- one fixed-width row per event
+#   participants.<column>.bin  -- one row per participant of changeHouse/ChangePet
+#   meta.json                  -- dtypes, row counts, agent and pet dictionaries
+# Agents (nationalities) and pets are dictionary-encoded as integer ids.
+# Columns that do not apply to an event type hold -1.
+
+EVENT_TYPES = ('StartTrip', 'FinishTrip', 'changeHouse', 'ChangePet')
+EVENT_TYPE_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+
+EVENT_COLUMNS = {
+    'event_number': '<i8',
+    'time': '<i4',
+    'event_type': 'u1',
+    'agent': '<i4',
+    'from_house': '<i4',
+    'to_house': '<i4',
+    # 0/1 for visits, -1 for returns home and non-trip events
+    'success': 'i1',
+    'participants_start': '<i8',
+    'participants_count': '<i4',
+}
+
+PARTICIPANT_COLUMNS = {
+    'agent': '<i4',
+    # New house id for changeHouse, pet id for ChangePet
+    'value': '<i4',
+}
+
+META_FILE = 'meta.json'
+
+
+class EventLog:
+    """Column arrays of an event log, either in memory or memory-mapped from disk."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], participants: Dict[str, np.ndarray],
+                 agents: List[str], pets: List[str]):
+        self.columns = columns
+        self.participants = participants
+        self.agents = agents
+        self.pets = pets
+
+    @classmethod
+    def open(cls, path: str) -> 'EventLog':
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+
+        def load(prefix: str, schema: Dict[str, str], rows: int) -> Dict[str, np.ndarray]:
+            arrays = {}
+            for name, dtype in schema.items():
+                file_path = os.path.join(path, f"{prefix}.{name}.bin")
+                if rows:
+                    arrays[name] = np.memmap(file_path, dtype=dtype, mode='r', shape=(rows,))
+                else:
+                    arrays[name] = np.empty(0, dtype=dtype)
+            return arrays
+
+        return cls(load('events', meta['event_columns'], meta['events']),
+                   load('participants', meta['participant_columns'], meta['participants']),
+                   meta['agents'], meta['pets'])
+
+    def __len__(self) -> int:
+        return len(self.columns['event_number'])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def type_mask(self, event_type: str) -> np.ndarray:
+        return self.columns['event_type'] == EVENT_TYPE_CODES[event_type]
+
+    def participants_of(self, row: int) -> Dict[str, np.ndarray]:
+        start = int(self.columns['participants_start'][row])
+        end = start + int(self.columns['participants_count'][row])
+        return {name: column[start:end] for name, column in self.participants.items()}
+
+
+class EventLogBuilder:
+    """Encodes events into columns; build() returns them as an in-memory EventLog."""
+
+    def __init__(self):
+        self.agents = StringTable()
+        self.pets = StringTable()
+        self._events: Dict[str, List[int]] = {name: [] for name in EVENT_COLUMNS}
+        self._participants: Dict[str, List[int]] = {name: [] for name in PARTICIPANT_COLUMNS}
+        self.event_rows = 0
+        self.participant_rows = 0
+
+    def append(self, event_number: int, time: int, event_type: str, extra: Sequence[Any]) -> None:
+        """Adds one event given as in observer.csv: the fields after the event type in `extra`."""
+        agent = from_house = to_house = success = -1
+        count = 0
+        participants_agent = self._participants['agent']
+        participants_value = self._participants['value']
+
+        if event_type == 'StartTrip':
+            agent = self.agents.code(extra[0])
+            from_house = int(extra[1])
+            to_house = int(extra[2])
+        elif event_type == 'FinishTrip':
+            if len(extra) == 3:
+                success = int(extra[0])
+                agent = self.agents.code(extra[1])
+                to_house = int(extra[2])
+            else:
+                agent = self.agents.code(extra[0])
+                to_house = int(extra[1])
+        elif event_type == 'changeHouse' or event_type == 'ChangePet':
+            count = int(extra[0])
+            for i in range(count):
+                participants_agent.append(self.agents.code(extra[1 + i]))
+                value = extra[1 + count + i]
+                participants_value.append(int(value) if event_type == 'changeHouse' else self.pets.code(value))
+        else:
+            raise ValueError(f"Unknown event type: {event_type}")
+
+        events = self._events
+        events['event_number'].append(event_number)
+        events['time'].append(time)
+        events['event_type'].append(EVENT_TYPE_CODES[event_type])
+        events['agent'].append(agent)
+        events['from_house'].append(from_house)
+        events['to_house'].append(to_house)
+        events['success'].append(success)
+        events['participants_start'].append(self.participant_rows)
+        events['participants_count'].append(count)
+        self.event_rows += 1
+        self.participant_rows += count
+
+    def _take_chunk(self):
+        events = {name: np.asarray(values, dtype=EVENT_COLUMNS[name]) for name, values in self._events.items()}
+        participants = {name: np.asarray(values, dtype=PARTICIPANT_COLUMNS[name])
+                        for name, values in self._participants.items()}
+        for values in self._events.values():
+            values.clear()
+        for values in self._participants.values():
+            values.clear()
+        return events, participants
+
+    def build(self) -> EventLog:
+        events, participants = self._take_chunk()
+        return EventLog(events, participants, list(self.agents.names), list(self.pets.names))
+
+
+class EventLogWriter(EventLogBuilder):
+    """Streams encoded columns to a log directory every flush_size events."""
+
+    def __init__(self, path: str, flush_size: int = 65536):
+        super().__init__()
+        self.path = path
+        self.flush_size = flush_size
+        os.makedirs(path, exist_ok=True)
+        self._files = {}
+        for prefix, schema in (('events', EVENT_COLUMNS), ('participants', PARTICIPANT_COLUMNS)):
+            for name in schema:
+                self._files[prefix, name] = open(os.path.join(path, f"{prefix}.{name}.bin"), 'wb')
+        self._pending = 0
+
+    def append(self, event_number: int, time: int, event_type: str, extra: Sequence[Any]) -> None:
+        super().append(event_number, time, event_type, extra)
+        self._pending += 1
+        if self._pending >= self.flush_size:
+            self.flush()
+
+    def flush(self) -> None:
+        events, participants = self._take_chunk()
+        for name, array in events.items():
+            array.tofile(self._files['events', name])
+        for name, array in participants.items():
+            array.tofile(self._files['participants', name])
+        self._pending = 0
+
+    def close(self) -> None:
+        if not self._files:
+            return
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        meta = {
+            'events': self.event_rows,
+            'participants': self.participant_rows,
+            'event_columns': EVENT_COLUMNS,
+            'participant_columns': PARTICIPANT_COLUMNS,
+            'event_types': list(EVENT_TYPES),
+            'agents': self.agents.names,
+            'pets': self.pets.names,
+        }
+        with open(os.path.join(self.path, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+
+# Convert an existing observer.csv into a binary log directory
+def convert_observer_log(csv_path: str, out_path: str, flush_size: int = 65536) -> EventLog:
+    writer = EventLogWriter(out_path, flush_size)
+    with open(csv_path, encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('---- KNOWLEDGE ----'):
+                break
+            parts = parse_csv_line(line)
+            if not parts or len(parts) < 3:
+                continue
+            writer.append(int(parts[0]), int(parts[1]), parts[2], parts[3:])
+    writer.close()
+    return EventLog.open(out_path)
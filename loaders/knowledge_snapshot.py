@@ -0,0 +1,222 @@
+import json
+import os
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Mapping, Tuple
+
+import numpy as np
+
+from entities.store import StringTable
+
+if TYPE_CHECKING:
+    from entities.agent import Agent
+    from entities.knowledge import KnowledgeStore
+
+
+# Knowledge snapshot: what every agent knows at one moment, as a binary table.
+#
+# One fixed-width row per (observer, subject) pair, one raw little-endian file
+# per column plus meta.json, like the binary event log:
+#   knowledge.<column>.bin  -- rows grouped by observer, in the observer's own
+#                              knowledge order (the order of agent.knowledge)
+#   meta.json               -- dtypes, row count and the pet dictionary
+# Pets are dictionary-encoded as integer ids.
+
+KNOWLEDGE_COLUMNS = {
+    'observer': '<i4',
+    'subject': '<i4',
+    'pet': '<i4',
+    'house': '<i4',
+    'location': '<i4',
+    't': '<i4',
+}
+
+META_FILE = 'meta.json'
+
+
+class KnowledgeSnapshot:
+    """Column arrays of a knowledge snapshot, either in memory or memory-mapped from disk."""
+
+    def __init__(self, columns: Dict[str, np.ndarray], pets: List[str]):
+        self.columns = columns
+        self.pets = pets
+        self._bounds = None
+
+    @classmethod
+    def open(cls, path: str) -> 'KnowledgeSnapshot':
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        rows = meta['rows']
+        columns = {}
+        for name, dtype in meta['columns'].items():
+            if rows:
+                columns[name] = np.memmap(os.path.join(path, f"knowledge.{name}.bin"), dtype=dtype,
+                                          mode='r', shape=(rows,))
+            else:
+                columns[name] = np.empty(0, dtype=dtype)
+        return cls(columns, meta['pets'])
+
+    def __len__(self) -> int:
+        return len(self.columns['observer'])
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def _observer_bounds(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._bounds is None:
+            observer = self.columns['observer']
+            starts = np.flatnonzero(np.r_[True, observer[1:] != observer[:-1]]) if len(observer) else \
+                np.empty(0, dtype=np.intp)
+            ends = np.r_[starts[1:], len(observer)].astype(np.intp)
+            self._bounds = (np.asarray(observer[starts]), starts, ends)
+        return self._bounds
+
+    def observers(self) -> np.ndarray:
+        return self._observer_bounds()[0]
+
+    def known_others(self) -> np.ndarray:
+        """Number of other agents each observer (in observers() order) knows about."""
+        observers, starts, _ = self._observer_bounds()
+        not_self = (self.columns['observer'] != self.columns['subject']).astype(np.int64)
+        return np.add.reduceat(not_self, starts) if len(starts) else np.empty(0, dtype=np.int64)
+
+    def _rows_to_dict(self, start: int, end: int) -> Dict[int, Dict[str, Any]]:
+        pets = self.pets
+        columns = self.columns
+        return {
+            subject: {'pet': pets[pet], 'house': house, 'location': location, 't': t}
+            for subject, pet, house, location, t in zip(
+                columns['subject'][start:end].tolist(), columns['pet'][start:end].tolist(),
+                columns['house'][start:end].tolist(), columns['location'][start:end].tolist(),
+                columns['t'][start:end].tolist())
+        }
+
+    def knowledge_of(self, observer: int) -> Dict[int, Dict[str, Any]]:
+        """The observer's knowledge as the dict agent.knowledge had (empty if unknown)."""
+        observers, starts, ends = self._observer_bounds()
+        i = np.flatnonzero(observers == observer)
+        if not len(i):
+            return {}
+        return self._rows_to_dict(int(starts[i[0]]), int(ends[i[0]]))
+
+    def items(self) -> Iterator[Tuple[int, Dict[int, Dict[str, Any]]]]:
+        """Streams (observer, knowledge dict) one observer at a time."""
+        observers, starts, ends = self._observer_bounds()
+        for observer, start, end in zip(observers.tolist(), starts.tolist(), ends.tolist()):
+            yield observer, self._rows_to_dict(start, end)
+
+
+class KnowledgeSnapshotBuilder:
+    """Encodes knowledge into columns; build() returns them as an in-memory KnowledgeSnapshot."""
+
+    def __init__(self):
+        self.pets = StringTable()
+        self._chunks: Dict[str, List[np.ndarray]] = {name: [] for name in KNOWLEDGE_COLUMNS}
+        self.rows = 0
+        self._pending = 0
+
+    def _append(self, observer: int, subject, pet, house, location, t) -> None:
+        count = len(subject)
+        chunks = self._chunks
+        chunks['observer'].append(np.full(count, observer, dtype=KNOWLEDGE_COLUMNS['observer']))
+        chunks['subject'].append(np.asarray(subject, dtype=KNOWLEDGE_COLUMNS['subject']))
+        chunks['pet'].append(np.asarray(pet, dtype=KNOWLEDGE_COLUMNS['pet']))
+        chunks['house'].append(np.asarray(house, dtype=KNOWLEDGE_COLUMNS['house']))
+        chunks['location'].append(np.asarray(location, dtype=KNOWLEDGE_COLUMNS['location']))
+        chunks['t'].append(np.asarray(t, dtype=KNOWLEDGE_COLUMNS['t']))
+        self.rows += count
+        self._pending += count
+
+    def add(self, observer: int, knowledge: Mapping[int, Mapping[str, Any]]) -> None:
+        """Adds one observer's knowledge given as agent.knowledge (subject -> entry)."""
+        entries = list(knowledge.items())
+        self._append(observer,
+                     [subject for subject, _ in entries],
+                     [self.pets.code(info['pet']) for _, info in entries],
+                     [info['house'] for _, info in entries],
+                     [info['location'] for _, info in entries],
+                     [info['t'] for _, info in entries])
+
+    def add_store(self, store: 'KnowledgeStore', observers) -> None:
+        """Adds the given observers' rows straight from a KnowledgeStore's arrays."""
+        pet_ids = np.array([self.pets.code(name) for name in store.pets.names] or [0], dtype=np.int32)
+        for observer in observers:
+            subjects = np.asarray(store.known_subjects(observer), dtype=np.intp)
+            self._append(observer, subjects, pet_ids[store.pet[observer, subjects]],
+                         store.house[observer, subjects], store.location[observer, subjects],
+                         store.t[observer, subjects])
+
+    def add_columns(self, observer, subject, pet, house, location, t, pet_names: List[str]) -> None:
+        """Adds rows given as columns, already grouped by observer; pet holds indices into pet_names."""
+        pet = np.asarray(pet, dtype=np.intp)
+        # Ids in order of first appearance, as add() assigns them row by row
+        codes, first = np.unique(pet, return_index=True)
+        pet_ids = np.zeros(len(pet_names) or 1, dtype=np.int32)
+        for code in codes[np.argsort(first)].tolist():
+            pet_ids[code] = self.pets.code(pet_names[code])
+        self._append(observer, subject, pet_ids[pet], house, location, t)
+
+    def add_agents(self, agents: Mapping[int, 'Agent']) -> None:
+        """Adds every agent's knowledge, reading the shared store directly if the agents use one."""
+        store = next(iter(agents.values())).knowledge_store if agents else None
+        if store is not None:
+            self.add_store(store, list(agents))
+        else:
+            for agent_id, agent in agents.items():
+                self.add(agent_id, agent.knowledge)
+
+    def _take_chunk(self) -> Dict[str, np.ndarray]:
+        columns = {}
+        for name, chunks in self._chunks.items():
+            columns[name] = np.concatenate(chunks) if chunks else np.empty(0, dtype=KNOWLEDGE_COLUMNS[name])
+            chunks.clear()
+        self._pending = 0
+        return columns
+
+    def build(self) -> KnowledgeSnapshot:
+        return KnowledgeSnapshot(self._take_chunk(), list(self.pets.names))
+
+
+class KnowledgeSnapshotWriter(KnowledgeSnapshotBuilder):
+    """Streams encoded columns to a snapshot directory every flush_size rows."""
+
+    def __init__(self, path: str, flush_size: int = 1 << 20):
+        super().__init__()
+        self.path = path
+        self.flush_size = flush_size
+        os.makedirs(path, exist_ok=True)
+        self._files = {name: open(os.path.join(path, f"knowledge.{name}.bin"), 'wb')
+                       for name in KNOWLEDGE_COLUMNS}
+
+    def _append(self, observer: int, subject, pet, house, location, t) -> None:
+        super()._append(observer, subject, pet, house, location, t)
+        if self._pending >= self.flush_size:
+            self.flush()
+
+    def flush(self) -> None:
+        for name, array in self._take_chunk().items():
+            array.tofile(self._files[name])
+
+    def close(self) -> None:
+        if not self._files:
+            return
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        meta = {
+            'rows': self.rows,
+            'columns': KNOWLEDGE_COLUMNS,
+            'pets': self.pets.names,
+        }
+        with open(os.path.join(self.path, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    def __enter__(self) -> 'KnowledgeSnapshotWriter':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def write_knowledge_snapshot(path: str, agents: Mapping[int, 'Agent']) -> None:
+    with KnowledgeSnapshotWriter(path) as writer:
+        writer.add_agents(agents)
@@ -0,0 +1,155 @@
+import ast
+import hashlib
+import os
+import zipfile
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .csv_utils import parse_csv_line
+from .event_log import EVENT_COLUMNS, PARTICIPANT_COLUMNS, EventLog, EventLogBuilder
+from .knowledge_snapshot import KNOWLEDGE_COLUMNS, KnowledgeSnapshot, KnowledgeSnapshotBuilder
+
+
+# Single parser for observer.csv shared by the analyzers.
+#
+# The parsed columns are cached next to the log as <log>.cache.npz. The cache
+# stores the log's size, mtime and content hash: matching size and mtime are
+# trusted as is, a matching size with another mtime (a copy, a touch) is
+# confirmed by hashing, anything else means the log is parsed again.
+
+KNOWLEDGE_SECTION = "---- KNOWLEDGE ----"
+CACHE_SUFFIX = ".cache.npz"
+# Bump when the parsed layout changes so older caches are ignored
+CACHE_VERSION = 1
+
+
+class ObserverLog:
+    """Events of observer.csv as columns, plus the legacy KNOWLEDGE section if the log has one."""
+
+    def __init__(self, events: EventLog, knowledge: Optional[KnowledgeSnapshot] = None,
+                 knowledge_errors: Optional[List[Tuple[int, str]]] = None):
+        self.events = events
+        self.knowledge = knowledge
+        # (agent_id, message) for KNOWLEDGE lines that could not be parsed and were skipped
+        self.knowledge_errors = knowledge_errors or []
+
+
+def parse_observer_log(path: str) -> ObserverLog:
+    """Parses observer.csv in one streaming pass."""
+    builder = EventLogBuilder()
+    knowledge_builder = None
+    knowledge_errors = []
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if knowledge_builder is not None:
+                agent_id, sep, knowledge_str = line.strip().partition(';')
+                if sep:
+                    # Old logs keep final knowledge as a dict repr; parse it without eval
+                    try:
+                        knowledge_builder.add(int(agent_id), ast.literal_eval(knowledge_str))
+                    except (SyntaxError, ValueError) as e:
+                        knowledge_errors.append((int(agent_id), str(e)))
+                continue
+
+            parts = parse_csv_line(line)
+            if not parts:
+                continue
+            if parts[0] == KNOWLEDGE_SECTION:
+                knowledge_builder = KnowledgeSnapshotBuilder()
+                continue
+            if len(parts) >= 3:
+                builder.append(int(parts[0]), int(parts[1]), parts[2], parts[3:])
+
+    knowledge = knowledge_builder.build() if knowledge_builder is not None else None
+    return ObserverLog(builder.build(), knowledge, knowledge_errors)
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _save_cache(cache_path: str, log: ObserverLog, key: Tuple[int, int, str]) -> None:
+    arrays: Dict[str, np.ndarray] = {
+        'version': np.array(CACHE_VERSION),
+        'size': np.array(key[0]),
+        'mtime_ns': np.array(key[1]),
+        'hash': np.array(key[2]),
+        'agents': np.array(log.events.agents, dtype=str),
+        'pets': np.array(log.events.pets, dtype=str),
+    }
+    for name in EVENT_COLUMNS:
+        arrays[f'events.{name}'] = np.asarray(log.events.columns[name])
+    for name in PARTICIPANT_COLUMNS:
+        arrays[f'participants.{name}'] = np.asarray(log.events.participants[name])
+    if log.knowledge is not None:
+        arrays['knowledge_pets'] = np.array(log.knowledge.pets, dtype=str)
+        for name in KNOWLEDGE_COLUMNS:
+            arrays[f'knowledge.{name}'] = np.asarray(log.knowledge.columns[name])
+        arrays['knowledge_error_agents'] = np.array([agent_id for agent_id, _ in log.knowledge_errors], dtype=np.int64)
+        arrays['knowledge_error_messages'] = np.array([message for _, message in log.knowledge_errors], dtype=str)
+
+    # Write under a temporary name so a crash never leaves a truncated cache behind
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, cache_path)
+
+
+def _load_cache(cache_path: str, path: str) -> Optional[ObserverLog]:
+    try:
+        data = np.load(cache_path, allow_pickle=False)
+    except (OSError, ValueError, zipfile.BadZipFile):
+        return None
+
+    with data:
+        if 'version' not in data.files or int(data['version']) != CACHE_VERSION:
+            return None
+        stat = os.stat(path)
+        if int(data['size']) != stat.st_size:
+            return None
+        if int(data['mtime_ns']) != stat.st_mtime_ns and str(data['hash']) != _file_hash(path):
+            return None
+
+        events = EventLog({name: data[f'events.{name}'] for name in EVENT_COLUMNS},
+                          {name: data[f'participants.{name}'] for name in PARTICIPANT_COLUMNS},
+                          data['agents'].tolist(), data['pets'].tolist())
+        knowledge = None
+        knowledge_errors = []
+        if 'knowledge_pets' in data.files:
+            knowledge = KnowledgeSnapshot({name: data[f'knowledge.{name}'] for name in KNOWLEDGE_COLUMNS},
+                                          data['knowledge_pets'].tolist())
+            knowledge_errors = list(zip(data['knowledge_error_agents'].tolist(),
+                                        data['knowledge_error_messages'].tolist()))
+    return ObserverLog(events, knowledge, knowledge_errors)
+
+
+def load_observer_log(path: str, use_cache: bool = True) -> ObserverLog:
+    """
+    Loads observer.csv through the parse cache, or an observer.evlog directory.
+
+    Repeat loads of an unchanged log read the cached columns and skip parsing.
+    """
+    if os.path.isdir(path):
+        return ObserverLog(EventLog.open(path))
+
+    cache_path = path + CACHE_SUFFIX
+    if use_cache and os.path.exists(cache_path):
+        log = _load_cache(cache_path, path)
+        if log is not None:
+            return log
+
+    stat = os.stat(path)
+    log = parse_observer_log(path)
+    if use_cache:
+        try:
+            _save_cache(cache_path, log, (stat.st_size, stat.st_mtime_ns, _file_hash(path)))
+        except OSError:
+            # Read-only location: the cache is an optimisation only
+            pass
+    return log
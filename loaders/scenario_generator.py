@@ -0,0 +1,204 @@
+import math
+import os
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+
+# Synthetic scenarios in the loader formats, written row by row.
+#
+# A scenario is three files, like data/input_data:
+#   agents.csv      -- id;color;nationality;drink;cigarettes;pet
+#   strategies.csv  -- id;nationality;<route weights>;house_exchange_prob;pet_exchange_prob
+#   geo.csv         -- id;color;<travel times>
+# Weights and travel times are dense (one column per house, 0 / NA where there
+# is no route) or sparse (only "house:value" tokens for existing routes), which
+# the loaders accept as well. House i has color C<i>, so its route weight index
+# is i. Travel times are symmetric; strategies only weight houses the agent can
+# reach from home and come back from, i.e. its direct neighbours.
+
+GEOGRAPHIES = ('ring', 'star', 'complete', 'random', 'grid')
+STRATEGIES = ('uniform', 'random')
+
+PETS = ('Dog', 'Cat', 'Zebra', 'Fish', 'Hamster', 'Bear', 'Parrot', 'Horse')
+DRINKS = ('Water', 'Beer', 'Juice', 'Tea', 'Coffee', 'Milk')
+CIGARETTES = ('Marlboro', 'Pall Mall', 'Dunhill', 'Blends', 'Blue Master', 'Prince')
+
+# Scenarios larger than this are written sparse unless asked otherwise
+SPARSE_THRESHOLD = 64
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    # splitmix64 finaliser, wraps modulo 2**64
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(0xBF58476D1CE4E5B9)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class Geography:
+    """
+    Neighbours and travel times of one generated island, one house at a time.
+
+    Only O(N) state is kept; the time of edge (i, j) is a hash of the seed
+    and the pair, so row(i) and row(j) agree without storing the matrix.
+    """
+
+    def __init__(self, kind: str, n: int, seed: int = 0, min_time: int = 1, max_time: int = 10,
+                 degree: float = 8.0):
+        if kind not in GEOGRAPHIES:
+            raise ValueError(f"Unknown geography: {kind}")
+        if n < 2:
+            raise ValueError("A scenario needs at least 2 houses")
+        self.kind = kind
+        self.n = n
+        self.seed = seed
+        self.min_time = min_time
+        self.max_time = max_time
+        # Wrapping 64-bit multiply done in Python: a NumPy scalar multiply warns on overflow
+        self._seed_hash = np.uint64(((seed & 0xFFFFFFFF) * 0x165667B19E3779F9) & 0xFFFFFFFFFFFFFFFF)
+
+        if kind == 'grid':
+            self._width = math.ceil(math.sqrt(n))
+        elif kind == 'random':
+            # Random geometric graph in the unit square; radius gives the expected degree
+            rng = np.random.default_rng(seed)
+            self._points = rng.random((n, 2))
+            self._radius = min(1.0, math.sqrt(degree / (math.pi * n)))
+            cells_per_side = max(1, int(1 / self._radius))
+            cells = np.minimum((self._points * cells_per_side).astype(np.int64), cells_per_side - 1)
+            self._cells_per_side = cells_per_side
+            self._cells = cells
+            cell_ids = cells[:, 0] * cells_per_side + cells[:, 1]
+            self._order = np.argsort(cell_ids, kind='stable')
+            # Houses of cell c are _order[_cell_starts[c]:_cell_starts[c + 1]]
+            self._cell_starts = np.searchsorted(cell_ids[self._order], np.arange(cells_per_side ** 2 + 1))
+
+    def _edge_times(self, i: int, js: np.ndarray) -> np.ndarray:
+        lo = np.minimum(js, i).astype(np.uint64)
+        hi = np.maximum(js, i).astype(np.uint64)
+        h = _mix(lo * np.uint64(0x9E3779B97F4A7C15) ^ hi * np.uint64(0xC2B2AE3D27D4EB4F)
+                 ^ self._seed_hash)
+        span = np.uint64(self.max_time - self.min_time + 1)
+        return (h % span).astype(np.int64) + self.min_time
+
+    def _random_row(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        k = i - 1
+        side = self._cells_per_side
+        cx, cy = self._cells[k]
+        candidates = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                x, y = cx + dx, cy + dy
+                if 0 <= x < side and 0 <= y < side:
+                    cell = x * side + y
+                    candidates.append(self._order[self._cell_starts[cell]:self._cell_starts[cell + 1]])
+        candidates = np.concatenate(candidates)
+        distance = np.hypot(*(self._points[candidates] - self._points[k]).T)
+        keep = (distance <= self._radius) & (candidates != k)
+        js = candidates[keep] + 1
+        order = np.argsort(js)
+        # Travel time grows with distance, from min_time next door to max_time at the radius
+        span = self.max_time - self.min_time
+        times = self.min_time + np.floor(distance[keep] / self._radius * span).astype(np.int64)
+        return js[order], times[order]
+
+    def row(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorted neighbours of house i (1-based) and the travel times to them."""
+        n = self.n
+        if self.kind == 'random':
+            return self._random_row(i)
+        if self.kind == 'ring':
+            js = np.unique(np.array([(i - 2) % n + 1, i % n + 1]))
+            js = js[js != i]
+        elif self.kind == 'star':
+            js = np.arange(2, n + 1) if i == 1 else np.array([1])
+        elif self.kind == 'complete':
+            js = np.concatenate([np.arange(1, i), np.arange(i + 1, n + 1)])
+        else:
+            w = self._width
+            r, c = divmod(i - 1, w)
+            js = [(r + dr) * w + (c + dc) + 1 for dr, dc in ((-1, 0), (0, -1), (0, 1), (1, 0))
+                  if 0 <= c + dc < w and r + dr >= 0]
+            js = np.array([j for j in js if j <= n], dtype=np.int64)
+        js = js.astype(np.int64)
+        return js, self._edge_times(i, js)
+
+    def rows(self) -> Iterator[Tuple[int, np.ndarray, np.ndarray]]:
+        for i in range(1, self.n + 1):
+            js, times = self.row(i)
+            yield i, js, times
+
+
+def _dense(n: int, i: int, js: np.ndarray, values: np.ndarray, missing: str, self_value: Optional[str]) -> str:
+    tokens = np.full(n, missing, dtype=object)
+    tokens[js - 1] = values.astype(str)
+    if self_value is not None:
+        tokens[i - 1] = self_value
+    return ';'.join(tokens.tolist())
+
+
+def _sparse(js: np.ndarray, values: np.ndarray) -> str:
+    return ';'.join(f"{j}:{v}" for j, v in zip(js.tolist(), values.tolist()))
+
+
+def _route_weights(strategy: str, rng: np.random.Generator, count: int) -> np.ndarray:
+    if strategy == 'uniform':
+        return np.full(count, 100 // max(count, 1) or 1, dtype=np.int64)
+    return rng.integers(1, 101, size=count)
+
+
+def generate_scenario(out_dir: str, n: int, geography: str = 'ring', strategy: str = 'uniform',
+                      seed: int = 0, sparse: Optional[bool] = None, min_time: int = 1, max_time: int = 10,
+                      degree: float = 8.0, house_exchange_prob: int = 50, pet_exchange_prob: int = 50,
+                      buffer_rows: int = 4096) -> Dict[str, str]:
+    """
+    Writes agents.csv, strategies.csv and geo.csv for n agents into out_dir.
+
+    Rows are produced one house at a time and written every buffer_rows rows,
+    so memory stays O(N) even for dense output. Returns the three paths.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    if sparse is None:
+        sparse = n > SPARSE_THRESHOLD
+
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {name: os.path.join(out_dir, f"{name}.csv") for name in ('agents', 'strategies', 'geo')}
+    geo = Geography(geography, n, seed, min_time, max_time, degree)
+    strategy_rng = np.random.default_rng([seed, 1])
+
+    with open(paths['agents'], 'w', encoding='utf-8') as agents_file, \
+            open(paths['strategies'], 'w', encoding='utf-8') as strategies_file, \
+            open(paths['geo'], 'w', encoding='utf-8') as geo_file:
+        buffers = ([], [], [])
+        files = (agents_file, strategies_file, geo_file)
+
+        for i, js, times in geo.rows():
+            color = f"C{i}"
+            nation = f"N{i}"
+            weights = _route_weights(strategy, strategy_rng, len(js))
+            if sparse:
+                # The own house at weight 0 keeps the row sparse even without routes
+                route = _sparse(np.append(i, js), np.append(0, weights))
+                travel = _sparse(js, times)
+            else:
+                route = _dense(n, i, js, weights, '0', None)
+                travel = _dense(n, i, js, times, 'NA', '0')
+
+            buffers[0].append(f"{i};{color};{nation};{DRINKS[i % len(DRINKS)]};"
+                              f"{CIGARETTES[i % len(CIGARETTES)]};{PETS[i % len(PETS)]}")
+            buffers[1].append(f"{i};{nation};{route};{house_exchange_prob};{pet_exchange_prob}")
+            buffers[2].append(f"{i};{color};{travel}")
+
+            if len(buffers[0]) >= buffer_rows:
+                for f, lines in zip(files, buffers):
+                    f.write('\n'.join(lines) + '\n')
+                    lines.clear()
+
+        for f, lines in zip(files, buffers):
+            if lines:
+                f.write('\n'.join(lines) + '\n')
+
+    return paths
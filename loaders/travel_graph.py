@@ -0,0 +1,146 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+# Sparse travel matrix in CSR form.
+#
+# Houses are numbered 1..N like the rows of the dense matrix. The routes out
+# of house i are indices[indptr[i]:indptr[i + 1]] (sorted target houses) with
+# the matching travel times in times[...]; indptr has N + 2 entries so that
+# row 0, unused in the dense matrix as well, is empty. A house has no route
+# to itself, but time(i, i) is 0 as on the diagonal of the dense matrix.
+# The arrays are array('q'), compact like numpy arrays but with cheap scalar
+# access for the simulation; arrays() returns zero-copy numpy views of them.
+
+DenseTravelMatrix = List[List[Optional[int]]]
+
+
+class TravelRow:
+    """Row i of a TravelGraph, indexable like a row of the dense matrix."""
+
+    __slots__ = ('graph', 'house')
+
+    def __init__(self, graph: 'TravelGraph', house: int):
+        self.graph = graph
+        self.house = house
+
+    def __getitem__(self, target: int) -> Optional[int]:
+        return self.graph.time(self.house, target)
+
+    def __len__(self) -> int:
+        return len(self.graph)
+
+    def __iter__(self) -> Iterator[Optional[int]]:
+        # The dense row, None where there is no route
+        row = [None] * len(self.graph)
+        if 0 < self.house <= self.graph.num_houses:
+            row[self.house] = 0
+            for target, time in zip(*self.graph.neighbors(self.house)):
+                row[target] = time
+        return iter(row)
+
+
+class TravelGraph:
+    """
+    Travel times between houses, stored per route instead of per pair.
+
+    graph[i][j] behaves like the dense travel matrix (None: no route), while
+    neighbors(i) lists the routes out of house i in O(degree).
+    """
+
+    def __init__(self, indptr: Sequence[int], indices: Sequence[int], times: Sequence[int]):
+        self.indptr = array('q', indptr)
+        self.indices = array('q', indices)
+        self.times = array('q', times)
+        if len(self.indptr) < 2 or len(self.indices) != len(self.times) or self.indptr[-1] != len(self.indices):
+            raise ValueError("Inconsistent CSR arrays")
+
+    @property
+    def num_houses(self) -> int:
+        return len(self.indptr) - 2
+
+    @property
+    def num_routes(self) -> int:
+        return len(self.indices)
+
+    def __len__(self) -> int:
+        # Same as len() of the dense matrix, which has an unused row and column 0
+        return len(self.indptr) - 1
+
+    def __getitem__(self, house: int) -> TravelRow:
+        return TravelRow(self, house)
+
+    def neighbors(self, house: int) -> Tuple[List[int], List[int]]:
+        """Target houses reachable from house, in increasing order, and the travel times to them."""
+        if not 0 < house <= self.num_houses:
+            return [], []
+        start, end = self.indptr[house], self.indptr[house + 1]
+        return self.indices[start:end].tolist(), self.times[start:end].tolist()
+
+    def degree(self, house: int) -> int:
+        if not 0 < house <= self.num_houses:
+            return 0
+        return self.indptr[house + 1] - self.indptr[house]
+
+    def time(self, source: int, target: int) -> Optional[int]:
+        """Travel time from source to target, None if there is no route."""
+        if not 0 < source <= self.num_houses:
+            return None
+        if source == target:
+            return 0
+        start, end = self.indptr[source], self.indptr[source + 1]
+        k = bisect_left(self.indices, target, start, end)
+        if k < end and self.indices[k] == target:
+            return self.times[k]
+        return None
+
+    def max_time(self) -> int:
+        return max(self.times, default=0)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(indptr, indices, times) as numpy views sharing memory with the graph."""
+        return tuple(np.frombuffer(a, dtype=np.int64) if len(a) else np.zeros(0, dtype=np.int64)
+                     for a in (self.indptr, self.indices, self.times))
+
+    @classmethod
+    def from_dense(cls, travel_matrix: DenseTravelMatrix) -> 'TravelGraph':
+        """Converts the dense (N+1)×(N+1) list form; the diagonal and None entries are not routes."""
+        builder = TravelGraphBuilder()
+        for i in range(1, len(travel_matrix)):
+            row = travel_matrix[i]
+            builder.add_row([j for j in range(1, len(row)) if j != i and row[j] is not None],
+                            [row[j] for j in range(1, len(row)) if j != i and row[j] is not None])
+        return builder.build()
+
+    def to_dense(self) -> DenseTravelMatrix:
+        return [list(self[i]) for i in range(len(self))]
+
+    def __repr__(self) -> str:
+        return f"TravelGraph(houses={self.num_houses}, routes={self.num_routes})"
+
+
+class TravelGraphBuilder:
+    """Collects the routes of houses 1, 2, ... in order, one row at a time."""
+
+    def __init__(self):
+        self._indptr = array('q', [0, 0])
+        self._indices = array('q')
+        self._times = array('q')
+
+    def add_row(self, targets: Sequence[int], times: Sequence[int]) -> None:
+        order = sorted(range(len(targets)), key=targets.__getitem__)
+        self._indices.extend(targets[k] for k in order)
+        self._times.extend(times[k] for k in order)
+        self._indptr.append(len(self._indices))
+
+    def build(self) -> TravelGraph:
+        return TravelGraph(self._indptr, self._indices, self._times)
+
+
+def as_travel_graph(travel_matrix: Union[TravelGraph, DenseTravelMatrix]) -> TravelGraph:
+    if isinstance(travel_matrix, TravelGraph):
+        return travel_matrix
+    return TravelGraph.from_dense(travel_matrix)
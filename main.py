@@ -1,9 +1,11 @@
 import os
 
-from analysis import SimulationAnalyzer
-from knowledge_logging import KnowledgeLogAnalyzer
-from loaders.csv_utils import load_strategies, load_initial_data, load_geography
+from analysis import SimulationAnalyzer, GeographyAnalysis
+from knowledge_logging import LiveKnowledgeLogger
+from loaders.csv_utils import load_strategies, load_initial_data, load_travel_graph
+from loaders.knowledge_snapshot import write_knowledge_snapshot
 from simulation.environment import Environment
+from simulation.sinks import FileSink, BinaryFileSink, MultiSink
 
 
 if __name__ == "__main__":
@@ -11,31 +13,29 @@ if __name__ == "__main__":
 
     strategies = load_strategies(os.path.join(base_dir, "data/input_data/ZEBRA-strategies.csv"))
     agents, houses = load_initial_data(os.path.join(base_dir, "data/input_data/zebra-01.csv"), strategies=strategies)
-    T = load_geography(os.path.join(base_dir, "data/input_data/ZEBRA-geo.csv"))
+    T = load_travel_graph(os.path.join(base_dir, "data/input_data/ZEBRA-geo.csv"))
 
     max_time = 2000
-    envi = Environment(agents, houses, T, max_time)
-    log = envi.run(max_time)
-
     output_dir = os.path.join(base_dir, "data/output_data/logs")
     os.makedirs(output_dir, exist_ok=True)
 
+    # Which agents can ever meet, from geography and strategies alone
+    print(GeographyAnalysis(T, agents, houses, max_time).report())
+
+    # Knowledge logs are written during the run by the observer hook
+    knowledge_logger = LiveKnowledgeLogger(output_dir)
+    envi = Environment(agents, houses, T, max_time, knowledge_observer=knowledge_logger)
+
     log_file_path = os.path.join(output_dir, "observer.csv")
-    with open(log_file_path, "w", encoding="utf-8") as f:
-        for entry in log:
-            f.write(entry + "\n")
-        f.write("---- KNOWLEDGE ----\n")
-        for a in envi.agents.values():
-            f.write(f"{a.id};{a.knowledge}\n")
+    binary_log_path = os.path.join(output_dir, "observer.evlog")
+    with FileSink(log_file_path) as sink, BinaryFileSink(binary_log_path) as binary_sink, knowledge_logger:
+        envi.run(max_time, sink=MultiSink(sink, binary_sink))
+
+    # Final knowledge of every agent as a binary table, one row per (observer, subject)
+    knowledge_path = os.path.join(output_dir, "knowledge.snapshot")
+    write_knowledge_snapshot(knowledge_path, envi.agents)
 
     # Run log analysis
-    analyzer = SimulationAnalyzer(log_file_path)
+    analyzer = SimulationAnalyzer(log_file_path, knowledge_path)
     analyzer.run_complete_analysis()
 
-    knowledge = KnowledgeLogAnalyzer(
-    observer_log_path="data/output_data/logs/observer.csv",
-    agents_csv_path="data/input_data/zebra-01.csv",
-    output_dir="data/output_data/logs/"
-    )
-    knowledge.generate_knowledge_logs()
-
@@ -1,5 +1,36 @@
 # Simulation module
 from .environment import Environment
+from .vectorized import VectorizedEnvironment
+from .sinks import EventSink, MemorySink, FileSink, BinaryFileSink, MultiSink, NullSink, CountingSink
+from .ensemble import EnsembleRunner, EnsembleResult, RunningStats
+from .sweep import ParameterSweep, SweepResult
+from .convergence import StopCriterion, FullKnowledge, StableKnowledge, Predicate
+from .checkpoint import save_checkpoint, load_checkpoint, fork_environment
+from .instrumentation import Instrumentation, compare_reports, load_report
 
-__all__ = ['Environment']
-
+__all__ = [
+    'Environment',
+    'VectorizedEnvironment',
+    'EventSink',
+    'MemorySink',
+    'FileSink',
+    'BinaryFileSink',
+    'MultiSink',
+    'NullSink',
+    'CountingSink',
+    'EnsembleRunner',
+    'EnsembleResult',
+    'RunningStats',
+    'ParameterSweep',
+    'SweepResult',
+    'StopCriterion',
+    'FullKnowledge',
+    'StableKnowledge',
+    'Predicate',
+    'save_checkpoint',
+    'load_checkpoint',
+    'fork_environment',
+    'Instrumentation',
+    'compare_reports',
+    'load_report',
+]
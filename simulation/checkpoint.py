@@ -0,0 +1,94 @@
+import io
+import os
+import pickle
+import zlib
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    from simulation.environment import Environment
+
+
+# Checkpoints of a running Environment.
+#
+# File layout: MAGIC, one version byte, one flag byte (1 = zlib-compressed),
+# then the pickled environment: event queue, agents, houses, knowledge, RNG
+# streams with their pending blocks, occupancy and the event counter. A
+# restored environment continues exactly where the saved one stopped; run()
+# on it produces the same events, numbered on from the saved counter.
+#
+# Knowledge observers hold open log files and are not saved; attach a new one
+# with set_knowledge_observer() after restoring. Sinks belong to run(), not
+# to the environment, so they are never part of a checkpoint either.
+
+MAGIC = b"ZEBRACKP"
+# Bump when the pickled layout of the simulation classes changes
+CHECKPOINT_VERSION = 2
+
+_COMPRESSED = 1
+
+
+def save_checkpoint(env: 'Environment', path: str, compress: bool = True) -> None:
+    """Writes env to path; the file is replaced atomically."""
+    payload = pickle.dumps(env, protocol=pickle.HIGHEST_PROTOCOL)
+    flags = 0
+    if compress:
+        # Level 1: knowledge dicts shrink several times at a fraction of the default cost
+        payload = zlib.compress(payload, 1)
+        flags |= _COMPRESSED
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(bytes((CHECKPOINT_VERSION, flags)))
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path: str) -> 'Environment':
+    with open(path, "rb") as f:
+        header = f.read(len(MAGIC) + 2)
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an environment checkpoint")
+        version, flags = header[len(MAGIC)], header[len(MAGIC) + 1]
+        if version != CHECKPOINT_VERSION:
+            raise ValueError(f"Unsupported checkpoint version {version} (expected {CHECKPOINT_VERSION})")
+        payload = f.read()
+    if flags & _COMPRESSED:
+        payload = zlib.decompress(payload)
+    return pickle.loads(payload)
+
+
+class _SharingPickler(pickle.Pickler):
+    # Objects in `shared` are written as references and handed back as is
+    def __init__(self, file: io.BytesIO, shared: Dict[int, Any]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.shared = shared
+
+    def persistent_id(self, obj: Any) -> Optional[int]:
+        key = id(obj)
+        return key if key in self.shared else None
+
+
+class _SharingUnpickler(pickle.Unpickler):
+    def __init__(self, file: io.BytesIO, shared: Dict[int, Any]):
+        super().__init__(file)
+        self.shared = shared
+
+    def persistent_load(self, pid: int) -> Any:
+        return self.shared[pid]
+
+
+def fork_environment(env: 'Environment') -> 'Environment':
+    """
+    An independent copy of env that continues from the same state.
+
+    The geography is never modified by the simulation, so both copies share
+    the travel matrix and graph; everything else is copied through an
+    in-memory pickle, which is much faster than copy.deepcopy. The fork has
+    no knowledge observer.
+    """
+    shared = {id(obj): obj for obj in (env.travel_matrix, env.travel_graph)}
+    buffer = io.BytesIO()
+    _SharingPickler(buffer, shared).dump(env)
+    buffer.seek(0)
+    return _SharingUnpickler(buffer, shared).load()
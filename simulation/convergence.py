@@ -0,0 +1,91 @@
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Callable, Iterable, Optional, Sequence, Union
+
+if TYPE_CHECKING:
+    from simulation.environment import Environment
+
+
+# Stopping criteria for Environment.run(..., stop=...).
+#
+# A criterion is checked after every batch. check() returns the convergence
+# time once it is met and None until then; it must be O(1), so the built-in
+# criteria only read env.known_pairs, the number of (observer, subject) pairs
+# with observer != subject that Environment keeps up to date as agents learn.
+
+
+class StopCriterion(ABC):
+    """Base class for stopping criteria."""
+
+    name = "criterion"
+
+    def reset(self, env: 'Environment') -> None:
+        """Called when a run starts."""
+
+    @abstractmethod
+    def check(self, env: 'Environment') -> Optional[int]:
+        """The convergence time once the criterion is met, None until then."""
+
+
+class FullKnowledge(StopCriterion):
+    """Every agent knows every other agent."""
+
+    name = "full_knowledge"
+
+    def check(self, env: 'Environment') -> Optional[int]:
+        n = len(env.agents)
+        if env.known_pairs >= n * (n - 1):
+            return env.time
+        return None
+
+
+class StableKnowledge(StopCriterion):
+    """
+    Knowledge coverage has not grown for `ticks` ticks.
+
+    The convergence time is the last tick at which it grew, not the tick at
+    which the run is stopped.
+    """
+
+    name = "stable_knowledge"
+
+    def __init__(self, ticks: int):
+        if ticks <= 0:
+            raise ValueError("ticks must be positive")
+        self.ticks = ticks
+        self._known_pairs = 0
+        self._changed_at = 0
+
+    def reset(self, env: 'Environment') -> None:
+        self._known_pairs = env.known_pairs
+        self._changed_at = env.time
+
+    def check(self, env: 'Environment') -> Optional[int]:
+        if env.known_pairs != self._known_pairs:
+            self._known_pairs = env.known_pairs
+            self._changed_at = env.time
+            return None
+        if env.time - self._changed_at >= self.ticks:
+            return self._changed_at
+        return None
+
+
+class Predicate(StopCriterion):
+    """A user-supplied condition on the environment; it should be cheap, it runs after every batch."""
+
+    def __init__(self, predicate: Callable[['Environment'], bool], name: str = "predicate"):
+        self.predicate = predicate
+        self.name = name
+
+    def check(self, env: 'Environment') -> Optional[int]:
+        return env.time if self.predicate(env) else None
+
+
+StopSpec = Union[StopCriterion, Callable[['Environment'], bool], Sequence[Union[StopCriterion, Callable[['Environment'], bool]]]]
+
+
+def as_criteria(stop: Optional[StopSpec]) -> Sequence[StopCriterion]:
+    """Normalises the stop argument of Environment.run: a criterion, a callable, or a list of them."""
+    if stop is None:
+        return ()
+    items: Iterable = stop if isinstance(stop, (list, tuple)) else (stop,)
+    return tuple(item if isinstance(item, StopCriterion) else Predicate(item) for item in items)
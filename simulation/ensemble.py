@@ -0,0 +1,149 @@
+import copy
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from statistics import NormalDist
+from typing import Dict, Optional, Any, Tuple, Union
+
+from loaders.csv_utils import count_houses, load_strategies, load_initial_data, load_travel_graph
+from loaders.travel_graph import DenseTravelMatrix, TravelGraph
+from simulation.environment import Environment
+from simulation.sinks import CountingSink
+from simulation.workers import install_inputs, worker_inputs
+
+
+ENSEMBLE_METRICS = ('trip_success_rate', 'house_exchanges', 'pet_exchanges', 'knowledge_coverage')
+
+
+class RunningStats:
+    """Streaming mean/variance (Welford) for one metric across replicas."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def half_width(self, confidence: float = 0.95) -> float:
+        if self.count < 2:
+            return math.inf
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        return z * math.sqrt(self.variance / self.count)
+
+    def confidence_interval(self, confidence: float = 0.95) -> Tuple[float, float]:
+        h = self.half_width(confidence)
+        return self.mean - h, self.mean + h
+
+    def __repr__(self) -> str:
+        return f"RunningStats(n={self.count}, mean={self.mean:.4f}, var={self.variance:.4f})"
+
+
+def summarize_run(env: Environment, stats: CountingSink) -> Dict[str, float]:
+    """Per-replica metrics taken from a finished environment and the counts of its log."""
+    n = len(env.agents)
+    known_others = sum(len(agent.knowledge) - (agent.id in agent.knowledge) for agent in env.agents.values())
+    return {
+        'trip_success_rate': stats.successful_trips / stats.trips_with_result if stats.trips_with_result else 0.0,
+        'house_exchanges': float(stats.counts['changeHouse']),
+        'pet_exchanges': float(stats.counts['ChangePet']),
+        'knowledge_coverage': known_others / (n * (n - 1)) if n > 1 else 1.0,
+    }
+
+
+def _run_replica(seed: int) -> Dict[str, float]:
+    agents, houses, travel_matrix, max_time = worker_inputs()
+    # Environment mutates agents and houses, so every replica gets a fresh copy
+    agents, houses = copy.deepcopy((agents, houses))
+    env = Environment(agents, houses, travel_matrix, max_time, seed=seed)
+    stats = CountingSink()
+    env.run(max_time, sink=stats)
+    return summarize_run(env, stats)
+
+
+class EnsembleResult:
+    def __init__(self, metrics: Dict[str, RunningStats], confidence: float, converged: bool):
+        self.metrics = metrics
+        self.confidence = confidence
+        self.converged = converged
+
+    @property
+    def replicas(self) -> int:
+        return next(iter(self.metrics.values())).count
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for name, stats in self.metrics.items():
+            low, high = stats.confidence_interval(self.confidence)
+            result[name] = {'mean': stats.mean, 'ci_low': low, 'ci_high': high, 'n': stats.count}
+        return result
+
+    def __repr__(self) -> str:
+        return f"EnsembleResult(replicas={self.replicas}, converged={self.converged})"
+
+
+class EnsembleRunner:
+    """Runs independent replicas of one scenario across a process pool."""
+
+    def __init__(self, agents: Dict[int, 'Agent'], houses: Dict[int, 'House'],
+                 travel_matrix: Union[TravelGraph, DenseTravelMatrix], max_time: int,
+                 workers: Optional[int] = None, base_seed: int = 0, confidence: float = 0.95):
+        self.agents = agents
+        self.houses = houses
+        self.travel_matrix = travel_matrix
+        self.max_time = max_time
+        self.workers = workers or os.cpu_count() or 1
+        self.base_seed = base_seed
+        self.confidence = confidence
+
+    @classmethod
+    def from_files(cls, agents_path: str, strategies_path: str, geography_path: str, max_time: int,
+                   **kwargs: Any) -> 'EnsembleRunner':
+        strategies = load_strategies(strategies_path, count_houses(agents_path))
+        agents, houses = load_initial_data(agents_path, strategies=strategies)
+        travel_matrix = load_travel_graph(geography_path)
+        return cls(agents, houses, travel_matrix, max_time, **kwargs)
+
+    def _is_converged(self, metrics: Dict[str, RunningStats], ci_tolerance: Dict[str, float]) -> bool:
+        return all(metrics[name].half_width(self.confidence) <= tol for name, tol in ci_tolerance.items())
+
+    def run(self, replicas: int, ci_tolerance: Optional[Dict[str, float]] = None,
+            min_replicas: int = 10) -> EnsembleResult:
+        """
+        Runs up to `replicas` replicas and merges their metrics as they finish.
+
+        ci_tolerance maps metric names to the largest acceptable CI half-width;
+        once every listed metric is that narrow (after min_replicas) no new
+        replicas are submitted.
+        """
+        metrics = {name: RunningStats() for name in ENSEMBLE_METRICS}
+        ci_tolerance = ci_tolerance or {}
+        converged = False
+
+        initargs = (self.agents, self.houses, self.travel_matrix, self.max_time)
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=install_inputs, initargs=initargs) as pool:
+            submitted = 0
+            pending = set()
+            while pending or (submitted < replicas and not converged):
+                # Keep a couple of tasks per worker in flight so early stopping wastes little work
+                while not converged and submitted < replicas and len(pending) < 2 * self.workers:
+                    pending.add(pool.submit(_run_replica, self.base_seed + submitted))
+                    submitted += 1
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for name, value in future.result().items():
+                        metrics[name].add(value)
+
+                if ci_tolerance and metrics[ENSEMBLE_METRICS[0]].count >= min_replicas:
+                    converged = self._is_converged(metrics, ci_tolerance)
+
+        return EnsembleResult(metrics, self.confidence, converged)
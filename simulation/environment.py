@@ -1,56 +1,149 @@
-import heapq
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, Union
 
+from entities.knowledge import KnowledgeObserver, KnowledgeStore
+from entities.store import EntityStore
 from loaders.csv_utils import build_color_to_prob_index
+from loaders.travel_graph import DenseTravelMatrix, TravelGraph, as_travel_graph
 from events.base import Event
 from events.trip import FinishTripEvent, StartTripEvent
 from events.exchange import ChangePetEvent, ChangeHouseEvent
+from events.pool import TripEventPool
+from simulation.checkpoint import fork_environment, load_checkpoint, save_checkpoint
+from simulation.convergence import StopSpec, as_criteria
+from simulation.instrumentation import Instrumentation
+from simulation.occupancy import OccupancyIndex
+from simulation.rng import SimulationRNG
+from simulation.scheduler import HeapScheduler, CalendarScheduler
+from simulation.sinks import EventSink, MemorySink
 
 
 class Environment:
-    def __init__(self, agents: Dict[int, 'Agent'], houses: Dict[int, 'House'], travel_matrix: List[List[Optional[int]]], max_time: int):
+    def __init__(self, agents: Dict[int, 'Agent'], houses: Dict[int, 'House'], travel_matrix: Union[TravelGraph, DenseTravelMatrix], max_time: int,
+                 seed: Optional[int] = None, knowledge_backend: str = "dict", scheduler: str = "heap",
+                 knowledge_observer: Optional[KnowledgeObserver] = None, instrumentation: Optional[Instrumentation] = None,
+                 compact: bool = False):
+        # compact=True moves plain agents and houses into an EntityStore; use env.agents / env.houses afterwards
+        if compact and EntityStore.of(agents) is None:
+            agents, houses = EntityStore.from_entities(agents, houses)
+        self.entity_store = EntityStore.of(agents)
         self.agents = agents
         self.houses = houses
         self.travel_matrix = travel_matrix
+        # Sparse view used by the simulation; a dense matrix is converted once
+        self.travel_graph = as_travel_graph(travel_matrix)
         self.max_time = max_time
         self.time = 0
-        self.event_queue: List[Event] = []
+        # "heap": binary heap; "calendar": per-tick ring buffer sized to the longest trip
+        if scheduler == "heap":
+            self.event_queue = HeapScheduler()
+        elif scheduler == "calendar":
+            self.event_queue = CalendarScheduler(self._max_travel_time())
+        else:
+            raise ValueError(f"Unknown scheduler: {scheduler}")
+        self.trip_events = TripEventPool()
         self.house_exchange_events: List[ChangeHouseEvent] = []
+        self.rng = SimulationRNG(seed)
+
+        # "dict": per-agent dict-of-dicts; "array": shared N×N KnowledgeStore
+        if knowledge_backend == "array":
+            self.knowledge_store: Optional[KnowledgeStore] = KnowledgeStore(agents)
+        elif knowledge_backend == "dict":
+            self.knowledge_store = None
+        else:
+            raise ValueError(f"Unknown knowledge backend: {knowledge_backend}")
+
+        self.knowledge_observer: Optional[KnowledgeObserver] = None
+        if knowledge_observer is not None:
+            self.set_knowledge_observer(knowledge_observer)
 
         self.color_to_prob_index = build_color_to_prob_index(houses)
+        self.occupancy = OccupancyIndex(houses)
+
+        # (observer, subject) pairs with observer != subject, kept up to date as agents learn
+        self.known_pairs = sum(len(agent.knowledge) - (agent.id in agent.knowledge) for agent in agents.values())
+        # Set by run(): when a stop criterion was met (None if none was), and why the run ended
+        self.convergence_time: Optional[int] = None
+        self.stop_reason: Optional[str] = None
+        # Number of the next logged event; a later run() continues from it
+        self.event_counter = 1
+        # Phase timers and counters for run(); None costs nothing (see simulation.instrumentation)
+        self.instrumentation = instrumentation
 
         for house_id, house in houses.items():
             owner = house.owner_id
             house.enter(owner)
 
         for agent_id, agent in self.agents.items():
-            target = agent.choose_trip_target(self.travel_matrix, self.houses, self.color_to_prob_index)
+            target = agent.choose_trip_target(self.travel_graph, self.houses, self.color_to_prob_index, self.rng.trip)
             if target is not None:
-                start_event = StartTripEvent(time=0, agent_id=agent_id, target_house=target)
-                self.push_event(start_event)
+                self.push_event(self.trip_events.start_trip(0, agent_id, target))
+
+    def invalidate_trip_tables(self) -> None:
+        # Call after changing house colors or the travel matrix in place
+        self.travel_graph = as_travel_graph(self.travel_matrix)
+        self.color_to_prob_index = build_color_to_prob_index(self.houses)
+        for agent in self.agents.values():
+            agent.invalidate_trip_tables()
+
+    def set_knowledge_observer(self, observer: Optional[KnowledgeObserver]) -> None:
+        """Routes every knowledge change of the agents to observer (None detaches it)."""
+        self._route_knowledge(observer)
+        if observer is not None:
+            observer.attach(self.agents, self.time)
+
+    def _route_knowledge(self, observer: Optional[KnowledgeObserver]) -> None:
+        self.knowledge_observer = observer
+        for agent in self.agents.values():
+            agent.knowledge_observer = observer
+        if self.knowledge_store is not None:
+            self.knowledge_store.observer = observer
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        # Observers hold open files; pooled trip events are just spare objects
+        state['knowledge_observer'] = None
+        state['instrumentation'] = None
+        state['trip_events'] = TripEventPool()
+        return state
+
+    def checkpoint(self, path: str, compress: bool = True) -> None:
+        """Saves the current state to path (see simulation.checkpoint)."""
+        save_checkpoint(self, path, compress)
+
+    @classmethod
+    def restore(cls, path: str) -> 'Environment':
+        """Loads an environment saved with checkpoint(); run() continues where it stopped."""
+        env = load_checkpoint(path)
+        if not isinstance(env, cls):
+            raise TypeError(f"{path} holds a {type(env).__name__}, not a {cls.__name__}")
+        return env
+
+    def fork(self) -> 'Environment':
+        """An independent copy continuing from the current state, sharing the geography."""
+        return fork_environment(self)
+
+    def _max_travel_time(self) -> int:
+        return self.travel_graph.max_time()
 
     def push_event(self, event: Event) -> None:
-        heapq.heappush(self.event_queue, event)
+        self.event_queue.push(event)
 
     def detect_and_generate_exchanges(self) -> List[ChangePetEvent]:
-        from events.base import EVENT_PRIORITY_EXCHANGE
-
         exchange_events = []
 
-        for house_id, house in self.houses.items():
+        for house_id in self.occupancy.crowded_houses():
+            house = self.houses[house_id]
             # Only allow pet exchanges when owner is present (same as house exchanges)
             if not house.is_owner_home():
                 continue
 
-            present_agents = sorted(list(house.present_agents))
-            if len(present_agents) < 2:
-                continue
+            present_agents = house.occupants
 
-            ready_participants = []
-            for agent_id in present_agents:
-                agent = self.agents[agent_id]
-                if __import__('random').randint(1, 100) <= agent.pet_exchange_prob:
-                    ready_participants.append(agent_id)
+            draws = self.rng.pet_exchange.take(len(present_agents))
+            ready_participants = [
+                agent_id for agent_id, draw in zip(present_agents, draws)
+                if draw <= self.agents[agent_id].pet_exchange_prob
+            ]
 
             if len(ready_participants) >= 2:
                 ready_participants_sorted = sorted(ready_participants)
@@ -71,46 +164,56 @@ class Environment:
         return exchange_events
 
     def update_knowledge_in_houses_with_owner(self, time: int) -> None:
-        for house in self.houses.values():
-            if house.is_owner_home():
-                present_agents = list(house.present_agents)
-                for agent_id in present_agents:
-                    agent = self.agents[agent_id]
-                    for other_id in present_agents:
-                        if other_id != agent_id:
-                            other_agent = self.agents[other_id]
-                            agent.update_knowledge(other_agent, time)
+        occupancy = self.occupancy
+        for house_id in occupancy.crowded_houses():
+            house = self.houses[house_id]
+            if house.is_owner_home() and occupancy.needs_sync(house_id, time):
+                present_agents = house.occupants
+                if self.knowledge_store is not None:
+                    self.known_pairs += self.knowledge_store.record(present_agents, present_agents, time, self.agents)
+                else:
+                    for agent_id in present_agents:
+                        agent = self.agents[agent_id]
+                        for other_id in present_agents:
+                            if other_id != agent_id:
+                                other_agent = self.agents[other_id]
+                                if agent.update_knowledge(other_agent, time):
+                                    self.known_pairs += 1
+                occupancy.mark_synced(house_id, time)
+        occupancy.clear_dirty()
 
     def _process_batch_events(self, batch: List[Event], time: int) -> Tuple[List[FinishTripEvent], List[StartTripEvent], List[Event], List[ChangePetEvent]]:
-        from events.base import EVENT_PRIORITY_FINISH_TRIP, EVENT_PRIORITY_EXCHANGE, EVENT_PRIORITY_START_TRIP
-
-        def event_priority(e: Event) -> Tuple[int, bool]:
-            if isinstance(e, FinishTripEvent):
-                # Хозяева (возвращающиеся домой) обрабатываются раньше туристов
-                # is_return_home=True -> (0, True) - обрабатывается первым
-                # is_return_home=False -> (0, False) - обрабатывается вторым
-                return (EVENT_PRIORITY_FINISH_TRIP, not e.is_return_home)
-            elif hasattr(e, 'participant_ids'):
-                return (EVENT_PRIORITY_EXCHANGE, False)
+        # The queue already yields the batch in processing order; only split it by type
+        finish_events = []
+        start_events = []
+        other_events = []
+        for event in batch:
+            if isinstance(event, FinishTripEvent):
+                finish_events.append(event)
+            elif isinstance(event, StartTripEvent):
+                start_events.append(event)
             else:
-                return (EVENT_PRIORITY_START_TRIP, False)
+                other_events.append(event)
 
-        batch.sort(key=event_priority)
-
-        finish_events = [e for e in batch if isinstance(e, FinishTripEvent)]
-        start_events = [e for e in batch if isinstance(e, StartTripEvent)]
-        other_events = [e for e in batch if not isinstance(e, (FinishTripEvent, StartTripEvent))]
+        observer = self.knowledge_observer
 
+        # House exchanges run inside finish events
         for event in finish_events:
             event.run(self)
+        if observer is not None:
+            observer.flush(time, "ChangeHouse")
 
         self.update_knowledge_in_houses_with_owner(time)
+        if observer is not None:
+            observer.flush(time, "FinishTrip")
 
         exchange_events = []
         if finish_events:
             exchange_events = self.detect_and_generate_exchanges()
             for event in exchange_events:
                 event.run(self)
+            if observer is not None:
+                observer.flush(time, "ChangePet")
 
         for event in start_events:
             event.run(self)
@@ -120,14 +223,13 @@ class Environment:
 
         return finish_events, start_events, other_events, exchange_events
 
-    def _log_events(self, finish_events: List[FinishTripEvent], exchange_events: List[ChangePetEvent], house_exchange_events: List[ChangeHouseEvent], start_events: List[StartTripEvent], event_counter: int, csv_log: List[str]) -> int:
-        from loaders.csv_utils import log_formatter
-
-        all_events = finish_events + exchange_events + house_exchange_events + start_events
-        for event in all_events:
-            event_type, extra = event.get_log_data(self)
-            csv_log.append(log_formatter(event_counter, event.time, event_type, *extra))
-            event_counter += 1
+    def _log_events(self, finish_events: List[FinishTripEvent], exchange_events: List[ChangePetEvent], house_exchange_events: List[ChangeHouseEvent], start_events: List[StartTripEvent], event_counter: int, sink: EventSink) -> int:
+        emit = sink.emit
+        for events in (finish_events, exchange_events, house_exchange_events, start_events):
+            for event in events:
+                event_type, extra = event.get_log_data(self)
+                emit(event_counter, event.time, event_type, extra)
+                event_counter += 1
         return event_counter
 
     def _plan_new_trips(self, finish_events: List[FinishTripEvent]) -> None:
@@ -136,49 +238,76 @@ class Environment:
             if agent.is_travelling:
                 continue
             if agent.location == agent.house_id:
-                new_target = agent.choose_trip_target(self.travel_matrix, self.houses, self.color_to_prob_index)
+                new_target = agent.choose_trip_target(self.travel_graph, self.houses, self.color_to_prob_index, self.rng.trip)
                 if new_target is not None:
-                    travel_time = self.travel_matrix[agent.location][new_target]
+                    travel_time = self.travel_graph.time(agent.location, new_target)
                     if travel_time is not None and travel_time >= 0:
-                        start_time = self.time
-                        start_event = StartTripEvent(time=start_time, agent_id=agent.id, target_house=new_target)
-                        self.push_event(start_event)
+                        self.push_event(self.trip_events.start_trip(self.time, agent.id, new_target))
             else:
                 home = agent.house_id
-                travel_time = self.travel_matrix[agent.location][home]
+                travel_time = self.travel_graph.time(agent.location, home)
                 if travel_time is not None and travel_time >= 0:
-                    start_time = self.time
-                    start_event = StartTripEvent(time=start_time, agent_id=agent.id, target_house=home)
-                    self.push_event(start_event)
-
-    def run(self, max_time: int) -> List[str]:
-        from events.base import EVENT_PRIORITY_FINISH_TRIP, EVENT_PRIORITY_EXCHANGE, EVENT_PRIORITY_START_TRIP
-
-        event_counter = 1
-        csv_log = []
-
-        while self.event_queue and self.time <= max_time:
-            t = self.event_queue[0].time
+                    self.push_event(self.trip_events.start_trip(self.time, agent.id, home))
+
+    def run(self, max_time: int, sink: Optional[EventSink] = None, stop: Optional[StopSpec] = None) -> List[str]:
+        """
+        Runs the simulation up to max_time, emitting every logged event to sink.
+
+        Without a sink the lines are collected in memory and returned; with an
+        explicit sink nothing is kept and an empty list is returned.
+
+        stop is a simulation.convergence criterion, a predicate on the
+        environment, or a list of them, checked after every batch. The run
+        ends at the first one met: convergence_time is its convergence time
+        and stop_reason its name. Otherwise stop_reason is "max_time" or
+        "queue_empty" and convergence_time stays None.
+
+        With an Instrumentation attached the run is timed phase by phase and
+        counted into it; the events are the same either way.
+        """
+        in_memory = sink is None
+        if in_memory:
+            sink = MemorySink()
+
+        if self.instrumentation is None:
+            self._run(max_time, sink, stop)
+        else:
+            with self.instrumentation.capture(self):
+                self._run(max_time, sink, stop)
+        return sink.lines if in_memory else []
+
+    def _run(self, max_time: int, sink: EventSink, stop: Optional[StopSpec]) -> None:
+        criteria = as_criteria(stop)
+        for criterion in criteria:
+            criterion.reset(self)
+        self.convergence_time = None
+        self.stop_reason = "queue_empty"
+
+        event_counter = self.event_counter
+        queue = self.event_queue
+
+        while queue:
+            t = queue.peek_time()
+            if t > max_time:
+                self.stop_reason = "max_time"
+                break
             self.time = t
 
-            while self.event_queue and self.event_queue[0].time == self.time:
-                batch = []
-                while self.event_queue and self.event_queue[0].time == self.time:
-                    batch.append(heapq.heappop(self.event_queue))
-
-                if not batch:
+            batch = queue.pop_batch(t)
+            finish_events, start_events, other_events, exchange_events = self._process_batch_events(batch, t)
+            event_counter = self._log_events(finish_events, exchange_events, self.house_exchange_events, start_events, event_counter, sink)
+            self.house_exchange_events.clear()
+
+            self._plan_new_trips(finish_events)
+            # Nothing refers to this batch's trip events any more
+            self.trip_events.release(batch)
+            self.event_counter = event_counter
+
+            for criterion in criteria:
+                converged = criterion.check(self)
+                if converged is not None:
+                    self.convergence_time = converged
+                    self.stop_reason = criterion.name
                     break
-
-                batch.sort(key=lambda e: (EVENT_PRIORITY_FINISH_TRIP,
-                                          not e.is_return_home if isinstance(e, FinishTripEvent) else False) if isinstance(e, FinishTripEvent) else
-                                          (EVENT_PRIORITY_EXCHANGE, False) if hasattr(e, 'participant_ids') else
-                                          (EVENT_PRIORITY_START_TRIP, False))
-
-                finish_events, start_events, other_events, exchange_events = self._process_batch_events(batch, self.time)
-                event_counter = self._log_events(finish_events, exchange_events, self.house_exchange_events, start_events, event_counter, csv_log)
-                self.house_exchange_events.clear()
-
-                self._plan_new_trips(finish_events)
-
-        return csv_log
-
+            if self.convergence_time is not None:
+                break
@@ -0,0 +1,320 @@
+import cProfile
+import json
+import pstats
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from entities.knowledge import KnowledgeObserver
+
+if TYPE_CHECKING:
+    from simulation.environment import Environment
+
+
+# Where the time of Environment.run goes.
+#
+# Attach with Environment(..., instrumentation=Instrumentation()) or
+# env.instrumentation = Instrumentation(). Without it run() pays one None
+# check. With it, the phase methods of the environment, its event queue and
+# knowledge store are wrapped by timers for the duration of each run():
+#   queue.peek / queue.pop / queue.push   event queue operations
+#   process_batch                         _process_batch_events (trips, house exchanges)
+#   knowledge_sync                        update_knowledge_in_houses_with_owner
+#   pet_exchanges                         detect_and_generate_exchanges
+#   log_events                            _log_events (formatting and sink writes)
+#   plan_trips                            _plan_new_trips
+# Phases nest (process_batch calls knowledge_sync), so every phase reports
+# its total time and its self time without the nested phases. Knowledge
+# writes are counted by a KnowledgeObserver put in front of the attached one.
+#
+# Several runs accumulate into one Instrumentation. report() is a plain dict
+# (JSON-ready); counts and histograms are deterministic for a seeded run, so
+# reports of two versions can be compared with compare_reports().
+
+REPORT_VERSION = 1
+
+PHASES = {
+    '_process_batch_events': 'process_batch',
+    'update_knowledge_in_houses_with_owner': 'knowledge_sync',
+    'detect_and_generate_exchanges': 'pet_exchanges',
+    '_log_events': 'log_events',
+    '_plan_new_trips': 'plan_trips',
+    'push_event': 'queue.push',
+}
+QUEUE_PHASES = {
+    'peek_time': 'queue.peek',
+    'pop_batch': 'queue.pop',
+}
+
+
+class _KnowledgeCounter(KnowledgeObserver):
+    """Counts knowledge writes into an Instrumentation and passes every change on to `observer`."""
+
+    def __init__(self, instrumentation: 'Instrumentation', observer: Optional[KnowledgeObserver]):
+        self.instrumentation = instrumentation
+        self.observer = observer
+
+    def entry_updated(self, observer_id: int, subject_id: int, old: Optional[Dict[str, Any]],
+                      new: Dict[str, Any]) -> None:
+        if observer_id != subject_id:
+            self.instrumentation.knowledge_updates += 1
+        if self.observer is not None:
+            self.observer.entry_updated(observer_id, subject_id, old, new)
+
+    def entries_refreshed(self, observer_ids, subject_ids, t: int) -> None:
+        # KnowledgeStore.record never refreshes an agent's entry about itself
+        self.instrumentation.knowledge_updates += len(observer_ids)
+        if self.observer is not None:
+            self.observer.entries_refreshed(observer_ids, subject_ids, t)
+
+    def flush(self, time: int, label: str) -> None:
+        if self.observer is not None:
+            self.observer.flush(time, label)
+
+
+class Instrumentation:
+    """
+    Per-phase timers and counters for Environment.run.
+
+    profile=True also runs cProfile over each run(); save_pstats() and
+    save_collapsed() write what it collected.
+    """
+
+    def __init__(self, profile: bool = False):
+        self.profile = profile
+        self.profiler: Optional[cProfile.Profile] = cProfile.Profile() if profile else None
+        self.runs = 0
+        self.wall_time = 0.0
+        self.batches = 0
+        self.phase_calls: Counter = Counter()
+        self.phase_total: Dict[str, float] = {}
+        self.phase_self: Dict[str, float] = {}
+        self.event_counts: Counter = Counter()
+        self.batch_sizes: Counter = Counter()
+        # Number of agents in each crowded house (2 or more) at every knowledge sync
+        self.occupancy: Counter = Counter()
+        # Knowledge entries written about another agent, and pairs learned for the first time
+        self.knowledge_updates = 0
+        self.new_pairs = 0
+        self._stack: List[float] = []
+
+    # -- timers ---------------------------------------------------------
+
+    def _timed(self, name: str, fn: Callable, before: Optional[Callable] = None,
+               after: Optional[Callable] = None) -> Callable:
+        stack = self._stack
+        calls = self.phase_calls
+        total = self.phase_total
+        own = self.phase_self
+        total.setdefault(name, 0.0)
+        own.setdefault(name, 0.0)
+
+        def timed(*args):
+            if before is not None:
+                before(*args)
+            start = perf_counter()
+            stack.append(0.0)
+            try:
+                result = fn(*args)
+            finally:
+                elapsed = perf_counter() - start
+                nested = stack.pop()
+                calls[name] += 1
+                total[name] += elapsed
+                own[name] += elapsed - nested
+                if stack:
+                    stack[-1] += elapsed
+            if after is not None:
+                after(result, *args)
+            return result
+
+        return timed
+
+    # -- hooks ----------------------------------------------------------
+
+    def _count_batch(self, batch: List[Any], time: int) -> None:
+        if batch:
+            self.batches += 1
+            self.batch_sizes[len(batch)] += 1
+
+    def _count_logged(self, _result: int, finish_events, exchange_events, house_exchange_events, start_events,
+                      *_rest) -> None:
+        for events in (finish_events, exchange_events, house_exchange_events, start_events):
+            for event in events:
+                self.event_counts[type(event).__name__] += 1
+
+    def _occupancy_hook(self, env: 'Environment') -> Callable:
+        def count(_time: int) -> None:
+            houses = env.houses
+            for house_id in env.occupancy.crowded:
+                self.occupancy[len(houses[house_id].occupants)] += 1
+        return count
+
+    # -- attaching ------------------------------------------------------
+
+    @contextmanager
+    def capture(self, env: 'Environment') -> Iterator[None]:
+        """Instruments env for the duration of the block (Environment.run uses it)."""
+        if '_process_batch_events' in vars(env):
+            if env.instrumentation is not self:
+                raise RuntimeError("This environment is already being instrumented")
+            # Nested in a capture of the same environment, e.g. run() inside capture(): already counted there
+            yield
+            return
+        patched: List[Tuple[Any, str]] = []
+
+        def patch(obj: Any, attr: str, wrapper: Callable) -> None:
+            setattr(obj, attr, wrapper)
+            patched.append((obj, attr))
+
+        for attr, name in PHASES.items():
+            before = self._occupancy_hook(env) if attr == 'update_knowledge_in_houses_with_owner' else None
+            after = self._count_logged if attr == '_log_events' else None
+            patch(env, attr, self._timed(name, getattr(env, attr), before, after))
+        queue = env.event_queue
+        for attr, name in QUEUE_PHASES.items():
+            after = self._count_batch if attr == 'pop_batch' else None
+            patch(queue, attr, self._timed(name, getattr(queue, attr), after=after))
+
+        store = env.knowledge_store
+        if store is not None:
+            patch(store, 'record', self._timed('knowledge.record', store.record))
+            patch(store, 'set_entry', self._timed('knowledge.set_entry', store.set_entry))
+        # run() inside the block finds this capture in place instead of starting its own
+        attached = env.instrumentation
+        env.instrumentation = self
+        observer = env.knowledge_observer
+        env._route_knowledge(_KnowledgeCounter(self, observer))
+
+        known_pairs = env.known_pairs
+        start = perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+        try:
+            yield
+        finally:
+            if self.profiler is not None:
+                self.profiler.disable()
+            self.wall_time += perf_counter() - start
+            self.runs += 1
+            self.new_pairs += env.known_pairs - known_pairs
+            env._route_knowledge(observer)
+            env.instrumentation = attached
+            # Instance attributes shadowed the class methods; removing them restores the originals
+            for obj, attr in reversed(patched):
+                delattr(obj, attr)
+            self._stack.clear()
+
+    # -- output ---------------------------------------------------------
+
+    def report(self) -> Dict[str, Any]:
+        """Structured summary: timings in seconds, counts and histograms as plain dicts."""
+        phases = {
+            name: {
+                'calls': self.phase_calls[name],
+                'total': self.phase_total[name],
+                'self': self.phase_self[name],
+            }
+            for name in sorted(self.phase_total)
+        }
+        # Loop overhead: the run minus every phase's self time
+        phases['run.other'] = {
+            'calls': self.runs,
+            'total': self.wall_time,
+            'self': self.wall_time - sum(p['self'] for p in phases.values()),
+        }
+        return {
+            'version': REPORT_VERSION,
+            'runs': self.runs,
+            'wall_time': self.wall_time,
+            'batches': self.batches,
+            'phases': phases,
+            'events': dict(sorted(self.event_counts.items())),
+            'batch_size_histogram': {str(k): v for k, v in sorted(self.batch_sizes.items())},
+            'occupancy_histogram': {str(k): v for k, v in sorted(self.occupancy.items())},
+            'knowledge': {'updates': self.knowledge_updates, 'new_pairs': self.new_pairs},
+            'profiled': self.profiler is not None,
+        }
+
+    def save_report(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+
+    def format_report(self) -> str:
+        report = self.report()
+        lines = [f"runs: {report['runs']}  wall: {report['wall_time']:.3f}s  batches: {report['batches']}",
+                 f"{'phase':<20}{'calls':>10}{'total s':>10}{'self s':>10}{'self %':>8}"]
+        wall = report['wall_time'] or 1.0
+        for name, phase in sorted(report['phases'].items(), key=lambda item: -item[1]['self']):
+            lines.append(f"{name:<20}{phase['calls']:>10}{phase['total']:>10.3f}{phase['self']:>10.3f}"
+                         f"{phase['self'] / wall * 100:>7.1f}%")
+        lines.append("events: " + ", ".join(f"{k}={v}" for k, v in report['events'].items()))
+        lines.append(f"knowledge: {report['knowledge']['updates']} updates, {report['knowledge']['new_pairs']} new pairs")
+        return "\n".join(lines)
+
+    def save_pstats(self, path: str) -> None:
+        if self.profiler is None:
+            raise RuntimeError("Instrumentation was created without profile=True")
+        self.profiler.dump_stats(path)
+
+    def save_collapsed(self, path: str, max_depth: int = 64) -> None:
+        """
+        Writes collapsed stacks ("outer;inner;leaf microseconds" per line) for flame graph tools.
+
+        cProfile only records caller -> callee edges, so the self time of a
+        function is split across its callers in proportion to the time each
+        caller spent in it; the stacks are an estimate, not samples.
+        """
+        if self.profiler is None:
+            raise RuntimeError("Instrumentation was created without profile=True")
+        stats = pstats.Stats(self.profiler).stats
+
+        def label(func: Tuple[str, int, str]) -> str:
+            filename, line, name = func
+            return f"{name} ({filename}:{line})" if line else name
+
+        collapsed: Counter = Counter()
+
+        def expand(func, stack: Tuple[str, ...], weight: float) -> None:
+            callers = stats[func][4]
+            if not callers or len(stack) >= max_depth:
+                collapsed[';'.join(reversed(stack))] += weight
+                return
+            cumulative = sum(edge[3] for edge in callers.values()) or 1.0
+            for caller, edge in callers.items():
+                if caller not in stats or label(caller) in stack:
+                    collapsed[';'.join(reversed(stack))] += weight * edge[3] / cumulative
+                    continue
+                expand(caller, stack + (label(caller),), weight * edge[3] / cumulative)
+
+        for func, (_, _, tottime, _, _) in stats.items():
+            if tottime > 0:
+                expand(func, (label(func),), tottime)
+
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, seconds in sorted(collapsed.items()):
+                micros = int(round(seconds * 1e6))
+                if micros:
+                    f.write(f"{stack} {micros}\n")
+
+
+def compare_reports(old: Dict[str, Any], new: Dict[str, Any]) -> str:
+    """Side-by-side phase self times and any changed counts of two reports."""
+    lines = [f"{'phase':<20}{'old s':>10}{'new s':>10}{'ratio':>8}"]
+    for name in sorted(set(old['phases']) | set(new['phases'])):
+        a = old['phases'].get(name, {}).get('self', 0.0)
+        b = new['phases'].get(name, {}).get('self', 0.0)
+        ratio = f"{b / a:>8.2f}" if a else f"{'-':>8}"
+        lines.append(f"{name:<20}{a:>10.3f}{b:>10.3f}{ratio}")
+    a, b = old['wall_time'], new['wall_time']
+    lines.append(f"{'wall':<20}{a:>10.3f}{b:>10.3f}{(b / a if a else 0):>8.2f}")
+    for key in ('batches', 'events', 'batch_size_histogram', 'occupancy_histogram', 'knowledge'):
+        if old.get(key) != new.get(key):
+            lines.append(f"{key} differs: {old.get(key)} -> {new.get(key)}")
+    return "\n".join(lines)
+
+
+def load_report(path: str) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
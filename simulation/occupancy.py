@@ -0,0 +1,47 @@
+from typing import TYPE_CHECKING, Dict, List, Set
+
+if TYPE_CHECKING:
+    from entities.house import House
+
+
+class OccupancyIndex:
+    """
+    Tracks house occupancy changes so per-batch work skips idle houses.
+
+    dirty   -- houses entered or left since the last knowledge sync
+    crowded -- houses currently holding at least two agents; only these can
+               host knowledge or pet exchanges
+    """
+
+    def __init__(self, houses: Dict[int, 'House']):
+        # Houses are visited in the same order as the houses dict
+        self._order = {house_id: i for i, house_id in enumerate(houses)}
+        self.dirty: Set[int] = set()
+        self.crowded: Set[int] = {house_id for house_id, house in houses.items() if len(house.occupants) >= 2}
+        self._synced_at: Dict[int, int] = {}
+        for house in houses.values():
+            house.occupancy = self
+
+    def entered(self, house: 'House') -> None:
+        self.dirty.add(house.id)
+        if len(house.occupants) >= 2:
+            self.crowded.add(house.id)
+
+    def left(self, house: 'House') -> None:
+        self.dirty.add(house.id)
+        if len(house.occupants) < 2:
+            self.crowded.discard(house.id)
+
+    def crowded_houses(self) -> List[int]:
+        return sorted(self.crowded, key=self._order.__getitem__)
+
+    def needs_sync(self, house_id: int, time: int) -> bool:
+        # Nobody entered or left since this house was synced at the same time,
+        # so a knowledge update would rewrite identical entries
+        return house_id in self.dirty or self._synced_at.get(house_id) != time
+
+    def mark_synced(self, house_id: int, time: int) -> None:
+        self._synced_at[house_id] = time
+
+    def clear_dirty(self) -> None:
+        self.dirty.clear()
@@ -0,0 +1,96 @@
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+DEFAULT_BLOCK_SIZE = 4096
+
+
+class BlockStream:
+    """
+    One independent random stream served from pre-generated NumPy blocks.
+
+    Values are handed out one by one (next) or in slices (take); the sequence
+    depends only on the seed, not on how it is consumed.
+    """
+
+    def __init__(self, generator: np.random.Generator, draw: Callable[[np.random.Generator, int], np.ndarray],
+                 block_size: int = DEFAULT_BLOCK_SIZE):
+        self.generator = generator
+        self._draw = draw
+        self.block_size = block_size
+        self._block: List = []
+        self._pos = 0
+
+    def _refill(self) -> None:
+        # tolist() so that the hot path indexes plain Python numbers, not NumPy scalars
+        self._block = self._draw(self.generator, self.block_size).tolist()
+        self._pos = 0
+
+    def next(self):
+        if self._pos >= len(self._block):
+            self._refill()
+        value = self._block[self._pos]
+        self._pos += 1
+        return value
+
+    def take(self, k: int) -> List:
+        pos = self._pos
+        end = pos + k
+        if end <= len(self._block):
+            self._pos = end
+            return self._block[pos:end]
+        values = self._block[pos:]
+        while len(values) < k:
+            self._refill()
+            need = min(k - len(values), len(self._block))
+            values.extend(self._block[:need])
+            self._pos = need
+        return values
+
+    def peek(self, k: int) -> List:
+        """The next k values, without consuming them."""
+        if self._pos + k > len(self._block):
+            # Draw the following blocks early; the sequence stays the same
+            block = self._block[self._pos:]
+            while len(block) < k:
+                block.extend(self._draw(self.generator, self.block_size).tolist())
+            self._block = block
+            self._pos = 0
+        return self._block[self._pos:self._pos + k]
+
+    def skip(self, k: int) -> None:
+        """Consumes k values without returning them."""
+        self.peek(k)
+        self._pos += k
+
+
+def _uniform(generator: np.random.Generator, n: int) -> np.ndarray:
+    return generator.random(n)
+
+
+def _percent(generator: np.random.Generator, n: int) -> np.ndarray:
+    # Same range as random.randint(1, 100)
+    return generator.integers(1, 101, size=n)
+
+
+class SimulationRNG:
+    """
+    Randomness owned by one Environment.
+
+    Every purpose gets its own stream spawned from a single SeedSequence, so a
+    run is reproducible from `seed` alone and independent of other runs in the
+    same process:
+      trip            -- uniform [0, 1) draws for trip target selection
+      house_exchange  -- 1..100 draws for house exchange readiness
+      pet_exchange    -- 1..100 draws for pet exchange readiness
+    """
+
+    def __init__(self, seed: Optional[int] = None, block_size: int = DEFAULT_BLOCK_SIZE):
+        self.seed_sequence = np.random.SeedSequence(seed)
+        # With seed=None the entropy is drawn by NumPy; keep it so the run can be repeated
+        self.seed = self.seed_sequence.entropy
+        trip_seq, house_seq, pet_seq = self.seed_sequence.spawn(3)
+        self.trip = BlockStream(np.random.default_rng(trip_seq), _uniform, block_size)
+        self.house_exchange = BlockStream(np.random.default_rng(house_seq), _percent, block_size)
+        self.pet_exchange = BlockStream(np.random.default_rng(pet_seq), _percent, block_size)
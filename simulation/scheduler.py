@@ -0,0 +1,110 @@
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+from events.base import Event
+
+
+class HeapScheduler:
+    """Binary heap of Event.heap_key entries; O(log n) per push and pop."""
+
+    def __init__(self):
+        self._heap: List[Tuple[int, int, int, int, Event]] = []
+        self._seq = 0
+
+    def push(self, event: Event) -> None:
+        self._seq += 1
+        heapq.heappush(self._heap, event.heap_key(self._seq))
+
+    def peek_time(self) -> Optional[int]:
+        return self._heap[0][0] if self._heap else None
+
+    def pop_batch(self, time: int) -> List[Event]:
+        heap = self._heap
+        heappop = heapq.heappop
+        batch = []
+        while heap and heap[0][0] == time:
+            batch.append(heappop(heap)[-1])
+        return batch
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+class CalendarScheduler:
+    """
+    Ring buffer of per-tick buckets for integer time; O(1) per push.
+
+    The ring covers `horizon` ticks ahead of the current one, which for the
+    simulation is the largest travel time, so every trip lands in the ring.
+    Anything scheduled further ahead waits in an overflow heap and is moved
+    into its bucket as soon as the ring reaches it.
+
+    A bucket keeps one list per (priority, rank) class. Events are appended in
+    scheduling order, so a popped batch has the same order as HeapScheduler.
+    """
+
+    def __init__(self, horizon: int, start_time: int = 0):
+        self._size = max(horizon, 0) + 1
+        self._buckets: List[Optional[Dict[Tuple[int, int], List[Event]]]] = [None] * self._size
+        self._overflow: List[Tuple[int, int, int, int, Event]] = []
+        self._now = start_time
+        self._count = 0
+        self._seq = 0
+
+    def _add(self, key: Tuple[int, int, int, int, Event]) -> None:
+        index = key[0] % self._size
+        bucket = self._buckets[index]
+        if bucket is None:
+            bucket = self._buckets[index] = {}
+        events = bucket.get(key[1:3])
+        if events is None:
+            bucket[key[1:3]] = [key[4]]
+        else:
+            events.append(key[4])
+
+    def push(self, event: Event) -> None:
+        time = event.time
+        if time < self._now:
+            raise ValueError(f"Cannot schedule event at {time} before current time {self._now}")
+        self._seq += 1
+        self._count += 1
+        key = event.heap_key(self._seq)
+        if time - self._now < self._size:
+            self._add(key)
+        else:
+            heapq.heappush(self._overflow, key)
+
+    def _advance(self) -> None:
+        self._now += 1
+        overflow = self._overflow
+        limit = self._now + self._size
+        while overflow and overflow[0][0] < limit:
+            self._add(heapq.heappop(overflow))
+
+    def peek_time(self) -> Optional[int]:
+        if not self._count:
+            return None
+        while not self._buckets[self._now % self._size]:
+            if self._count == len(self._overflow):
+                # Ring is empty: jump straight to the earliest overflow event
+                self._now = self._overflow[0][0] - 1
+            self._advance()
+        return self._now
+
+    def pop_batch(self, time: int) -> List[Event]:
+        if self.peek_time() != time:
+            return []
+        index = time % self._size
+        bucket = self._buckets[index]
+        self._buckets[index] = None
+        if len(bucket) == 1:
+            batch = next(iter(bucket.values()))
+        else:
+            batch = []
+            for event_class in sorted(bucket):
+                batch.extend(bucket[event_class])
+        self._count -= len(batch)
+        return batch
+
+    def __len__(self) -> int:
+        return self._count
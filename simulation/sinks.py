@@ -0,0 +1,153 @@
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, List, Sequence
+
+from loaders.csv_utils import log_formatter
+from loaders.event_log import EventLogWriter
+
+
+def _format_many(first_number: int, time: int, event_type: str, extras: Sequence[Sequence[Any]]) -> List[str]:
+    # Same lines as log_formatter, with the shared part formatted once; trips
+    # (two or three values, nearly the whole log) are formatted without a join
+    middle = f";{time};{event_type};"
+    return [f"{number}{middle}{extra[0]};{extra[1]};{extra[2]}" if len(extra) == 3 else
+            f"{number}{middle}{extra[0]};{extra[1]}" if len(extra) == 2 else
+            f"{number}{middle}{';'.join(map(str, extra))}"
+            for number, extra in enumerate(extras, first_number)]
+
+
+class EventSink(ABC):
+    """Destination for the event log; Environment.run emits every event as it is logged."""
+
+    @abstractmethod
+    def emit(self, event_number: int, time: int, event_type: str, extra: Sequence[Any]) -> None:
+        ...
+
+    def emit_many(self, first_number: int, time: int, event_type: str, extras: Sequence[Sequence[Any]]) -> None:
+        """Emits len(extras) events of one type and time, numbered from first_number."""
+        for event_number, extra in enumerate(extras, first_number):
+            self.emit(event_number, time, event_type, extra)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> 'EventSink':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class MemorySink(EventSink):
+    """Keeps formatted lines in a list (what run() used to return)."""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def emit(self, event_number: int, time: int, event_type: str, extra: Sequence[Any]) -> None:
+        self.lines.append(log_formatter(event_number, time, event_type, *extra))
+
+    def emit_many(self, first_number: int, time: int, event_type: str, extras: Sequence[Sequence[Any]]) -> None:
+        self.lines.extend(_format_many(first_number, time, event_type, extras))
+
+
+class FileSink(EventSink):
+    """Writes observer.csv lines to a file, buffering flush_size lines between writes."""
+
+    def __init__(self, path: str, flush_size: int = 8192, mode: str = "w"):
+        self.path = path
+        self.flush_size = flush_size
+        self._file = open(path, mode, encoding="utf-8")
+        self._buffer: List[str] = []
+
+    def emit(self, event_number: int, time: int, event_type: str, extra: Sequence[Any]) -> None:
+        self._buffer.append(log_formatter(event_number, time, event_type, *extra))
+        if len(self._buffer) >= self.flush_size:
+            self.flush()
+
+    def emit_many(self, first_number: int, time: int, event_type: str, extras: Sequence[Sequence[Any]]) -> None:
+        self._buffer.extend(_format_many(first_number, time, event_type, extras))
+        if len(self._buffer) >= self.flush_size:
+            self.flush()
+
+    def write_line(self, line: str) -> None:
+        self._buffer.append(line)
+        if len(self._buffer) >= self.flush_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            self._buffer.append("")
+            self._file.write("\n".join(self._buffer))
+            self._buffer.clear()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+class BinaryFileSink(EventSink):
+    """Writes the binary columnar log (loaders.event_log) into the directory at path."""
+
+    def __init__(self, path: str, flush_size: int = 65536):
+        self.path = path
+        self._writer = EventLogWriter(path, flush_size)
+
+    def emit(self, event_number: int, time: int, event_type: str, extra: Sequence[Any]) -> None:
+        self._writer.append(event_number, time, event_type, extra)
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class MultiSink(EventSink):
+    """Forwards every event to several sinks, e.g. observer.csv and its binary twin."""
+
+    def __init__(self, *sinks: EventSink):
+        self.sinks = sinks
+
+    def emit(self, event_number: int, time: int, event_type: str, extra: Sequence[Any]) -> None:
+        for sink in self.sinks:
+            sink.emit(event_number, time, event_type, extra)
+
+    def emit_many(self, first_number: int, time: int, event_type: str, extras: Sequence[Sequence[Any]]) -> None:
+        for sink in self.sinks:
+            sink.emit_many(first_number, time, event_type, extras)
+
+    def close(self) -> None:
+        for sink in self.sinks:
+            sink.close()
+
+
+class NullSink(EventSink):
+    """Discards everything; for benchmarks that only need the simulation itself."""
+
+    def emit(self, event_number: int, time: int, event_type: str, extra: Sequence[Any]) -> None:
+        pass
+
+    def emit_many(self, first_number: int, time: int, event_type: str, extras: Sequence[Sequence[Any]]) -> None:
+        pass
+
+
+class CountingSink(NullSink):
+    """Discards lines but keeps per-type counts and visit success counts."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.trips_with_result = 0
+        self.successful_trips = 0
+
+    def emit(self, event_number: int, time: int, event_type: str, extra: Sequence[Any]) -> None:
+        self.counts[event_type] += 1
+        # Only visits carry a success flag, returns home do not
+        if event_type == "FinishTrip" and len(extra) == 3:
+            self.trips_with_result += 1
+            self.successful_trips += extra[0]
+
+    def emit_many(self, first_number: int, time: int, event_type: str, extras: Sequence[Sequence[Any]]) -> None:
+        self.counts[event_type] += len(extras)
+        if event_type == "FinishTrip":
+            visits = [extra[0] for extra in extras if len(extra) == 3]
+            self.trips_with_result += len(visits)
+            self.successful_trips += sum(visits)
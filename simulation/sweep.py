@@ -0,0 +1,191 @@
+import copy
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from analysis.geography import GeographyAnalysis
+from loaders.csv_utils import count_houses, load_strategies, load_initial_data, load_travel_graph
+from simulation.convergence import StopSpec
+from simulation.ensemble import ENSEMBLE_METRICS, RunningStats, summarize_run
+from simulation.environment import Environment
+from simulation.sinks import CountingSink
+from simulation.workers import install_inputs, worker_inputs
+
+
+SWEEP_PARAMETERS = ('geography', 'strategies', 'house_exchange_prob', 'pet_exchange_prob', 'max_time', 'seed')
+# convergence_time is None for runs without a stop criterion or that never met it
+SWEEP_METRICS = ENSEMBLE_METRICS + ('events', 'convergence_time')
+
+
+def _label(path: str) -> str:
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _run_point(point: Dict[str, Any]) -> Dict[str, Any]:
+    # Agents and houses per strategies file, travel graph per geography file, stop criteria
+    scenarios, geographies, stop = worker_inputs()
+    # Environment mutates agents and houses, so every run gets a fresh copy
+    agents, houses = copy.deepcopy(scenarios[point['strategies']])
+    for agent in agents.values():
+        if point['house_exchange_prob'] is not None:
+            agent.house_exchange_prob = point['house_exchange_prob']
+        if point['pet_exchange_prob'] is not None:
+            agent.pet_exchange_prob = point['pet_exchange_prob']
+
+    env = Environment(agents, houses, geographies[point['geography']], point['max_time'], seed=point['seed'])
+    stats = CountingSink()
+    env.run(point['max_time'], sink=stats, stop=stop)
+
+    row = dict(point)
+    row['geography'] = _label(point['geography'])
+    row['strategies'] = _label(point['strategies'])
+    row.update(summarize_run(env, stats))
+    row['events'] = sum(stats.counts.values())
+    row['convergence_time'] = env.convergence_time
+    return row
+
+
+class SweepResult:
+    """
+    One row per run: the sweep parameters followed by the run's metrics.
+
+    With a feasibility check the rows also have a 'feasible' column; runs
+    skipped as infeasible have None for every metric.
+    """
+
+    def __init__(self, rows: List[Dict[str, Any]], feasibility: bool = False):
+        self.rows = rows
+        self.feasibility = feasibility
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        if self.feasibility:
+            return SWEEP_PARAMETERS + ('feasible',) + SWEEP_METRICS
+        return SWEEP_PARAMETERS + SWEEP_METRICS
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def aggregate(self, by: Sequence[str] = ('geography', 'strategies', 'house_exchange_prob',
+                                             'pet_exchange_prob', 'max_time')) -> Dict[Tuple[Any, ...], Dict[str, RunningStats]]:
+        """Metrics of the runs grouped by the given parameters (by default: averaged over seeds)."""
+        groups: Dict[Tuple[Any, ...], Dict[str, RunningStats]] = {}
+        for row in self.rows:
+            key = tuple(row[name] for name in by)
+            metrics = groups.get(key)
+            if metrics is None:
+                metrics = groups[key] = {name: RunningStats() for name in SWEEP_METRICS}
+            for name in SWEEP_METRICS:
+                if row[name] is not None:
+                    metrics[name].add(row[name])
+        return groups
+
+    def to_csv(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(self.columns)
+            for row in self.rows:
+                writer.writerow(['' if row[name] is None else row[name] for name in self.columns])
+
+    def __repr__(self) -> str:
+        return f"SweepResult(runs={len(self.rows)})"
+
+
+class ParameterSweep:
+    """
+    Runs every combination of a parameter grid across a process pool.
+
+    Every geography and strategies file is loaded once in the parent and
+    shipped to the workers when the pool starts; a run only copies its agents
+    and houses. house_exchange_probs/pet_exchange_probs override the
+    probabilities from the strategies file for all agents (None keeps them).
+
+    feasibility checks every geography/strategies/max_time combination with
+    GeographyAnalysis before anything runs: "flag" adds a 'feasible' column
+    (full knowledge reachable), "skip" also leaves infeasible points unrun.
+    The check takes ownership as loaded, so with house exchanges it is a
+    prediction rather than a guarantee.
+
+    stop ends every run early once it converges (see simulation.convergence);
+    criteria are sent to the workers, so they have to be picklable.
+    """
+
+    def __init__(self, agents_path: str, geographies: Sequence[str], strategies: Sequence[str],
+                 max_times: Sequence[int] = (2000,), seeds: Iterable[int] = range(10),
+                 house_exchange_probs: Sequence[Optional[int]] = (None,),
+                 pet_exchange_probs: Sequence[Optional[int]] = (None,),
+                 workers: Optional[int] = None, feasibility: Optional[str] = None,
+                 stop: Optional[StopSpec] = None):
+        if feasibility not in (None, "flag", "skip"):
+            raise ValueError(f"Unknown feasibility mode: {feasibility}")
+        self.agents_path = agents_path
+        self.geographies = list(geographies)
+        self.strategies = list(strategies)
+        self.max_times = list(max_times)
+        self.seeds = list(seeds)
+        self.house_exchange_probs = list(house_exchange_probs)
+        self.pet_exchange_probs = list(pet_exchange_probs)
+        self.workers = workers or os.cpu_count() or 1
+        self.feasibility = feasibility
+        self.stop = stop
+
+    def points(self) -> List[Dict[str, Any]]:
+        grid = itertools.product(self.geographies, self.strategies, self.house_exchange_probs,
+                                 self.pet_exchange_probs, self.max_times, self.seeds)
+        return [dict(zip(SWEEP_PARAMETERS, values)) for values in grid]
+
+    def _load_inputs(self):
+        scenarios = {}
+        num_houses = count_houses(self.agents_path)
+        for path in self.strategies:
+            scenarios[path] = load_initial_data(self.agents_path, strategies=load_strategies(path, num_houses))
+        geographies = {path: load_travel_graph(path) for path in self.geographies}
+        return scenarios, geographies
+
+    def check_feasibility(self, inputs=None) -> Dict[Tuple[str, str, int], bool]:
+        """Whether full knowledge is reachable, per (geography, strategies, max_time), without running anything."""
+        scenarios, geographies = inputs or self._load_inputs()
+        feasible = {}
+        for geography, strategies, max_time in itertools.product(self.geographies, self.strategies, self.max_times):
+            agents, houses = scenarios[strategies]
+            analysis = GeographyAnalysis(geographies[geography], agents, houses, max_time)
+            feasible[geography, strategies, max_time] = analysis.full_knowledge_feasible()
+        return feasible
+
+    def run(self) -> SweepResult:
+        points = self.points()
+        inputs = self._load_inputs()
+
+        to_run = points
+        if self.feasibility is not None:
+            feasible = self.check_feasibility(inputs)
+            for point in points:
+                point['feasible'] = feasible[point['geography'], point['strategies'], point['max_time']]
+            if self.feasibility == "skip":
+                to_run = [point for point in points if point['feasible']]
+
+        if self.workers == 1:
+            install_inputs(*inputs, self.stop)
+            results = [_run_point(point) for point in to_run]
+        else:
+            # A few chunks per worker balances long and short runs without per-run overhead
+            chunksize = max(1, len(to_run) // (self.workers * 4))
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=install_inputs,
+                                     initargs=inputs + (self.stop,)) as pool:
+                results = list(pool.map(_run_point, to_run, chunksize=chunksize))
+        if to_run is points:
+            return SweepResult(results, feasibility=self.feasibility is not None)
+
+        # Skipped points keep their place in the grid, with empty metrics
+        results = iter(results)
+        rows = []
+        for point in points:
+            if point['feasible']:
+                rows.append(next(results))
+            else:
+                row = dict(point, geography=_label(point['geography']), strategies=_label(point['strategies']))
+                row.update({name: None for name in SWEEP_METRICS})
+                rows.append(row)
+        return SweepResult(rows, feasibility=True)
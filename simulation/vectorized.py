@@ -0,0 +1,656 @@
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from entities.store import StringTable
+from loaders.csv_utils import build_color_to_prob_index
+from loaders.knowledge_snapshot import KnowledgeSnapshot, KnowledgeSnapshotBuilder, KnowledgeSnapshotWriter
+from loaders.travel_graph import DenseTravelMatrix, TravelGraph, as_travel_graph
+from simulation.rng import SimulationRNG
+from simulation.sinks import EventSink, MemorySink
+
+# No pending arrival; larger than any tick so that min() skips it
+NO_ARRIVAL = np.iinfo(np.int64).max
+# Most knowledge pairs or attempt occupants built at once; a crowded hub would otherwise need gigabytes
+CHUNK_SIZE = 1 << 22
+
+
+def _segment_offsets(lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Start of every segment in the flat array, and the offset of every element inside its segment."""
+    starts = np.cumsum(lengths) - lengths
+    offsets = np.arange(int(lengths.sum()), dtype=np.int64) - np.repeat(starts, lengths)
+    return starts, offsets
+
+
+def _cross_pairs(starts: np.ndarray, sizes: np.ndarray, subject_starts: np.ndarray,
+                 subject_sizes: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Every (observer, subject) of the same group, observer-major like the nested loops.
+
+    Groups are slices of a flat observer and a flat subject array; the pairs
+    come as indices into those arrays, in chunks of about CHUNK_SIZE.
+    """
+    # One row per observer: its index and the slice of subjects it pairs with
+    rows = np.repeat(starts, sizes) + _segment_offsets(sizes)[1]
+    widths = np.repeat(subject_sizes, sizes)
+    firsts = np.repeat(subject_starts, sizes)
+    ends = np.cumsum(widths)
+    lo = 0
+    while lo < len(rows):
+        hi = max(int(np.searchsorted(ends, ends[lo] - widths[lo] + CHUNK_SIZE, 'right')), lo + 1)
+        width = widths[lo:hi]
+        _, offsets = _segment_offsets(width)
+        yield np.repeat(rows[lo:hi], width), np.repeat(firsts[lo:hi], width) + offsets
+        lo = hi
+
+
+class KnowledgeTable:
+    """
+    Knowledge of all agents as one table of (observer, subject) rows.
+
+    Rows are sorted by observer * stride + subject and hold pet code, house,
+    location and t, plus the position at which the pair was first learned,
+    which gives every observer's subjects in the order of agent.knowledge.
+    Unlike KnowledgeStore only the known pairs take memory, so the table
+    grows with the number of meetings rather than with N^2.
+    """
+
+    def __init__(self, stride: int):
+        self.stride = stride
+        self.keys = np.empty(0, dtype=np.int64)
+        self.pet = np.empty(0, dtype=np.int32)
+        self.house = np.empty(0, dtype=np.int32)
+        self.location = np.empty(0, dtype=np.int32)
+        self.t = np.empty(0, dtype=np.int32)
+        self.first = np.empty(0, dtype=np.int64)
+        self.known_pairs = 0
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def update(self, observers: np.ndarray, subjects: np.ndarray, pet: np.ndarray, house: np.ndarray,
+               location: np.ndarray, t: Union[int, np.ndarray]) -> int:
+        """Writes the entries in the given order; returns the number of new pairs with observer != subject."""
+        if not len(observers):
+            return 0
+        keys = observers.astype(np.int64) * self.stride + subjects
+        t = np.broadcast_to(np.asarray(t, dtype=np.int32), keys.shape)
+
+        # Group repeated pairs: the last write holds the value, the first fixes the order
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        boundary = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1])
+        unique = sorted_keys[np.r_[0, boundary + 1]]
+        first = order[np.r_[0, boundary + 1]]
+        last = order[np.r_[boundary, len(keys) - 1]]
+
+        pos = np.searchsorted(self.keys, unique)
+        found = pos < len(self.keys)
+        found[found] = self.keys[pos[found]] == unique[found]
+
+        rows, source = pos[found], last[found]
+        self.pet[rows] = pet[source]
+        self.house[rows] = house[source]
+        self.location[rows] = location[source]
+        self.t[rows] = t[source]
+
+        new = ~found
+        if not new.any():
+            return 0
+        source = last[new]
+        # Earlier first writes get smaller positions
+        rank = np.empty(int(new.sum()), dtype=np.int64)
+        rank[np.argsort(first[new], kind='stable')] = np.arange(len(rank))
+        at = pos[new]
+        self.first = np.insert(self.first, at, len(self.keys) + rank)
+        self.keys = np.insert(self.keys, at, unique[new])
+        self.pet = np.insert(self.pet, at, pet[source])
+        self.house = np.insert(self.house, at, house[source])
+        self.location = np.insert(self.location, at, location[source])
+        self.t = np.insert(self.t, at, t[source])
+
+        new_keys = unique[new]
+        added = int(np.count_nonzero(new_keys // self.stride != new_keys % self.stride))
+        self.known_pairs += added
+        return added
+
+    def rows(self, observer_rank: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """observer, subject, pet, house, location, t grouped by observer (in observer_rank order), each in learning order."""
+        observers = self.keys // self.stride
+        order = np.lexsort((self.first, observer_rank[observers]))
+        return (observers[order], self.keys[order] % self.stride, self.pet[order], self.house[order],
+                self.location[order], self.t[order])
+
+
+class VectorizedEnvironment:
+    """
+    Tick-stepped counterpart of Environment on NumPy arrays.
+
+    Every agent and house attribute is an array indexed by id, and a tick is
+    processed as a whole instead of event by event: all arrivals of the tick
+    at once (owner-present checks and house exchange readiness grouped by
+    house), then knowledge sync and pet exchanges for all crowded houses,
+    then the trips of everyone who arrived (target choice for all of them
+    with one batch of draws), then their departures.
+
+    The order inside a tick is the one of Environment.run, FinishTrip →
+    knowledge → exchanges → StartTrip, and the random streams are consumed
+    in the same order, so for the same inputs and seed the event log and
+    the final knowledge are identical to Environment's. House exchanges are
+    the only step that depends on the previous one within a tick; they are
+    found with vectorized draws and applied one by one.
+
+    Not supported: stop criteria, knowledge observers, instrumentation and
+    agents that already use a KnowledgeStore. Knowledge lives in a
+    KnowledgeTable; update_entities() copies the final state back into the
+    Agent and House objects, write_knowledge_snapshot() saves it directly.
+    """
+
+    def __init__(self, agents: Dict[int, 'Agent'], houses: Dict[int, 'House'],
+                 travel_matrix: Union[TravelGraph, DenseTravelMatrix], max_time: int, seed: Optional[int] = None):
+        for agent in agents.values():
+            if agent.knowledge_store is not None:
+                raise ValueError("Agents already use a KnowledgeStore; load them anew for VectorizedEnvironment")
+        self.agents = agents
+        self.houses = houses
+        self.travel_matrix = travel_matrix
+        self.travel_graph = as_travel_graph(travel_matrix)
+        self.max_time = max_time
+        self.time = 0
+        self.rng = SimulationRNG(seed)
+        self.event_counter = 1
+        self.stop_reason: Optional[str] = None
+
+        self.agent_ids = np.fromiter(agents, dtype=np.int64, count=len(agents))
+        house_ids = np.fromiter(houses, dtype=np.int64, count=len(houses))
+        size = int(self.agent_ids.max()) + 1 if len(agents) else 1
+        house_size = max(int(house_ids.max()) if len(houses) else 0, self.travel_graph.num_houses) + 1
+        self._size = size
+        self._house_size = house_size
+
+        self._nationality = np.full(size, None, dtype=object)
+        self.pets = StringTable()
+        self.pet = np.zeros(size, dtype=np.int64)
+        self.home = np.zeros(size, dtype=np.int64)
+        self.location = np.zeros(size, dtype=np.int64)
+        self.travelling = np.zeros(size, dtype=bool)
+        # In the occupants of its location; False while travelling or after a trip that could not start
+        self.present = np.zeros(size, dtype=bool)
+        self.house_exchange_prob = np.zeros(size, dtype=np.int64)
+        self.pet_exchange_prob = np.zeros(size, dtype=np.int64)
+        for agent_id, agent in agents.items():
+            self._nationality[agent_id] = agent.nationality
+            self.pet[agent_id] = self.pets.code(agent.pet)
+            self.home[agent_id] = agent.house_id
+            self.location[agent_id] = agent.location
+            self.travelling[agent_id] = agent.is_travelling
+            self.house_exchange_prob[agent_id] = agent.house_exchange_prob
+            self.pet_exchange_prob[agent_id] = agent.pet_exchange_prob
+
+        self.owner = np.full(house_size, -1, dtype=np.int64)
+        # Position in the houses dict, the order in which Environment visits crowded houses
+        self._house_rank = np.full(house_size, len(houses), dtype=np.int64)
+        self._house_rank[house_ids] = np.arange(len(houses))
+        color_to_prob_index = build_color_to_prob_index(houses)
+        self._prob_index = np.zeros(house_size, dtype=np.int64)
+        for house_id, house in houses.items():
+            self.owner[house_id] = house.owner_id
+            self._prob_index[house_id] = color_to_prob_index.get(house.color, 0)
+            # Environment lets every owner enter its house
+            for agent_id in list(house.occupants) + [house.owner_id]:
+                self.present[agent_id] = True
+        self.count = np.bincount(self.location[self.present], minlength=house_size)
+
+        indptr, indices, times = self.travel_graph.arrays()
+        self._indptr = np.zeros(house_size + 1, dtype=np.int64)
+        self._indptr[:len(indptr)] = indptr
+        self._indptr[len(indptr):] = indptr[-1] if len(indptr) else 0
+        self._indices = indices.copy()
+        self._times = times.copy()
+        if len(times) and times.min() < 1:
+            raise ValueError("VectorizedEnvironment needs travel times of at least 1")
+        # Route (source, target) as one sorted key, for vectorized travel time lookups
+        rows = np.repeat(np.arange(house_size, dtype=np.int64), np.diff(self._indptr))
+        self._route_keys = rows * house_size + self._indices
+
+        # route_probs of all agents as sorted (agent, prob index) keys
+        route_items = [(agent_id, index, weight) for agent_id, agent in agents.items()
+                       for index, weight in agent.route_probs.items()]
+        self._weight_stride = max([index for _, index, _ in route_items] + [int(self._prob_index.max(initial=0))]) + 1
+        route_items.sort(key=lambda item: item[0] * self._weight_stride + item[1])
+        self._weight_keys = np.array([a * self._weight_stride + i for a, i, _ in route_items], dtype=np.int64)
+        self._weights = np.array([w for _, _, w in route_items], dtype=np.int64)
+
+        # The FinishTrip of every travelling agent: arrival tick, target, whether it was a trip home when
+        # it started, and its place in the scheduling order (start tick * size + position in that batch)
+        self._arrival = np.full(size, NO_ARRIVAL, dtype=np.int64)
+        self._target = np.zeros(size, dtype=np.int64)
+        self._returning = np.zeros(size, dtype=bool)
+        self._order = np.zeros(size, dtype=np.int64)
+        self._position = np.full(size, -1, dtype=np.int64)
+
+        self._agent_rank = np.zeros(size, dtype=np.int64)
+        self._agent_rank[self.agent_ids] = np.arange(len(agents))
+        self.knowledge = KnowledgeTable(size)
+        self._load_knowledge()
+
+        # Initial trips, as in Environment.__init__: StartTrip at 0 for every agent with a target
+        chosen, targets, travel_times = self._choose_targets(self.agent_ids)
+        self._starts: Optional[Tuple[np.ndarray, ...]] = (self.agent_ids[chosen], targets[chosen], travel_times[chosen])
+
+    @property
+    def known_pairs(self) -> int:
+        return self.knowledge.known_pairs
+
+    def _load_knowledge(self) -> None:
+        columns = ([], [], [], [], [], [])
+        for agent_id, agent in self.agents.items():
+            for subject, info in agent.knowledge.items():
+                for column, value in zip(columns, (agent_id, subject, self.pets.code(info['pet']), info['house'],
+                                                   info['location'], info['t'])):
+                    column.append(value)
+        observers, subjects, pet, house, location, t = (np.array(column, dtype=np.int64) for column in columns)
+        self.knowledge.update(observers, subjects, pet, house, location, t)
+
+    def _route_time(self, sources: np.ndarray, targets: np.ndarray) -> np.ndarray:
+        """travel_graph.time for every pair, -1 where there is no route."""
+        keys = sources * self._house_size + targets
+        pos = np.minimum(np.searchsorted(self._route_keys, keys), max(len(self._route_keys) - 1, 0))
+        if not len(self._route_keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        return np.where(self._route_keys[pos] == keys, self._times[pos], -1)
+
+    def _route_weight(self, agents: np.ndarray, prob_index: np.ndarray) -> np.ndarray:
+        keys = agents * self._weight_stride + prob_index
+        if not len(self._weight_keys):
+            return np.zeros(len(keys), dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._weight_keys, keys), len(self._weight_keys) - 1)
+        return np.where(self._weight_keys[pos] == keys, self._weights[pos], 0)
+
+    def _choose_targets(self, agents: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Agent.choose_trip_target for every agent, in order, from its location.
+
+        Returns a mask of the agents that have a target, the targets and the
+        travel times to them; each of these agents takes one trip draw, the
+        others none.
+        """
+        targets = np.full(len(agents), -1, dtype=np.int64)
+        travel_times = np.full(len(agents), -1, dtype=np.int64)
+        location = self.location[agents]
+        first = self._indptr[location]
+        degree = self._indptr[location + 1] - first
+        chosen = degree > 0
+        if not chosen.any():
+            return chosen, targets, travel_times
+        choosers, first, degree = agents[chosen], first[chosen], degree[chosen]
+        draws = np.array(self.rng.trip.take(len(choosers)), dtype=np.float64)
+
+        starts, offsets = _segment_offsets(degree)
+        routes = np.repeat(first, degree) + offsets
+        weights = self._route_weight(np.repeat(choosers, degree), self._prob_index[self._indices[routes]])
+        cumulative = np.cumsum(weights)
+        before = cumulative[starts] - weights[starts]
+        cumulative -= np.repeat(before, degree)
+        total = cumulative[starts + degree - 1]
+        # bisect_left: the number of cumulative weights below the draw
+        below = cumulative < np.repeat(draws * total, degree)
+        index = np.add.reduceat(below.astype(np.int64), starts)
+        index = np.where(total == 0, (draws * degree).astype(np.int64), index)
+        targets[chosen] = self._indices[first + index]
+        travel_times[chosen] = self._times[first + index]
+        return chosen, targets, travel_times
+
+    def _owner_present(self, houses: np.ndarray, positions: np.ndarray) -> np.ndarray:
+        """Whether the owner of houses[i] is inside when the arrival at positions[i] of the current tick enters."""
+        owners = self.owner[houses]
+        arrived = self._position[owners]
+        inside = self.present[owners] | ((arrived >= 0) & (arrived <= positions))
+        return (owners >= 0) & inside & (self.location[owners] == houses)
+
+    def _occupants(self, houses: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Present agents of the given houses, sorted by house rank then id, and where each house starts."""
+        wanted = np.zeros(self._house_size, dtype=bool)
+        wanted[houses] = True
+        members = np.flatnonzero(self.present & wanted[self.location])
+        rank = self._house_rank[self.location[members]]
+        members = members[np.argsort(rank, kind='stable')]
+        starts = np.searchsorted(self._house_rank[self.location[members]], self._house_rank[houses])
+        return members, starts
+
+    def _attempt_groups(self, positions: np.ndarray, agents: np.ndarray, targets: np.ndarray, arrival_rank: np.ndarray,
+                        arrivals_by_house: np.ndarray, house_starts: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """
+        Occupants at the moment of each house exchange attempt, and their readiness.
+
+        An attempt at the k-th arrival into a house sees the agents present
+        before the tick plus the first k arrivals, sorted by id, and takes one
+        house exchange draw per occupant; the draws are only peeked here.
+        """
+        houses = targets[positions]
+        before, before_starts = self._occupants(houses)
+        before_sizes = self.count[houses]
+        arrived_sizes = arrival_rank[positions] + 1
+        sizes = before_sizes + arrived_sizes
+
+        starts, offsets = _segment_offsets(sizes)
+        group = np.repeat(np.arange(len(positions)), sizes)
+        from_before = offsets < before_sizes[group]
+        # Indices into before followed by the arrivals grouped by house
+        index = np.where(from_before, np.repeat(before_starts, sizes) + offsets,
+                         len(before) + np.repeat(house_starts[positions], sizes) + offsets - before_sizes[group])
+        members = np.concatenate([before, agents[arrivals_by_house]])[index]
+        members = members[np.lexsort((members, group))]
+
+        draws = np.array(self.rng.house_exchange.peek(len(members)), dtype=np.int64)
+        ready = draws <= self.house_exchange_prob[members]
+        ready_counts = np.add.reduceat(ready.astype(np.int64), starts)
+        return starts, sizes, members, ready, ready_counts
+
+    def _exchange_houses(self, participants: np.ndarray) -> np.ndarray:
+        """ChangeHouseEvent.run without the knowledge part: rotates the participants' houses and returns the new ones."""
+        houses = self.home[participants]
+        new_houses = np.concatenate((houses[1:], houses[:1]))
+        self.home[participants] = new_houses
+        self.owner[new_houses] = participants
+        return new_houses
+
+    def _learn(self, time: int, observers: np.ndarray, subjects: np.ndarray, houses: np.ndarray) -> None:
+        # Pet and location are always the current ones; houses can be those of an earlier moment
+        self.knowledge.update(observers, subjects, self.pet[subjects], houses, self.location[subjects], time)
+
+    def _record_house_exchanges(self, time: int, exchanges: List[Tuple[np.ndarray, ...]]) -> None:
+        """
+        The knowledge part of the tick's house exchanges: the participants refresh
+        their own entries, then everyone present learns about everyone else,
+        with the houses as they were right after each exchange.
+        """
+        participants, new_houses, occupants, houses = (np.concatenate(column) for column in zip(*exchanges))
+        # Pets and locations do not change while agents arrive
+        self._learn(time, participants, participants, new_houses)
+        sizes = np.array([len(exchange[2]) for exchange in exchanges], dtype=np.int64)
+        starts = np.cumsum(sizes) - sizes
+        for rows, cols in _cross_pairs(starts, sizes, starts, sizes):
+            other = rows != cols
+            rows, cols = rows[other], cols[other]
+            self._learn(time, occupants[rows], occupants[cols], houses[cols])
+
+    def _arrive(self, time: int, agents: np.ndarray) -> Tuple[np.ndarray, List[List]]:
+        """
+        FinishTripEvent.run for every arrival of the tick, in processing order.
+
+        Returns the success flags and the logged extras of the house exchanges.
+        """
+        count = len(agents)
+        targets = self._target[agents]
+        self._arrival[agents] = NO_ARRIVAL
+        self.travelling[agents] = False
+        self.location[agents] = targets
+        positions = np.arange(count, dtype=np.int64)
+        self._position[agents] = positions
+
+        # Arrivals grouped by house, in arrival order, and the rank of each within its house
+        arrivals_by_house = np.argsort(targets, kind='stable')
+        sorted_targets = targets[arrivals_by_house]
+        group_starts = np.searchsorted(sorted_targets, sorted_targets)
+        arrival_rank = np.empty(count, dtype=np.int64)
+        arrival_rank[arrivals_by_house] = positions - group_starts
+        house_starts = np.empty(count, dtype=np.int64)
+        house_starts[arrivals_by_house] = group_starts
+        # Position of the last arrival into every house
+        last_arrival = np.full(self._house_size, -1, dtype=np.int64)
+        last_arrival[sorted_targets] = arrivals_by_house
+        occupancy = self.count[targets] + arrival_rank + 1
+
+        success = self._owner_present(targets, positions)
+        attempts = success & (occupancy >= 2)
+
+        stream = self.rng.house_exchange
+        exchanges = []
+        extras = []
+        start = 0
+        while True:
+            positions_left = np.flatnonzero(attempts[start:]) + start
+            if not len(positions_left):
+                break
+            # A bounded number of occupants per round; the next round continues after the last attempt
+            limit = np.searchsorted(np.cumsum(occupancy[positions_left]), CHUNK_SIZE, 'right')
+            positions_left = positions_left[:max(int(limit), 1)]
+            starts, sizes, members, ready, ready_counts = self._attempt_groups(
+                positions_left, agents, targets, arrival_rank, arrivals_by_house, house_starts)
+            ends = starts + sizes
+            consumed = 0
+            rebuilt = False
+            for group in np.flatnonzero(ready_counts >= 2).tolist():
+                stream.skip(int(ends[group]) - consumed)
+                consumed = int(ends[group])
+                position = int(positions_left[group])
+                occupants = members[starts[group]:ends[group]]
+                participants = occupants[ready[starts[group]:ends[group]]]
+                new_houses = self._exchange_houses(participants)
+                exchanges.append((participants, new_houses, occupants, self.home[occupants]))
+                extras.append([len(participants)] + self._nationality[participants].tolist()
+                              + [str(h) for h in new_houses.tolist()])
+
+                # Later arrivals into the houses that changed hands check their new owners
+                if not (last_arrival[new_houses] > position).any():
+                    continue
+                later = self._later_arrivals(new_houses, position, arrivals_by_house, sorted_targets)
+                now = self._owner_present(targets[later], later)
+                if not (now != success[later]).any():
+                    continue
+                success[later] = now
+                now_attempts = now & (occupancy[later] >= 2)
+                if (now_attempts != attempts[later]).any():
+                    # The remaining attempts and their draws change: start over after this one
+                    attempts[later] = now_attempts
+                    start = position + 1
+                    rebuilt = True
+                    break
+            if not rebuilt:
+                stream.skip(int(ends[-1]) - consumed)
+                start = int(positions_left[-1]) + 1
+
+        if exchanges:
+            self._record_house_exchanges(time, exchanges)
+        self._position[agents] = -1
+        self.present[agents] = True
+        self.count += np.bincount(targets, minlength=self._house_size)
+        return success, extras
+
+    @staticmethod
+    def _later_arrivals(houses: np.ndarray, position: int, arrivals_by_house: np.ndarray,
+                        sorted_targets: np.ndarray) -> np.ndarray:
+        """Positions of the arrivals after position into any of houses."""
+        later = []
+        for house in np.unique(houses).tolist():
+            lo, hi = np.searchsorted(sorted_targets, [house, house + 1])
+            group = arrivals_by_house[lo:hi]
+            later.append(group[group > position])
+        return np.sort(np.concatenate(later)) if later else np.empty(0, dtype=np.int64)
+
+    def _crowded(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Houses with at least two occupants and the owner inside, in houses dict order, and their occupants."""
+        houses = np.flatnonzero(self.count >= 2)
+        owners = self.owner[houses]
+        houses = houses[(owners >= 0) & self.present[owners] & (self.location[owners] == houses)]
+        houses = houses[np.argsort(self._house_rank[houses], kind='stable')]
+        members, starts = self._occupants(houses)
+        return houses, members, starts, self.count[houses]
+
+    def _sync(self, time: int, members: np.ndarray, starts: np.ndarray, sizes: np.ndarray) -> None:
+        """update_knowledge_in_houses_with_owner: everyone in a crowded house with its owner learns about the others."""
+        for rows, cols in _cross_pairs(starts, sizes, starts, sizes):
+            other = rows != cols
+            subjects = members[cols[other]]
+            self._learn(time, members[rows[other]], subjects, self.home[subjects])
+
+    def _exchange_pets(self, time: int, members: np.ndarray, starts: np.ndarray, sizes: np.ndarray) -> List[List]:
+        """detect_and_generate_exchanges and ChangePetEvent.run for all crowded houses; returns the logged extras."""
+        if not len(members):
+            return []
+        draws = np.array(self.rng.pet_exchange.take(len(members)), dtype=np.int64)
+        ready = draws <= self.pet_exchange_prob[members]
+        ready_counts = np.add.reduceat(ready.astype(np.int64), starts)
+        exchanging = ready_counts >= 2
+        if not exchanging.any():
+            return []
+
+        group = np.repeat(np.arange(len(sizes)), sizes)
+        selected = ready & exchanging[group]
+        participants = members[selected]
+        counts = ready_counts[exchanging]
+        group_starts, offsets = _segment_offsets(counts)
+        # Each participant gets the pet of the next one; the last gets the first one's
+        following = np.where(offsets == np.repeat(counts, counts) - 1, np.repeat(group_starts, counts),
+                             np.arange(len(participants)) + 1)
+        self.pet[participants] = self.pet[participants[following]]
+
+        # Everyone present learns the participants' new pets; a participant's own entry is among these
+        for rows, cols in _cross_pairs(starts[exchanging], sizes[exchanging], group_starts, counts):
+            subjects = participants[cols]
+            self._learn(time, members[rows], subjects, self.home[subjects])
+
+        nationality = self._nationality[participants].tolist()
+        pets = [self.pets.names[p] for p in self.pet[participants].tolist()]
+        return [[hi - lo] + nationality[lo:hi] + pets[lo:hi]
+                for lo, hi in zip(group_starts.tolist(), (group_starts + counts).tolist())]
+
+    def _depart(self, time: int, agents: np.ndarray, targets: np.ndarray, travel_times: np.ndarray) -> List[Tuple]:
+        """StartTripEvent.run for every departure of the tick, in order; returns the logged extras."""
+        location = self.location[agents]
+        leaving = self.present[agents]
+        self.count -= np.bincount(location[leaving], minlength=self._house_size)
+        self.present[agents] = False
+
+        arrival = time + travel_times
+        # A trip ending after max_time does not start, but the agent has left its house all the same
+        started = arrival <= self.max_time
+        travellers = agents[started]
+        self.travelling[agents] = started
+        self._arrival[travellers] = arrival[started]
+        self._target[travellers] = targets[started]
+        self._returning[travellers] = targets[started] == self.home[travellers]
+        self._order[travellers] = time * self._size + np.flatnonzero(started)
+
+        return list(zip(self._nationality[agents].tolist(), location.tolist(), targets.tolist()))
+
+    def _plan(self, agents: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """_plan_new_trips: a new target for those at home, the way home for the others, in arrival order."""
+        at_home = self.location[agents] == self.home[agents]
+        targets = np.full(len(agents), -1, dtype=np.int64)
+        travel_times = np.full(len(agents), -1, dtype=np.int64)
+        chosen, chosen_targets, chosen_times = self._choose_targets(agents[at_home])
+        home_index = np.flatnonzero(at_home)[chosen]
+        targets[home_index] = chosen_targets[chosen]
+        travel_times[home_index] = chosen_times[chosen]
+        away = np.flatnonzero(~at_home)
+        homes = self.home[agents[away]]
+        times = self._route_time(self.location[agents[away]], homes)
+        has_route = times >= 0
+        targets[away[has_route]] = homes[has_route]
+        travel_times[away[has_route]] = times[has_route]
+        planned = targets >= 0
+        return agents[planned], targets[planned], travel_times[planned]
+
+    def _step(self, time: int, sink: EventSink) -> None:
+        arriving = np.flatnonzero(self._arrival == time)
+        # Owners returning home first, then in scheduling order
+        arriving = arriving[np.lexsort((self._order[arriving], ~self._returning[arriving]))]
+
+        success, house_extras = self._arrive(time, arriving) if len(arriving) else (None, [])
+        houses, members, starts, sizes = self._crowded()
+        self._sync(time, members, starts, sizes)
+        pet_extras = self._exchange_pets(time, members, starts, sizes) if len(arriving) else []
+
+        start_extras = []
+        if self._starts is not None:
+            start_extras = self._depart(time, *self._starts)
+            self._starts = None
+
+        counter = self.event_counter
+        if len(arriving):
+            nationality = self._nationality[arriving].tolist()
+            targets = self.location[arriving].tolist()
+            finish_extras = list(zip(success.astype(np.int64).tolist(), nationality, targets))
+            # Trips that ended at the agent's house, as it is after the exchanges, log no success flag
+            for i in np.flatnonzero(self.location[arriving] == self.home[arriving]).tolist():
+                finish_extras[i] = (nationality[i], targets[i])
+            sink.emit_many(counter, time, "FinishTrip", finish_extras)
+            counter += len(finish_extras)
+        for event_type, extras in (("ChangePet", pet_extras), ("changeHouse", house_extras), ("StartTrip", start_extras)):
+            if extras:
+                sink.emit_many(counter, time, event_type, extras)
+                counter += len(extras)
+
+        # The trips planned now start in a second batch of the same tick; its knowledge sync finds
+        # nothing changed since the first one and does nothing
+        if len(arriving):
+            agents, targets, travel_times = self._plan(arriving)
+            if len(agents):
+                extras = self._depart(time, agents, targets, travel_times)
+                sink.emit_many(counter, time, "StartTrip", extras)
+                counter += len(extras)
+        self.event_counter = counter
+
+    def _next_time(self) -> Optional[int]:
+        if self._starts is not None:
+            return self.time
+        time = int(self._arrival.min()) if len(self._arrival) else NO_ARRIVAL
+        return None if time == NO_ARRIVAL else time
+
+    def run(self, max_time: int, sink: Optional[EventSink] = None) -> List[str]:
+        """
+        Runs the simulation up to max_time, emitting every logged event to sink.
+
+        Same contract as Environment.run without stop criteria: without a sink
+        the lines are returned, a later run() continues where this one ended,
+        and stop_reason is "max_time" or "queue_empty".
+        """
+        in_memory = sink is None
+        if in_memory:
+            sink = MemorySink()
+        self.stop_reason = "queue_empty"
+        while True:
+            time = self._next_time()
+            if time is None:
+                break
+            if time > max_time:
+                self.stop_reason = "max_time"
+                break
+            self.time = time
+            self._step(time, sink)
+        return sink.lines if in_memory else []
+
+    def update_entities(self) -> None:
+        """Copies the current state and knowledge into the Agent and House objects the engine was built from."""
+        pet_names = self.pets.names
+        for agent_id, agent in self.agents.items():
+            agent.pet = pet_names[self.pet[agent_id]]
+            agent.house_id = int(self.home[agent_id])
+            agent.location = int(self.location[agent_id])
+            agent.is_travelling = bool(self.travelling[agent_id])
+            agent.knowledge = {}
+        members, starts = self._occupants(np.fromiter(self.houses, dtype=np.int64, count=len(self.houses)))
+        for (house_id, house), start in zip(self.houses.items(), starts.tolist()):
+            house.owner_id = int(self.owner[house_id])
+            house.occupants = members[start:start + int(self.count[house_id])].tolist()
+            if isinstance(house.present_agents, set):
+                house.present_agents = set(house.occupants)
+        observers, subjects, pet, house, location, t = (column.tolist() for column in self.knowledge.rows(self._agent_rank))
+        for observer, subject, p, h, l, when in zip(observers, subjects, pet, house, location, t):
+            self.agents[observer].knowledge[subject] = {"pet": pet_names[p], "house": h, "location": l, "t": when}
+
+    def _add_knowledge(self, builder: KnowledgeSnapshotBuilder) -> None:
+        builder.add_columns(*self.knowledge.rows(self._agent_rank), self.pets.names)
+
+    def knowledge_snapshot(self) -> KnowledgeSnapshot:
+        """The current knowledge as an in-memory KnowledgeSnapshot."""
+        builder = KnowledgeSnapshotBuilder()
+        self._add_knowledge(builder)
+        return builder.build()
+
+    def write_knowledge_snapshot(self, path: str) -> None:
+        """Writes the current knowledge like loaders.knowledge_snapshot.write_knowledge_snapshot(path, agents)."""
+        with KnowledgeSnapshotWriter(path) as writer:
+            self._add_knowledge(writer)
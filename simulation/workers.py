@@ -0,0 +1,19 @@
+from typing import Any, Tuple
+
+
+# Inputs shared by all tasks of a process pool.
+#
+# Pass install_inputs as the pool initializer with the inputs as initargs:
+# they are pickled once per worker process instead of once per task, and the
+# tasks read them back with worker_inputs().
+
+_inputs: Tuple[Any, ...] = ()
+
+
+def install_inputs(*inputs: Any) -> None:
+    global _inputs
+    _inputs = inputs
+
+
+def worker_inputs() -> Tuple[Any, ...]:
+    return _inputs